@@ -0,0 +1,70 @@
+"""Добавить budget_rollups — сохранённые итоги групп бюджета
+
+Revision ID: 006_add_budget_rollups
+Revises: 005_add_production
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "006_add_budget_rollups"
+down_revision: Union[str, None] = "005_add_production"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Итог группы = сумма всех ITEM-потомков; налог — floor на единицу по каждому компоненту,
+# как в app/core/tax_logic.calc_tax
+BACKFILL_SQL = """
+INSERT INTO budget_rollups (line_id, project_id, subtotal, tax_amount, total, accrued, paid, closed)
+WITH RECURSIVE closure(ancestor_id, line_id) AS (
+    SELECT id, id FROM budget_lines WHERE type = 'GROUP'
+    UNION ALL
+    SELECT cl.ancestor_id, b.id FROM closure cl JOIN budget_lines b ON b.parent_id = cl.line_id
+),
+tax AS (
+    SELECT b.id,
+           COALESCE(SUM(FLOOR(CASE c.type
+               WHEN 'INTERNAL' THEN b.rate / (1 - c.rate) * c.rate
+               WHEN 'EXTERNAL' THEN b.rate * c.rate
+               ELSE 0 END)), 0) AS per_unit
+    FROM budget_lines b
+    LEFT JOIN tax_components c ON c.scheme_id = b.tax_scheme_id
+    WHERE b.type <> 'GROUP'
+    GROUP BY b.id
+)
+SELECT g.id, g.project_id,
+       COALESCE(SUM(b.rate * b.quantity), 0),
+       COALESCE(SUM(t.per_unit * b.quantity), 0),
+       COALESCE(SUM((b.rate + t.per_unit) * b.quantity), 0),
+       0, 0, 0
+FROM budget_lines g
+LEFT JOIN closure cl ON cl.ancestor_id = g.id
+LEFT JOIN budget_lines b ON b.id = cl.line_id AND b.type <> 'GROUP'
+LEFT JOIN tax t ON t.id = b.id
+WHERE g.type = 'GROUP'
+GROUP BY g.id, g.project_id
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "budget_rollups",
+        sa.Column("line_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("budget_lines.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("project_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("subtotal", sa.Float, nullable=False, server_default="0"),
+        sa.Column("tax_amount", sa.Float, nullable=False, server_default="0"),
+        sa.Column("total", sa.Float, nullable=False, server_default="0"),
+        sa.Column("accrued", sa.Float, nullable=False, server_default="0"),
+        sa.Column("paid", sa.Float, nullable=False, server_default="0"),
+        sa.Column("closed", sa.Float, nullable=False, server_default="0"),
+    )
+    op.create_index("ix_budget_rollups_project_id", "budget_rollups", ["project_id"])
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    op.drop_table("budget_rollups")
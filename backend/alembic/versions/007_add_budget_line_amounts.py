@@ -0,0 +1,48 @@
+"""Добавить сохранённые суммы subtotal/tax_amount/total в budget_lines
+
+Revision ID: 007_add_budget_line_amounts
+Revises: 006_add_budget_rollups
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "007_add_budget_line_amounts"
+down_revision: Union[str, None] = "006_add_budget_rollups"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL_SQL = """
+UPDATE budget_lines b SET
+    subtotal = b.rate * b.quantity,
+    tax_amount = t.per_unit * b.quantity,
+    total = (b.rate + t.per_unit) * b.quantity
+FROM (
+    SELECT l.id,
+           COALESCE(SUM(FLOOR(CASE c.type
+               WHEN 'INTERNAL' THEN l.rate / (1 - c.rate) * c.rate
+               WHEN 'EXTERNAL' THEN l.rate * c.rate
+               ELSE 0 END)), 0) AS per_unit
+    FROM budget_lines l
+    LEFT JOIN tax_components c ON c.scheme_id = l.tax_scheme_id
+    WHERE l.type <> 'GROUP'
+    GROUP BY l.id
+) t
+WHERE b.id = t.id
+"""
+
+
+def upgrade() -> None:
+    op.add_column("budget_lines", sa.Column("subtotal", sa.Float, nullable=False, server_default="0"))
+    op.add_column("budget_lines", sa.Column("tax_amount", sa.Float, nullable=False, server_default="0"))
+    op.add_column("budget_lines", sa.Column("total", sa.Float, nullable=False, server_default="0"))
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade() -> None:
+    op.drop_column("budget_lines", "total")
+    op.drop_column("budget_lines", "tax_amount")
+    op.drop_column("budget_lines", "subtotal")
@@ -0,0 +1,27 @@
+"""Добавить data_versions — счётчики версий для ETag
+
+Revision ID: 008_add_data_versions
+Revises: 007_add_budget_line_amounts
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "008_add_data_versions"
+down_revision: Union[str, None] = "007_add_budget_line_amounts"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "data_versions",
+        sa.Column("scope", sa.String(100), primary_key=True),
+        sa.Column("version", sa.BigInteger, nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("data_versions")
@@ -0,0 +1,40 @@
+"""Добавить budget_line_tombstones и индексы по updated_at для дельта-синхронизации
+
+Revision ID: 009_add_budget_tombstones
+Revises: 008_add_data_versions
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "009_add_budget_tombstones"
+down_revision: Union[str, None] = "008_add_data_versions"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "budget_line_tombstones",
+        sa.Column("line_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("project_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("parent_id", postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+    op.create_index("ix_budget_line_tombstones_project_deleted", "budget_line_tombstones", ["project_id", "deleted_at"])
+    op.create_index("ix_budget_lines_project_updated", "budget_lines", ["project_id", "updated_at"])
+    op.add_column(
+        "budget_rollups",
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+    op.create_index("ix_budget_rollups_project_updated", "budget_rollups", ["project_id", "updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_budget_rollups_project_updated", table_name="budget_rollups")
+    op.drop_column("budget_rollups", "updated_at")
+    op.drop_index("ix_budget_lines_project_updated", table_name="budget_lines")
+    op.drop_table("budget_line_tombstones")
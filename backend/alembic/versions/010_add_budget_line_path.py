@@ -0,0 +1,40 @@
+"""Добавить budget_lines.path — материализованный путь для запросов по поддереву
+
+Revision ID: 010_add_budget_line_path
+Revises: 009_add_budget_tombstones
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "010_add_budget_line_path"
+down_revision: Union[str, None] = "009_add_budget_tombstones"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Путь = путь родителя + id + '/', от корневых статей вниз. Заодно выправляется level —
+# прежнее перемещение не обновляло его у потомков, а выборки по глубине опираются на него.
+BACKFILL_SQL = """
+WITH RECURSIVE paths(id, path, level) AS (
+    SELECT id, id::text || '/', 0 FROM budget_lines WHERE parent_id IS NULL
+    UNION ALL
+    SELECT b.id, p.path || b.id::text || '/', p.level + 1 FROM budget_lines b JOIN paths p ON b.parent_id = p.id
+)
+UPDATE budget_lines b SET path = paths.path, level = paths.level FROM paths WHERE b.id = paths.id
+"""
+
+
+def upgrade() -> None:
+    op.add_column("budget_lines", sa.Column("path", sa.Text, nullable=False, server_default=""))
+    op.execute(BACKFILL_SQL)
+    op.create_index(
+        "ix_budget_lines_path", "budget_lines", ["path"], postgresql_ops={"path": "text_pattern_ops"}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_budget_lines_path", table_name="budget_lines")
+    op.drop_column("budget_lines", "path")
@@ -0,0 +1,48 @@
+"""Добавить budget_versions и budget_version_lines — неизменяемые версии бюджета
+
+Revision ID: 011_add_budget_versions
+Revises: 010_add_budget_line_path
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "011_add_budget_versions"
+down_revision: Union[str, None] = "010_add_budget_line_path"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "budget_versions",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("project_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("number", sa.Integer, nullable=False),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("is_base", sa.Boolean, nullable=False, server_default="false"),
+        sa.Column("previous_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("budget_versions.id", ondelete="RESTRICT"), nullable=True),
+        sa.Column("chain_length", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("line_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("changed_lines", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("subtotal", sa.Float, nullable=False, server_default="0"),
+        sa.Column("tax_amount", sa.Float, nullable=False, server_default="0"),
+        sa.Column("total", sa.Float, nullable=False, server_default="0"),
+        sa.Column("created_by", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+        sa.UniqueConstraint("project_id", "number", name="uq_budget_versions_project_number"),
+    )
+    op.create_table(
+        "budget_version_lines",
+        sa.Column("version_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("budget_versions.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("line_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("data", postgresql.JSONB, nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("budget_version_lines")
+    op.drop_table("budget_versions")
@@ -0,0 +1,33 @@
+"""Добавить budget_templates — пользовательские шаблоны бюджета
+
+Revision ID: 012_add_budget_templates
+Revises: 011_add_budget_versions
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "012_add_budget_templates"
+down_revision: Union[str, None] = "011_add_budget_versions"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "budget_templates",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False, unique=True),
+        sa.Column("description", sa.Text, nullable=True),
+        sa.Column("line_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("data", postgresql.JSONB, nullable=False),
+        sa.Column("created_by", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("budget_templates")
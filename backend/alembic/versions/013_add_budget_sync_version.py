@@ -0,0 +1,35 @@
+"""Добавить sync_version — курсор дельта-синхронизации по версии проекта вместо времени
+
+Revision ID: 013_add_budget_sync_version
+Revises: 012_add_budget_templates
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "013_add_budget_sync_version"
+down_revision: Union[str, None] = "012_add_budget_templates"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("budget_lines", "budget_rollups", "budget_line_tombstones")
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column("sync_version", sa.BigInteger, nullable=True))
+        # Всё, что было до миграции, уже синхронизировано: новые курсоры не меньше нуля
+        op.execute(f"UPDATE {table} SET sync_version = 0")
+        op.create_index(f"ix_{table}_project_sync", table, ["project_id", "sync_version"])
+    op.drop_index("ix_budget_lines_project_updated", table_name="budget_lines")
+    op.drop_index("ix_budget_rollups_project_updated", table_name="budget_rollups")
+
+
+def downgrade() -> None:
+    op.create_index("ix_budget_rollups_project_updated", "budget_rollups", ["project_id", "updated_at"])
+    op.create_index("ix_budget_lines_project_updated", "budget_lines", ["project_id", "updated_at"])
+    for table in reversed(TABLES):
+        op.drop_index(f"ix_{table}_project_sync", table_name=table)
+        op.drop_column(table, "sync_version")
@@ -0,0 +1,140 @@
+"""
+Сравнение двух бюджетов (версия с версией, проект с проектом).
+
+Состояние бюджета — словарь line_id → снимок строки (app/core/budget_versions.py,
+parent_id в снимке — строкой).
+Строки сопоставляются по ключу за один проход хеш-соединения: по id (версии одного
+проекта) или по code (разные проекты). Результат — генератор событий, чтобы
+большие сравнения можно было отдавать потоком:
+
+- {"type": "added" | "removed", ...}     — строка есть только в одном бюджете;
+- {"type": "changed" | "moved", ...}     — строка в обоих; fields — изменённые поля,
+  moved — сменился родитель (тип "moved", если поля не менялись);
+- {"type": "group", ...}                 — изменение итогов группы;
+- {"type": "summary", ...}               — последним: счётчики и изменение итогов бюджета.
+"""
+from collections.abc import Iterator
+
+DIFF_FIELDS = (
+    "name", "type", "unit", "quantity_units", "rate", "quantity", "tax_scheme_id",
+    "contractor_id", "currency", "limit_amount", "subtotal", "tax_amount", "total",
+)
+NUMERIC_FIELDS = frozenset(("quantity_units", "rate", "quantity", "limit_amount", "subtotal", "tax_amount", "total"))
+TOTAL_FIELDS = ("subtotal", "tax_amount", "total")
+KEYS = ("id", "code")
+
+# Разница меньше — не изменение (суммы хранятся во float)
+EPSILON = 0.005
+
+
+def _index(state: dict, key: str) -> dict:
+    """Ключ → (line_id, снимок). По code строки без кода и повторы кода не сопоставляются."""
+    if key == "id":
+        return {line_id: (line_id, snap) for line_id, snap in state.items()}
+    index = {}
+    for line_id, snap in state.items():
+        code = snap.get("code")
+        if code and code not in index:
+            index[code] = (line_id, snap)
+    return index
+
+
+def _parent_key(state: dict, snap: dict, key: str):
+    parent_id = snap.get("parent_id")
+    if key == "id" or parent_id is None:
+        return parent_id
+    parent = state.get(parent_id)
+    return parent.get("code") if parent else None
+
+
+def group_totals(state: dict) -> dict:
+    """line_id группы → [subtotal, tax_amount, total] по всем ITEM-потомкам."""
+    totals = {line_id: [0.0, 0.0, 0.0] for line_id, snap in state.items() if snap["type"] == "GROUP"}
+    for snap in state.values():
+        if snap["type"] == "GROUP":
+            continue
+        amounts = [snap[f] or 0.0 for f in TOTAL_FIELDS]
+        parent_id = snap.get("parent_id")
+        seen = 0
+        while parent_id is not None and parent_id in totals and seen < len(state):
+            acc = totals[parent_id]
+            for i, value in enumerate(amounts):
+                acc[i] += value
+            parent_id = state[parent_id].get("parent_id")
+            seen += 1
+    return totals
+
+
+def _changed_fields(old: dict, new: dict) -> dict:
+    fields = {}
+    for f in DIFF_FIELDS:
+        a, b = old.get(f), new.get(f)
+        if f in NUMERIC_FIELDS:
+            a, b = a or 0.0, b or 0.0
+            if abs(b - a) > EPSILON:
+                fields[f] = {"old": a, "new": b, "delta": b - a}
+        elif a != b:
+            fields[f] = {"old": a, "new": b}
+    return fields
+
+
+def _line_ref(line_id, snap: dict) -> dict:
+    return {"id": line_id, "code": snap.get("code"), "name": snap.get("name"), "line_type": snap.get("type")}
+
+
+def _amounts_delta(old: list | None, new: list | None) -> dict:
+    old = old or (0.0, 0.0, 0.0)
+    new = new or (0.0, 0.0, 0.0)
+    return {f: {"old": o, "new": n, "delta": n - o} for f, o, n in zip(TOTAL_FIELDS, old, new)}
+
+
+def diff_states(old: dict, new: dict, key: str = "id") -> Iterator[dict]:
+    """Генератор событий сравнения old → new (см. docstring модуля)."""
+    if key not in KEYS:
+        raise ValueError(f"key: {key}")
+    # В снимках parent_id — строки; ключи состояний приводятся к тому же виду
+    old = {str(line_id): snap for line_id, snap in old.items()}
+    new = {str(line_id): snap for line_id, snap in new.items()}
+    old_index = _index(old, key)
+    new_index = _index(new, key)
+    counts = {"added": 0, "removed": 0, "changed": 0, "moved": 0}
+
+    # Строки, сопоставленные по ключу; для групп — чтобы сравнить их итоги
+    matched_groups = []
+    for k, (new_id, new_snap) in new_index.items():
+        pair = old_index.get(k)
+        if pair is None:
+            counts["added"] += 1
+            yield {"type": "added", "key": k, **_line_ref(new_id, new_snap)}
+            continue
+        old_id, old_snap = pair
+        if new_snap["type"] == "GROUP" or old_snap["type"] == "GROUP":
+            matched_groups.append((k, old_id, new_id, new_snap))
+        fields = _changed_fields(old_snap, new_snap)
+        moved = _parent_key(old, old_snap, key) != _parent_key(new, new_snap, key)
+        if not fields and not moved:
+            continue
+        event_type = "changed" if fields else "moved"
+        counts["changed"] += bool(fields)
+        counts["moved"] += moved
+        yield {
+            "type": event_type, "key": k, **_line_ref(new_id, new_snap),
+            "old_id": old_id, "moved": moved, "fields": fields,
+        }
+
+    for k, (old_id, old_snap) in old_index.items():
+        if k not in new_index:
+            counts["removed"] += 1
+            yield {"type": "removed", "key": k, **_line_ref(old_id, old_snap)}
+
+    # Итоги сопоставленных групп (добавленные и удалённые видны по added/removed)
+    old_totals = group_totals(old)
+    new_totals = group_totals(new)
+    for k, old_id, new_id, new_snap in matched_groups:
+        delta = _amounts_delta(old_totals.get(old_id), new_totals.get(new_id))
+        if any(abs(d["delta"]) > EPSILON for d in delta.values()):
+            yield {"type": "group", "key": k, **_line_ref(new_id, new_snap), **delta}
+
+    old_sum = [sum(s[f] or 0.0 for s in old.values() if s["type"] != "GROUP") for f in TOTAL_FIELDS]
+    new_sum = [sum(s[f] or 0.0 for s in new.values() if s["type"] != "GROUP") for f in TOTAL_FIELDS]
+    yield {"type": "summary", "key_by": key, **counts, **_amounts_delta(old_sum, new_sum)}
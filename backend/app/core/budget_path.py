@@ -0,0 +1,37 @@
+"""
+Материализованный путь статьи бюджета: id всех предков и самой статьи через '/',
+с завершающим разделителем — 'root-id/group-id/line-id/'.
+
+Поддерево строки — все пути с её путём в качестве префикса (LIKE 'prefix%' по
+btree-индексу с text_pattern_ops), предки — id из самого пути, без запросов.
+"""
+import uuid
+
+SEPARATOR = "/"
+
+
+def child_path(parent_path: str | None, line_id: uuid.UUID) -> str:
+    """Путь строки line_id под родителем с путём parent_path (None/'' — корень)."""
+    return f"{parent_path or ''}{line_id}{SEPARATOR}"
+
+
+def path_ids(path: str | None) -> list[uuid.UUID]:
+    """Все id пути от корня, включая саму строку."""
+    if not path:
+        return []
+    return [uuid.UUID(part) for part in path.split(SEPARATOR) if part]
+
+
+def ancestor_ids(path: str | None) -> list[uuid.UUID]:
+    """id предков строки (без неё самой), от корня."""
+    return path_ids(path)[:-1]
+
+
+def subtree_pattern(path: str) -> str:
+    """LIKE-шаблон поддерева (сама строка и все потомки). В uuid нет символов % и _."""
+    return f"{path}%"
+
+
+def is_in_subtree(path: str | None, root_path: str | None) -> bool:
+    """Лежит ли path в поддереве root_path (включая совпадение)."""
+    return bool(path and root_path and path.startswith(root_path))
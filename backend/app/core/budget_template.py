@@ -7,7 +7,14 @@
 Каждый элемент: (name, type, unit, quantity_units, rate, quantity)
 - GROUP: name только, остальные 0
 - ITEM: полные данные
+
+Для вставки шаблон компилируется в CompiledTemplate — параллельные массивы в
+прямом порядке обхода с индексом родителя; так же хранятся шаблоны в БД.
 """
+import uuid
+from functools import lru_cache
+
+from app.core.budget_path import child_path
 
 TEMPLATE = [
     {
@@ -422,49 +429,102 @@ def _generate_code(parent_code: str, index: int) -> str:
     return f"{parent_code}.{index + 1}"
 
 
-def build_flat_lines(project_id, template=None, parent_id=None, parent_code="", sort_offset=0):
+# Поля статьи, которые переносит шаблон (без контрагента — он свой в каждом проекте)
+TEMPLATE_FIELDS = ("name", "type", "unit", "quantity_units", "rate", "quantity", "tax_scheme_id", "currency", "limit_amount")
+_DEFAULTS = {"type": "ITEM", "unit": None, "quantity_units": 1.0, "rate": 0.0, "quantity": 1.0,
+             "tax_scheme_id": None, "currency": "RUB", "limit_amount": 0.0}
+
+
+class CompiledTemplate:
     """
-    Рекурсивно строит плоский список BudgetLine из шаблона.
-    Возвращает list[dict] для bulk insert.
+    Шаблон как параллельные массивы в прямом порядке обхода: parent[i] — индекс
+    родителя строки i (всегда меньше i, -1 — корень). Коды, уровни и порядок
+    среди соседей посчитаны при компиляции; tax_scheme_id — строками.
     """
-    import uuid as _uuid
-    if template is None:
-        template = TEMPLATE
+    __slots__ = ("parent", "sort_order", "level", "code", *TEMPLATE_FIELDS)
 
-    result = []
-    for i, item in enumerate(template):
-        line_id = _uuid.uuid4()
-        code = _generate_code(parent_code, i)
-        level = len(code.split(".")) - 1
+    def __init__(self, data: dict):
+        for f in self.__slots__:
+            setattr(self, f, list(data[f]))
 
-        line = {
-            "id": line_id,
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def to_data(self) -> dict:
+        """JSON-совместимое представление (хранится в budget_templates.data)."""
+        return {f: getattr(self, f) for f in self.__slots__}
+
+    def instantiate(self, project_id: uuid.UUID) -> dict:
+        """Колонки новых строк проекта: свежие id, parent_id и пути по индексам родителей."""
+        ids = [uuid.uuid4() for _ in self.parent]
+        paths = []
+        for i, p in enumerate(self.parent):
+            paths.append(child_path(paths[p] if p >= 0 else None, ids[i]))
+        columns = {f: getattr(self, f) for f in self.__slots__ if f != "parent"}
+        columns["tax_scheme_id"] = [uuid.UUID(s) if s else None for s in self.tax_scheme_id]
+        return {
+            **columns,
+            "id": ids,
+            "parent_id": [ids[p] if p >= 0 else None for p in self.parent],
+            "path": paths,
             "project_id": project_id,
-            "parent_id": parent_id,
-            "sort_order": sort_offset + i,
-            "level": level,
-            "code": code,
-            "name": item["name"],
-            "type": item.get("type", "ITEM"),
-            "unit": item.get("unit"),
-            "quantity_units": item.get("quantity_units", 1.0),
-            "rate": item.get("rate", 0.0),
-            "quantity": item.get("quantity", 1.0),
-            "tax_scheme_id": None,
-            "tax_override": False,
-            "currency": "RUB",
-            "limit_amount": 0.0,
         }
-        result.append(line)
 
-        if "children" in item and item["children"]:
-            children = build_flat_lines(
-                project_id=project_id,
-                template=item["children"],
-                parent_id=line_id,
-                parent_code=code,
-                sort_offset=0,
-            )
-            result.extend(children)
 
-    return result
+def _compile(entries: list) -> CompiledTemplate:
+    """entries — [(индекс родителя, поля строки)] в прямом порядке обхода."""
+    data: dict = {f: [] for f in CompiledTemplate.__slots__}
+    child_count: dict = {}
+    for parent, item in entries:
+        position = child_count.get(parent, 0)
+        child_count[parent] = position + 1
+        parent_code = data["code"][parent] if parent >= 0 else ""
+        data["parent"].append(parent)
+        data["sort_order"].append(position)
+        data["code"].append(_generate_code(parent_code, position))
+        data["level"].append(data["level"][parent] + 1 if parent >= 0 else 0)
+        for f in TEMPLATE_FIELDS:
+            value = item.get(f, _DEFAULTS.get(f))
+            if f == "tax_scheme_id" and value is not None:
+                value = str(value)
+            data[f].append(value)
+    return CompiledTemplate(data)
+
+
+def compile_tree(template: list) -> CompiledTemplate:
+    """Компилирует вложенный шаблон (формат TEMPLATE)."""
+    entries = []
+    stack = [(-1, item) for item in reversed(template)]
+    while stack:
+        parent, item = stack.pop()
+        index = len(entries)
+        entries.append((parent, item))
+        stack.extend((index, child) for child in reversed(item.get("children") or []))
+    return _compile(entries)
+
+
+def compile_lines(lines) -> CompiledTemplate:
+    """
+    Компилирует статьи проекта (объекты с id, parent_id, sort_order и TEMPLATE_FIELDS).
+    Строки, чей родитель не входит в набор, не попадают в шаблон.
+    """
+    children: dict = {}
+    for line in lines:
+        children.setdefault(line.parent_id, []).append(line)
+    for siblings in children.values():
+        siblings.sort(key=lambda x: x.sort_order)
+
+    entries = []
+    stack = [(-1, line) for line in reversed(children.get(None, []))]
+    while stack:
+        parent, line = stack.pop()
+        index = len(entries)
+        entries.append((parent, {f: getattr(line, f) for f in TEMPLATE_FIELDS}))
+        stack.extend((index, child) for child in reversed(children.get(line.id, [])))
+    return _compile(entries)
+
+
+@lru_cache(maxsize=1)
+def standard_template() -> CompiledTemplate:
+    """Встроенный шаблон, скомпилированный один раз на процесс."""
+    return compile_tree(TEMPLATE)
@@ -0,0 +1,213 @@
+"""
+Сборка дерева статей бюджета за линейное время.
+
+Алгоритм:
+1. Один проход по строкам — индекс детей по parent_id.
+2. Каждая группа соседей сортируется по sort_order один раз.
+3. Один post-order обход на компактных узлах (_Node со __slots__) —
+   суммы ITEM (сохранённые в строке или рассчитанные по scheme_map одним
+   пакетом app/core/tax_batch) и агрегация итогов для GROUP.
+4. Сериализация в BudgetLineOut только в самом конце.
+
+Итого O(n log k) вместо O(n²) у прежнего построчного поиска детей.
+"""
+from collections import defaultdict
+
+from app.core.tax_batch import line_amounts_batch
+from app.core.tax_logic import calc_tax
+from app.schemas.budget import BudgetLineOut
+
+
+class _Node:
+    """Внутренний узел дерева: ссылка на строку + посчитанные суммы."""
+    __slots__ = ("line", "children", "subtotal", "tax_amount", "total", "accrued", "paid", "closed")
+
+    def __init__(self, line):
+        self.line = line
+        self.children: list["_Node"] = []
+        self.subtotal = 0.0
+        self.tax_amount = 0.0
+        self.total = 0.0
+        self.accrued = 0.0
+        self.paid = 0.0
+        self.closed = 0.0
+
+
+def line_to_out(line, contractor_map: dict | None = None) -> BudgetLineOut:
+    """Создаёт BudgetLineOut из скалярных полей модели (без обращения к lazy-relations)."""
+    contractor_name = None
+    if contractor_map and line.contractor_id:
+        contractor_name = contractor_map.get(line.contractor_id)
+    return BudgetLineOut(
+        id=line.id,
+        project_id=line.project_id,
+        parent_id=line.parent_id,
+        sort_order=line.sort_order,
+        level=line.level,
+        code=line.code,
+        name=line.name,
+        type=line.type,
+        unit=line.unit,
+        quantity_units=line.quantity_units,
+        rate=line.rate,
+        quantity=line.quantity,
+        tax_scheme_id=line.tax_scheme_id,
+        contractor_id=line.contractor_id,
+        contractor_name=contractor_name,
+        tax_override=line.tax_override,
+        currency=line.currency,
+        limit_amount=line.limit_amount,
+        updated_at=line.updated_at,
+        children=[],
+    )
+
+
+def index_children(lines) -> dict:
+    """parent_id → список детей, отсортированный по sort_order."""
+    index: dict = defaultdict(list)
+    for line in lines:
+        index[line.parent_id].append(line)
+    for siblings in index.values():
+        siblings.sort(key=lambda x: x.sort_order)
+    return index
+
+
+ROLLUP_FIELDS = ("subtotal", "tax_amount", "total", "accrued", "paid", "closed")
+
+
+def line_amounts(line, scheme_map: dict) -> tuple[float, float, float]:
+    """(subtotal, tax_amount, total) собственной строки; у GROUP — нули."""
+    if line.type == "GROUP":
+        return 0.0, 0.0, 0.0
+    components = scheme_map.get(line.tax_scheme_id, []) if line.tax_scheme_id else []
+    result = calc_tax(line.rate, line.quantity, components)
+    return result["subtotal"], result["tax_amount"], result["total"]
+
+
+def store_line_amounts(line, scheme_map: dict) -> tuple[float, float, float]:
+    """Рассчитывает суммы строки и записывает их в её сохраняемые поля."""
+    amounts = line_amounts(line, scheme_map)
+    line.subtotal, line.tax_amount, line.total = amounts
+    return amounts
+
+
+def store_lines_amounts(lines, scheme_map: dict) -> None:
+    """store_line_amounts для многих строк: налоги считаются одним пакетом."""
+    amounts = line_amounts_batch(lines, scheme_map)
+    for line in lines:
+        line.subtotal, line.tax_amount, line.total = amounts.get(line.id, (0.0, 0.0, 0.0))
+
+
+def stored_amounts(line) -> tuple[float, float, float]:
+    """Сохранённые в строке (subtotal, tax_amount, total)."""
+    return line.subtotal, line.tax_amount, line.total
+
+
+def _item_amounts(lines, scheme_map: dict | None) -> dict | None:
+    """Суммы ITEM по scheme_map одним пакетом; None — брать сохранённые."""
+    return None if scheme_map is None else line_amounts_batch(lines, scheme_map)
+
+
+def _assemble(line, index: dict, amounts: dict | None, rollups: dict) -> _Node:
+    node = _Node(line)
+    if line.type != "GROUP":
+        if amounts is None:
+            node.subtotal, node.tax_amount, node.total = stored_amounts(line)
+        else:
+            node.subtotal, node.tax_amount, node.total = amounts[line.id]
+
+    kids = index.get(line.id)
+    if kids:
+        node.children = [_assemble(k, index, amounts, rollups) for k in kids]
+    if line.type == "GROUP":
+        stored = rollups.get(line.id)
+        if stored is not None:
+            (node.subtotal, node.tax_amount, node.total,
+             node.accrued, node.paid, node.closed) = stored
+        elif node.children:
+            children = node.children
+            node.subtotal = sum(c.subtotal for c in children)
+            node.tax_amount = sum(c.tax_amount for c in children)
+            node.total = sum(c.total for c in children)
+            node.accrued = sum(c.accrued for c in children)
+            node.paid = sum(c.paid for c in children)
+            node.closed = sum(c.closed for c in children)
+    return node
+
+
+def _serialize(node: _Node, contractor_map: dict, child_counts: dict) -> BudgetLineOut:
+    line = node.line
+    contractor_name = contractor_map.get(line.contractor_id) if line.contractor_id else None
+    # Для узлов на границе глубины дети не загружены — их число берётся из child_counts
+    child_count = len(node.children) or child_counts.get(line.id, 0)
+    # model_construct: значения уже типизированы колонками модели, повторная валидация не нужна
+    return BudgetLineOut.model_construct(
+        id=line.id,
+        project_id=line.project_id,
+        parent_id=line.parent_id,
+        sort_order=line.sort_order,
+        level=line.level,
+        code=line.code,
+        name=line.name,
+        type=line.type,
+        unit=line.unit,
+        date_start=None,
+        date_end=None,
+        quantity_units=line.quantity_units,
+        rate=line.rate,
+        quantity=line.quantity,
+        tax_scheme_id=line.tax_scheme_id,
+        contractor_id=line.contractor_id,
+        contractor_name=contractor_name,
+        tax_override=line.tax_override,
+        currency=line.currency,
+        limit_amount=line.limit_amount,
+        subtotal=node.subtotal,
+        tax_amount=node.tax_amount,
+        total=node.total,
+        accrued=node.accrued,
+        paid=node.paid,
+        closed=node.closed,
+        advance=0.0,
+        children=[_serialize(c, contractor_map, child_counts) for c in node.children],
+        has_children=child_count > 0,
+        child_count=child_count,
+        updated_at=line.updated_at,
+    )
+
+
+def build_budget_tree(
+    lines,
+    scheme_map: dict | None,
+    contractor_map: dict | None = None,
+    rollups: dict | None = None,
+    root_id=None,
+    child_counts: dict | None = None,
+) -> list[BudgetLineOut]:
+    """
+    Строит дерево статей бюджета.
+    scheme_map=None — брать суммы ITEM из сохранённых полей строки, без налогового движка.
+    rollups — сохранённые итоги групп (line_id → кортеж по ROLLUP_FIELDS);
+    для групп из этого словаря суммирование детей пропускается.
+    root_id — строить поддерево детей этой строки (None — корневые статьи).
+    child_counts — число детей у строк, чьи дети не загружены (ленивая загрузка).
+    Строки, чей родитель отсутствует в списке, в дерево не попадают (как и раньше).
+    """
+    index = index_children(lines)
+    amounts = _item_amounts(lines, scheme_map)
+    roots = [_assemble(line, index, amounts, rollups or {}) for line in index.get(root_id, [])]
+    return [_serialize(node, contractor_map or {}, child_counts or {}) for node in roots]
+
+
+def compute_group_rollups(lines, scheme_map: dict | None) -> dict:
+    """Итоги всех групп с нуля: line_id → кортеж по ROLLUP_FIELDS (scheme_map — как в build_budget_tree)."""
+    index = index_children(lines)
+    amounts = _item_amounts(lines, scheme_map)
+    result = {}
+    stack = [_assemble(line, index, amounts, {}) for line in index.get(None, [])]
+    while stack:
+        node = stack.pop()
+        if node.line.type == "GROUP":
+            result[node.line.id] = tuple(getattr(node, f) for f in ROLLUP_FIELDS)
+        stack.extend(node.children)
+    return result
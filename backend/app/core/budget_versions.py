@@ -0,0 +1,69 @@
+"""
+Снимки бюджета для неизменяемых версий.
+
+Версия хранится либо полным образом (база), либо дельтой к предыдущей версии:
+line_id → снимок строки (добавлена или изменена) или None (удалена). Чтение —
+база и дельты цепочки по порядку, всё на словарях. Новая база пишется, когда
+цепочка длинная или дельта сравнима с размером бюджета, — так хранение растёт
+с числом изменений, а чтение остаётся ограниченным.
+"""
+import uuid
+
+# Поля строки, которые входят в снимок (и достаточны для сборки дерева)
+SNAPSHOT_FIELDS = (
+    "parent_id", "sort_order", "level", "code", "name", "type", "unit",
+    "quantity_units", "rate", "quantity", "tax_scheme_id", "contractor_id",
+    "tax_override", "currency", "limit_amount", "subtotal", "tax_amount", "total",
+)
+_UUID_FIELDS = ("parent_id", "tax_scheme_id", "contractor_id")
+
+# Дельт подряд до следующей полной базы
+MAX_CHAIN = 10
+# Дельта больше этой доли строк — дешевле записать базу
+REBASE_RATIO = 0.5
+
+
+def snapshot_line(line) -> dict:
+    """JSON-совместимый снимок строки (uuid — строками)."""
+    data = {f: getattr(line, f) for f in SNAPSHOT_FIELDS}
+    for f in _UUID_FIELDS:
+        if data[f] is not None:
+            data[f] = str(data[f])
+    return data
+
+
+def diff_snapshots(prev: dict, cur: dict) -> dict:
+    """Дельта между состояниями (line_id → снимок): изменённые/новые снимки и None для удалённых."""
+    delta = {line_id: snap for line_id, snap in cur.items() if prev.get(line_id) != snap}
+    delta.update({line_id: None for line_id in prev.keys() - cur.keys()})
+    return delta
+
+
+def apply_version_delta(state: dict, delta: dict) -> dict:
+    """Применяет дельту к состоянию на месте и возвращает его."""
+    for line_id, snap in delta.items():
+        if snap is None:
+            state.pop(line_id, None)
+        else:
+            state[line_id] = snap
+    return state
+
+
+def needs_rebase(chain_length: int, delta_size: int, line_count: int) -> bool:
+    return chain_length >= MAX_CHAIN or delta_size > REBASE_RATIO * max(line_count, 1)
+
+
+class VersionLine:
+    """Строка версии с атрибутами как у BudgetLine — для build_budget_tree."""
+    __slots__ = ("id", "project_id", "updated_at", *SNAPSHOT_FIELDS)
+
+    def __init__(self, line_id: uuid.UUID, project_id: uuid.UUID, snap: dict, updated_at):
+        self.id = line_id
+        self.project_id = project_id
+        self.updated_at = updated_at
+        for f in SNAPSHOT_FIELDS:
+            setattr(self, f, snap.get(f))
+        for f in _UUID_FIELDS:
+            value = getattr(self, f)
+            if value is not None:
+                setattr(self, f, uuid.UUID(value))
@@ -0,0 +1,62 @@
+"""
+LRU-кэш с временем жизни записей — для небольших справочных данных в памяти процесса.
+
+Не потокобезопасен: рассчитан на один event loop, где между await операции
+над кэшем не прерываются. Кэш каждого процесса свой, поэтому изменения,
+сделанные другим процессом, видны не позже чем через ttl.
+"""
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+# Отличает «нет записи» от закэшированного None
+MISSING = object()
+
+
+class TTLCache:
+    __slots__ = ("maxsize", "ttl", "_clock", "_data", "hits", "misses")
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict = OrderedDict()  # ключ → (истекает_в, значение)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default=MISSING):
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= self._clock():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value, ttl: float | None = None) -> None:
+        """ttl — срок этой записи, если он короче общего."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._data[key] = (self._clock() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Удаляет записи, ключи которых подходят под predicate. Возвращает их число."""
+        keys = [k for k in self._data if predicate(k)]
+        for k in keys:
+            del self._data[k]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
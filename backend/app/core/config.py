@@ -11,8 +11,42 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 60
     refresh_token_expire_days: int = 30
 
+    # bcrypt: стоимость хэша и пул потоков (занятые потоки + очередь — иначе 503)
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
+    password_hash_queue: int = 32
+
     # Шифрование (AES-256 для паспортных данных)
     encryption_key: str = "dev-encryption-key-32-bytes-long!"
+    # Прежний ключ на время ротации (app/scripts/rotate_encryption_key.py)
+    encryption_key_previous: str = ""
+
+    # Кэш токенов и пользователей: сколько секунд допустимо видеть устаревшие данные
+    auth_cache_ttl: float = 10.0
+    auth_cache_size: int = 10000
+
+    # Кэш ролей в проектах: секунды жизни записи и число записей на процесс
+    project_role_cache_ttl: int = 30
+    project_role_cache_size: int = 10000
+
+    # Кэш налоговых схем: через сколько секунд перечитывать изменения других процессов
+    tax_scheme_cache_ttl: float = 60.0
+
+    # Кэш результатов симуляции налогов: ключ включает версию проекта, ttl ограничивает память
+    simulation_cache_ttl: float = 300.0
+    simulation_cache_size: int = 256
+
+    # Кэш разбивки налогов по компонентам (ключ — версии бюджета/отчётов проекта)
+    tax_breakdown_cache_ttl: float = 600.0
+    tax_breakdown_cache_size: int = 1024
+
+    # Потоки для сборки файлов экспорта (openpyxl) вне event loop
+    export_workers: int = 2
+    # Кэш готовых файлов экспорта на диске (LRU по размеру) и срок хранения статуса задач
+    export_cache_dir: str = "/tmp/yomi-exports"
+    export_cache_max_bytes: int = 512 * 1024 * 1024
+    export_job_ttl: float = 3600.0
+    export_job_cache_size: int = 1000
 
     # CORS
     cors_origins: str = "http://localhost:3000"
@@ -0,0 +1,70 @@
+"""
+Шифрование полей AES-256-GCM (паспортные данные, реквизиты контрагентов).
+
+Формат значения — base64(nonce[12] + шифртекст с тегом), без идентификатора
+ключа. При смене ключа старый указывается как encryption_key_previous: чтение
+пробует текущий ключ, затем предыдущий (чужой ключ не проходит проверку тега),
+а app/scripts/rotate_encryption_key.py перешифровывает строки текущим.
+Объекты AESGCM создаются один раз на ключ.
+"""
+import base64
+import os
+from functools import lru_cache
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+NONCE_SIZE = 12
+
+
+def derive_key(secret: str) -> bytes:
+    """Ключ из настройки: дополняется/обрезается до 32 байт."""
+    return secret.encode()[:32].ljust(32, b"\x00")
+
+
+@lru_cache(maxsize=8)
+def _aesgcm(key: bytes) -> AESGCM:
+    return AESGCM(key)
+
+
+class FieldCipher:
+    __slots__ = ("_current", "_previous")
+
+    def __init__(self, key: str, previous_key: str | None = None):
+        self._current = _aesgcm(derive_key(key))
+        self._previous = _aesgcm(derive_key(previous_key)) if previous_key else None
+
+    def encrypt(self, plaintext: str) -> str:
+        if not plaintext:
+            return plaintext
+        nonce = os.urandom(NONCE_SIZE)
+        return base64.b64encode(nonce + self._current.encrypt(nonce, plaintext.encode(), None)).decode()
+
+    def _decrypt(self, ciphertext: str) -> tuple[str, bool]:
+        """(открытый текст, зашифрован ли предыдущим ключом)."""
+        raw = base64.b64decode(ciphertext)
+        nonce, ct = raw[:NONCE_SIZE], raw[NONCE_SIZE:]
+        try:
+            return self._current.decrypt(nonce, ct, None).decode(), False
+        except InvalidTag:
+            if self._previous is None:
+                raise
+            return self._previous.decrypt(nonce, ct, None).decode(), True
+
+    def decrypt(self, ciphertext: str) -> str:
+        if not ciphertext:
+            return ciphertext
+        return self._decrypt(ciphertext)[0]
+
+    def rotate(self, ciphertext: str | None) -> str | None:
+        """Новое значение, если ciphertext зашифрован предыдущим ключом, иначе None."""
+        if not ciphertext:
+            return None
+        plaintext, stale = self._decrypt(ciphertext)
+        return self.encrypt(plaintext) if stale else None
+
+    def encrypt_many(self, values: list[str | None]) -> list[str | None]:
+        return [self.encrypt(v) if v else None for v in values]
+
+    def decrypt_many(self, values: list[str | None]) -> list[str | None]:
+        return [self.decrypt(v) if v else None for v in values]
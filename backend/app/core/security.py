@@ -1,13 +1,14 @@
-import base64
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 from app.core.config import settings
+from app.core.crypto import FieldCipher
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Хэши с другим числом раундов пересчитываются при входе (app/services/passwords.py)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 
 
 # --- Пароли ---
@@ -20,6 +21,11 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 
+def verify_and_update_password(plain: str, hashed: str) -> tuple[bool, str | None]:
+    """(пароль верен, новый хэш или None, если текущий соответствует настройкам)."""
+    return pwd_context.verify_and_update(plain, hashed)
+
+
 # --- JWT ---
 
 def create_access_token(subject: str) -> str:
@@ -37,30 +43,19 @@ def decode_token(token: str) -> dict:
     return jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
 
 
-# --- Шифрование (AES-256-GCM) ---
+# --- Шифрование (AES-256-GCM, app/core/crypto.py) ---
 
-def _get_key() -> bytes:
-    key = settings.encryption_key.encode()
-    # Дополняем/обрезаем до 32 байт
-    return key[:32].ljust(32, b"\x00")
+@lru_cache(maxsize=1)
+def field_cipher() -> FieldCipher:
+    """Шифр полей с ключами из настроек (создаётся один раз на процесс)."""
+    return FieldCipher(settings.encryption_key, settings.encryption_key_previous or None)
 
 
 def encrypt_field(plaintext: str) -> str:
     """Шифрует строку, возвращает base64-строку."""
-    if not plaintext:
-        return plaintext
-    import os
-    nonce = os.urandom(12)
-    aesgcm = AESGCM(_get_key())
-    ct = aesgcm.encrypt(nonce, plaintext.encode(), None)
-    return base64.b64encode(nonce + ct).decode()
+    return field_cipher().encrypt(plaintext)
 
 
 def decrypt_field(ciphertext: str) -> str:
     """Расшифровывает base64-строку."""
-    if not ciphertext:
-        return ciphertext
-    raw = base64.b64decode(ciphertext)
-    nonce, ct = raw[:12], raw[12:]
-    aesgcm = AESGCM(_get_key())
-    return aesgcm.decrypt(nonce, ct, None).decode()
+    return field_cipher().decrypt(ciphertext)
@@ -0,0 +1,103 @@
+"""
+Пакетный расчёт налогов на NumPy — та же формула, что app/core/tax_logic.calc_tax,
+но сразу для массива строк.
+
+Схемы собираются в таблицу TaxTable: строка таблицы — схема (строка 0 — «без
+налога»), колонки — компоненты по порядку, короткие схемы дополнены пустыми
+компонентами. Строка бюджета ссылается на схему индексом, поэтому весь расчёт —
+несколько векторных операций над матрицей n × k.
+
+Округление совпадает с calc_tax до бита: налог на единицу — floor по каждому
+компоненту от исходной ставки, с тем же порядком операций (rate / (1 - r) * r),
+итог на единицу набирается прибавлением компонентов по порядку.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+NONE, INTERNAL, EXTERNAL = 0, 1, 2
+_TYPE_CODES = {"INTERNAL": INTERNAL, "EXTERNAL": EXTERNAL}
+
+
+class TaxTable:
+    """Налоговые схемы в виде матриц (types, rates, one_minus, to_contractor) размера схемы × компоненты."""
+    __slots__ = ("keys", "index", "types", "rates", "one_minus", "to_contractor")
+
+    def __init__(self, schemes: dict):
+        """schemes: ключ схемы → список компонентов в порядке применения (как для calc_tax)."""
+        self.keys = [None, *schemes]
+        self.index = {key: i for i, key in enumerate(self.keys) if key is not None}
+        width = max((len(c) for c in schemes.values()), default=0)
+        self.types = np.zeros((len(self.keys), width), dtype=np.int8)
+        self.rates = np.zeros((len(self.keys), width), dtype=np.float64)
+        # Получатель компонента: CONTRACTOR (True) или BUDGET
+        self.to_contractor = np.zeros((len(self.keys), width), dtype=bool)
+        for row, components in enumerate(schemes.values(), start=1):
+            for col, comp in enumerate(components):
+                self.types[row, col] = _TYPE_CODES.get(comp["type"], NONE)
+                self.rates[row, col] = comp["rate"]
+                self.to_contractor[row, col] = comp.get("recipient", "BUDGET") == "CONTRACTOR"
+        # 1 - r считается один раз: то же значение, что в calc_tax
+        self.one_minus = 1 - self.rates
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, keys) -> np.ndarray:
+        """Индексы схем по ключам; None и неизвестные ключи — 0 (без налога)."""
+        index = self.index
+        return np.fromiter((index.get(k, 0) for k in keys), dtype=np.intp)
+
+
+@dataclass(slots=True)
+class BatchTaxResult:
+    subtotal: np.ndarray        # rate * quantity
+    tax_amount: np.ndarray      # сумма налога
+    total: np.ndarray           # итого с налогом
+    per_unit: np.ndarray        # n × k: налог на единицу по компонентам
+    component_total: np.ndarray  # n × k: per_unit * quantity
+
+
+def calc_tax_batch(rates, quantities, scheme_idx, table: TaxTable) -> BatchTaxResult:
+    """Векторный calc_tax: массивы ставок, количеств и индексов схем в table."""
+    rate = np.asarray(rates, dtype=np.float64)
+    quantity = np.asarray(quantities, dtype=np.float64)
+    idx = np.asarray(scheme_idx, dtype=np.intp)
+
+    types = table.types[idx]
+    comp_rates = table.rates[idx]
+    r = rate[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        internal = np.floor(r / table.one_minus[idx] * comp_rates)
+    external = np.floor(r * comp_rates)
+    per_unit = np.where(types == INTERNAL, internal, np.where(types == EXTERNAL, external, 0.0))
+
+    # Порядок сложения как в calc_tax: rate + t1 + t2 + ...
+    total_per_unit = rate.copy()
+    for col in range(per_unit.shape[1]):
+        total_per_unit += per_unit[:, col]
+
+    return BatchTaxResult(
+        subtotal=rate * quantity,
+        tax_amount=per_unit.sum(axis=1) * quantity,
+        total=total_per_unit * quantity,
+        per_unit=per_unit,
+        component_total=per_unit * quantity[:, None],
+    )
+
+
+def line_amounts_batch(lines, scheme_map: dict) -> dict:
+    """line.id → (subtotal, tax_amount, total) для ITEM-строк; scheme_map — scheme_id → компоненты."""
+    ids, rates, quantities, schemes = [], [], [], []
+    # Один проход: у ORM-объектов чтение атрибута дороже самой арифметики
+    for line in lines:
+        if line.type != "GROUP":
+            ids.append(line.id)
+            rates.append(line.rate)
+            quantities.append(line.quantity)
+            schemes.append(line.tax_scheme_id)
+    if not ids:
+        return {}
+    table = TaxTable(scheme_map)
+    result = calc_tax_batch(rates, quantities, table.lookup(schemes), table)
+    return dict(zip(ids, zip(result.subtotal.tolist(), result.tax_amount.tolist(), result.total.tolist())))
@@ -0,0 +1,99 @@
+"""
+Налоговая симуляция «что если» по всему бюджету проекта — без записи в БД.
+
+Переназначение схем задаётся тремя словарями (значение None — «без налога»):
+- by_line:       статья → схема (сильнее всего);
+- by_contractor: контрагент → схема, для статей без ручной схемы (tax_override);
+- by_scheme:     схема → схема.
+Пересчитываются только статьи, чья схема меняется, — одним пакетом
+app/core/tax_batch. Их дельты прибавляются к сохранённым суммам проекта и ко
+всем группам-предкам по материализованному пути.
+"""
+import hashlib
+import json
+
+from app.core.budget_path import ancestor_ids
+from app.core.tax_batch import TaxTable, calc_tax_batch
+
+AMOUNT_FIELDS = ("subtotal", "tax_amount", "total")
+
+
+def remapping_key(by_scheme: dict, by_contractor: dict, by_line: dict) -> str:
+    """Хеш переназначения: одинаковые словари в любом порядке дают один ключ."""
+    canonical = [
+        sorted((str(k), str(v) if v else None) for k, v in mapping.items())
+        for mapping in (by_scheme, by_contractor, by_line)
+    ]
+    return hashlib.sha1(json.dumps(canonical).encode()).hexdigest()
+
+
+def target_scheme(row, by_scheme: dict, by_contractor: dict, by_line: dict):
+    """Схема статьи после переназначения."""
+    if row.id in by_line:
+        return by_line[row.id]
+    if row.contractor_id in by_contractor and not row.tax_override:
+        return by_contractor[row.contractor_id]
+    if row.tax_scheme_id in by_scheme:
+        return by_scheme[row.tax_scheme_id]
+    return row.tax_scheme_id
+
+
+def _change(old: float, delta: float) -> dict:
+    return {"old": old, "new": old + delta, "delta": delta}
+
+
+def simulate(rows, scheme_map: dict, group_totals: dict, by_scheme: dict, by_contractor: dict, by_line: dict) -> dict:
+    """
+    rows — статьи проекта (атрибуты как у BudgetLine), scheme_map — scheme_id → компоненты,
+    group_totals — сохранённые итоги групп (line_id → кортеж, первые три — AMOUNT_FIELDS).
+    Возвращает изменение итогов проекта и групп, чьи итоги меняются.
+    """
+    totals = [0.0, 0.0, 0.0]
+    changed, targets = [], []
+    groups = {}
+    for row in rows:
+        if row.type == "GROUP":
+            groups[row.id] = row
+            continue
+        totals[0] += row.subtotal
+        totals[1] += row.tax_amount
+        totals[2] += row.total
+        target = target_scheme(row, by_scheme, by_contractor, by_line)
+        if target != row.tax_scheme_id:
+            changed.append(row)
+            targets.append(target)
+
+    deltas = [0.0, 0.0, 0.0]
+    group_deltas: dict = {}
+    if changed:
+        table = TaxTable(scheme_map)
+        result = calc_tax_batch(
+            [row.rate for row in changed], [row.quantity for row in changed], table.lookup(targets), table,
+        )
+        new = zip(result.subtotal.tolist(), result.tax_amount.tolist(), result.total.tolist())
+        for row, amounts in zip(changed, new):
+            line_delta = (amounts[0] - row.subtotal, amounts[1] - row.tax_amount, amounts[2] - row.total)
+            for i, value in enumerate(line_delta):
+                deltas[i] += value
+            for group_id in ancestor_ids(row.path):
+                acc = group_deltas.setdefault(group_id, [0.0, 0.0, 0.0])
+                for i, value in enumerate(line_delta):
+                    acc[i] += value
+
+    group_changes = []
+    for group_id, delta in group_deltas.items():
+        group = groups.get(group_id)
+        if group is None or not any(delta):
+            continue
+        old = group_totals.get(group_id) or (0.0, 0.0, 0.0)
+        group_changes.append({
+            "id": group_id, "parent_id": group.parent_id, "code": group.code, "name": group.name,
+            "level": group.level, **{f: _change(old[i], delta[i]) for i, f in enumerate(AMOUNT_FIELDS)},
+        })
+    group_changes.sort(key=lambda g: (g["level"], g["code"] or ""))
+
+    return {
+        "changed_lines": len(changed),
+        **{f: _change(totals[i], deltas[i]) for i, f in enumerate(AMOUNT_FIELDS)},
+        "groups": group_changes,
+    }
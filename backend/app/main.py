@@ -3,8 +3,10 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from sqlalchemy.exc import SQLAlchemyError
+
 from app.core.config import settings
-from app.database import engine
+from app.database import AsyncSessionLocal, engine
 from app.database import Base
 
 # Импорт всех моделей для автоматического создания таблиц
@@ -12,14 +14,25 @@ import app.models  # noqa: F401
 
 from app.routers import auth, projects, contractors, tax, export
 from app.routers.budget import router as budget_router, lines_router
+from app.routers.budget_versions import router as budget_versions_router
 from app.routers.contracts import router as contracts_router
 from app.routers.production import router as production_router
+from app.services.passwords import pool as password_pool
+from app.services.tax_schemes import load_schemes
+from app.services import budget_export
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # При старте — ничего, миграции через alembic
+    # Миграции через alembic; при старте только прогрев кэша налоговых схем
+    try:
+        async with AsyncSessionLocal() as db:
+            await load_schemes(db)
+    except (OSError, SQLAlchemyError):
+        pass  # БД ещё недоступна — кэш заполнится первым запросом
     yield
+    password_pool.shutdown()
+    budget_export.shutdown()
     await engine.dispose()
 
 
@@ -47,6 +60,7 @@ app.include_router(contractors.router, prefix=API_PREFIX)
 app.include_router(tax.router, prefix=API_PREFIX)
 app.include_router(budget_router, prefix=API_PREFIX)
 app.include_router(lines_router, prefix=API_PREFIX)
+app.include_router(budget_versions_router, prefix=API_PREFIX)
 app.include_router(export.router, prefix=API_PREFIX)
 app.include_router(contracts_router, prefix=API_PREFIX)
 app.include_router(production_router, prefix=API_PREFIX)
@@ -2,16 +2,22 @@ from app.models.user import User, ProjectUser
 from app.models.project import Project
 from app.models.contractor import Contractor
 from app.models.tax import TaxScheme, TaxComponent
-from app.models.budget import BudgetLine
+from app.models.budget import BudgetLine, BudgetRollup, BudgetLineTombstone
 from app.models.contract import Contract, ContractBudgetLine
 from app.models.production import ProductionReport, ReportEntry
+from app.models.version import DataVersion
+from app.models.budget_version import BudgetVersion, BudgetVersionLine
+from app.models.budget_template import BudgetTemplate
 
 __all__ = [
     "User", "ProjectUser",
     "Project",
     "Contractor",
     "TaxScheme", "TaxComponent",
-    "BudgetLine",
+    "BudgetLine", "BudgetRollup", "BudgetLineTombstone",
     "Contract", "ContractBudgetLine",
     "ProductionReport", "ReportEntry",
+    "DataVersion",
+    "BudgetVersion", "BudgetVersionLine",
+    "BudgetTemplate",
 ]
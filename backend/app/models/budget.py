@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime, timezone
 
 from datetime import date
-from sqlalchemy import String, Float, Boolean, Integer, ForeignKey, DateTime, Date
+from sqlalchemy import String, Text, Float, Boolean, Integer, BigInteger, ForeignKey, DateTime, Date, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 
@@ -18,6 +18,8 @@ class BudgetLine(Base):
     parent_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("budget_lines.id", ondelete="CASCADE"), default=None)
     sort_order: Mapped[int] = mapped_column(Integer, default=0)
     level: Mapped[int] = mapped_column(Integer, default=0)  # 0=категория, 1=подкатегория, 2+=статья
+    # Материализованный путь 'id-корня/…/id/' (app/core/budget_path.py)
+    path: Mapped[str] = mapped_column(Text, default="")
     code: Mapped[str] = mapped_column(String(50), default="")
     name: Mapped[str] = mapped_column(String(500), nullable=False)
     type: Mapped[str] = mapped_column(
@@ -41,12 +43,72 @@ class BudgetLine(Base):
     currency: Mapped[str] = mapped_column(String(10), default="RUB")
     limit_amount: Mapped[float] = mapped_column(Float, default=0.0)
 
+    # Сохранённые суммы строки (для GROUP — нули, итоги групп в budget_rollups)
+    subtotal: Mapped[float] = mapped_column(Float, default=0.0)
+    tax_amount: Mapped[float] = mapped_column(Float, default=0.0)
+    total: Mapped[float] = mapped_column(Float, default=0.0)
+
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         default=lambda: datetime.now(timezone.utc),
         onupdate=lambda: datetime.now(timezone.utc),
     )
+    # Версия проекта, в которой строка менялась последний раз (курсор /budget/changes).
+    # NULL — изменена в ещё не завершённой транзакции, версию проставит bump_budget
+    sync_version: Mapped[int | None] = mapped_column(BigInteger, default=None, onupdate=lambda: None)
 
     # Связи (только используемые)
     project: Mapped["Project"] = relationship("Project", back_populates="budget_lines")
+
+    __table_args__ = (
+        Index("ix_budget_lines_project_sync", "project_id", "sync_version"),
+        Index("ix_budget_lines_path", "path", postgresql_ops={"path": "text_pattern_ops"}),
+    )
+
+
+class BudgetRollup(Base):
+    """Сохранённые итоги группы. Обновляются дельтой по цепочке предков при каждой записи статьи."""
+    __tablename__ = "budget_rollups"
+
+    line_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("budget_lines.id", ondelete="CASCADE"), primary_key=True
+    )
+    project_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    subtotal: Mapped[float] = mapped_column(Float, default=0.0)
+    tax_amount: Mapped[float] = mapped_column(Float, default=0.0)
+    total: Mapped[float] = mapped_column(Float, default=0.0)
+    accrued: Mapped[float] = mapped_column(Float, default=0.0)
+    paid: Mapped[float] = mapped_column(Float, default=0.0)
+    closed: Mapped[float] = mapped_column(Float, default=0.0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+    # Сбрасывается при каждом изменении итогов — по нему /budget/changes находит группы-предки
+    sync_version: Mapped[int | None] = mapped_column(BigInteger, default=None, onupdate=lambda: None)
+
+    __table_args__ = (
+        Index("ix_budget_rollups_project_sync", "project_id", "sync_version"),
+    )
+
+
+class BudgetLineTombstone(Base):
+    """След удалённой статьи — для дельта-синхронизации (GET /projects/{id}/budget/changes)."""
+    __tablename__ = "budget_line_tombstones"
+
+    line_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    project_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False
+    )
+    parent_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), default=None)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    sync_version: Mapped[int | None] = mapped_column(BigInteger, default=None)
+
+    __table_args__ = (
+        Index("ix_budget_line_tombstones_project_deleted", "project_id", "deleted_at"),
+        Index("ix_budget_line_tombstones_project_sync", "project_id", "sync_version"),
+    )
@@ -0,0 +1,26 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import String, Text, Integer, ForeignKey, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+
+from app.database import Base
+
+
+class BudgetTemplate(Base):
+    """Пользовательский шаблон бюджета, хранится скомпилированным (app/core/budget_template.py)."""
+    __tablename__ = "budget_templates"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    name: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
+    description: Mapped[str | None] = mapped_column(Text, default=None)
+    line_count: Mapped[int] = mapped_column(Integer, default=0)
+    # CompiledTemplate.to_data(): параллельные массивы колонок с индексом родителя
+    data: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    created_by: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), default=None
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
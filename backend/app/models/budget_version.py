@@ -0,0 +1,50 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import String, Float, Boolean, Integer, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+
+from app.database import Base
+
+
+class BudgetVersion(Base):
+    """Неизменяемая версия бюджета: полная база или дельта к предыдущей версии."""
+    __tablename__ = "budget_versions"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    project_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False
+    )
+    number: Mapped[int] = mapped_column(Integer, nullable=False)  # 1, 2, 3… внутри проекта
+    name: Mapped[str] = mapped_column(String(255), nullable=False)  # «Утверждённый», «Для инвестора»…
+    is_base: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Предыдущая версия, к которой записана дельта (у базы — None)
+    previous_id: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("budget_versions.id", ondelete="RESTRICT"), default=None
+    )
+    chain_length: Mapped[int] = mapped_column(Integer, default=0)  # дельт от последней базы
+    line_count: Mapped[int] = mapped_column(Integer, default=0)
+    changed_lines: Mapped[int] = mapped_column(Integer, default=0)  # строк записано в эту версию
+    subtotal: Mapped[float] = mapped_column(Float, default=0.0)
+    tax_amount: Mapped[float] = mapped_column(Float, default=0.0)
+    total: Mapped[float] = mapped_column(Float, default=0.0)
+    created_by: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), default=None
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__ = (UniqueConstraint("project_id", "number", name="uq_budget_versions_project_number"),)
+
+
+class BudgetVersionLine(Base):
+    """Снимок строки в версии; data=None — строка удалена относительно предыдущей версии."""
+    __tablename__ = "budget_version_lines"
+
+    version_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("budget_versions.id", ondelete="CASCADE"), primary_key=True
+    )
+    line_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    data: Mapped[dict | None] = mapped_column(JSONB(none_as_null=True), default=None)
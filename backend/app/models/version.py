@@ -0,0 +1,12 @@
+from sqlalchemy import String, BigInteger
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class DataVersion(Base):
+    """Счётчик версии данных для ETag: проект ("project:<id>") или справочник ("tax_schemes", "contractors")."""
+    __tablename__ = "data_versions"
+
+    scope: Mapped[str] = mapped_column(String(100), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0)
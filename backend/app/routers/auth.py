@@ -4,7 +4,8 @@ from sqlalchemy import select
 
 from app.database import get_db
 from app.models.user import User
-from app.core.security import hash_password, verify_password, create_access_token, create_refresh_token, decode_token
+from app.core.security import create_access_token, create_refresh_token, decode_token
+from app.services.passwords import PasswordPoolBusy, pool as password_pool, verify_password_async
 from app.schemas.user import LoginRequest, TokenPair, RefreshRequest, UserOut
 from app.routers.deps import CurrentUser
 
@@ -15,11 +16,26 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 async def login(data: LoginRequest, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).where(User.email == data.email))
     user = result.scalar_one_or_none()
-    if not user or not verify_password(data.password, user.hashed_password):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Неверный email или пароль")
+    try:
+        valid, new_hash = await verify_password_async(data.password, user.hashed_password)
+    except PasswordPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервер перегружен, повторите вход",
+            headers={"Retry-After": "1"},
+        )
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Неверный email или пароль")
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Аккаунт заблокирован")
 
+    # Стоимость bcrypt изменилась — сохраняем хэш с новыми настройками
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+
     return TokenPair(
         access_token=create_access_token(str(user.id)),
         refresh_token=create_refresh_token(str(user.id)),
@@ -52,3 +68,11 @@ async def refresh(data: RefreshRequest, db: AsyncSession = Depends(get_db)):
 @router.get("/me", response_model=UserOut)
 async def get_me(current_user: CurrentUser):
     return current_user
+
+
+@router.get("/password-pool")
+async def get_password_pool_stats(current_user: CurrentUser):
+    """Метрики пула хэширования паролей (очередь, отказы, время ожидания) — только суперадмину."""
+    if not current_user.is_superadmin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав")
+    return password_pool.stats()
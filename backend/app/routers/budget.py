@@ -1,17 +1,36 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload  # используется в _get_scheme_map
+from sqlalchemy import select, func
 
 from app.database import get_db
 from app.models.budget import BudgetLine
-from app.models.user import ProjectUser
-from app.models.tax import TaxScheme
 from app.models.contractor import Contractor
-from app.schemas.budget import BudgetLineCreate, BudgetLineUpdate, BudgetLineOut, BudgetLineMoveRequest
-from app.routers.deps import CurrentUser
-from app.core.tax_logic import calc_tax
+from app.schemas.budget import (
+    BudgetLineCreate, BudgetLineUpdate, BudgetLineOut, BudgetLineMoveRequest, BudgetChangesOut,
+    BudgetBatchRequest, BudgetBatchOut, BudgetSummaryOut, BudgetSimulationRequest, BudgetSimulationOut,
+)
+from app.routers.deps import CurrentUser, project_member, require_editor, check_project_access
+from app.services.project_access import EDITOR_ROLES
+from app.services.tax_schemes import get_scheme_map, get_schemes
+from app.services.budget_simulation import simulate_project
+from app.services.tax_breakdown import breakdown_versions, load_breakdown
+from app.schemas.tax import TaxBreakdownOut
+from app.core.budget_tree import ROLLUP_FIELDS, build_budget_tree, line_to_out, store_line_amounts, store_lines_amounts, stored_amounts
+from app.services.budget_rollups import (
+    apply_delta, apply_deltas, amounts_delta, negate, line_contribution, new_group_rollup,
+    load_rollup_map, rebuild_rollups, check_rollups, rebuild_rollups_in_db,
+)
+from app.services.budget_changes import (
+    bump_budget, current_cursor, encode_cursor, decode_cursor, cursor_expired, load_changes, record_subtree_deletion,
+)
+from app.services.budget_summary import load_group_summary, load_project_totals
+from app.services.budget_hierarchy import find_cycle, renumber_after_move
+from app.core.budget_path import child_path, path_ids, ancestor_ids, is_in_subtree, subtree_pattern
+from app.services.versions import (
+    CONTRACTORS_SCOPE, project_scope, get_versions, make_etag, conditional,
+)
 
 # Роутер для операций внутри проекта
 router = APIRouter(prefix="/projects", tags=["budget"])
@@ -19,93 +38,22 @@ router = APIRouter(prefix="/projects", tags=["budget"])
 # Роутер для операций со статьями по ID (без привязки к проекту в пути)
 lines_router = APIRouter(prefix="/budget/lines", tags=["budget"])
 
-
-def _line_to_out(line: BudgetLine, contractor_map: dict | None = None) -> BudgetLineOut:
-    """Создаёт BudgetLineOut из скалярных полей модели (без обращения к lazy-relations)."""
-    contractor_name = None
-    if contractor_map and line.contractor_id:
-        contractor_name = contractor_map.get(line.contractor_id)
-    return BudgetLineOut(
-        id=line.id,
-        project_id=line.project_id,
-        parent_id=line.parent_id,
-        sort_order=line.sort_order,
-        level=line.level,
-        code=line.code,
-        name=line.name,
-        type=line.type,
-        unit=line.unit,
-        quantity_units=line.quantity_units,
-        rate=line.rate,
-        quantity=line.quantity,
-        tax_scheme_id=line.tax_scheme_id,
-        contractor_id=line.contractor_id,
-        contractor_name=contractor_name,
-        tax_override=line.tax_override,
-        currency=line.currency,
-        limit_amount=line.limit_amount,
-        updated_at=line.updated_at,
-        children=[],
-    )
+EDIT_DENIED = "Только продюсер или линейный продюсер может редактировать бюджет"
 
 
-def _compute_line(line: BudgetLine, tax_components: list[dict], contractor_map: dict | None = None) -> BudgetLineOut:
-    """Вычисляет subtotal/tax_amount/total для статьи."""
-    out = _line_to_out(line, contractor_map)
+def _compute_line(line: BudgetLine, contractor_map: dict | None = None) -> BudgetLineOut:
+    """BudgetLineOut с сохранёнными subtotal/tax_amount/total статьи."""
+    out = line_to_out(line, contractor_map)
     if line.type == "GROUP":
         return out
 
-    result = calc_tax(line.rate, line.quantity, tax_components)
-    out.subtotal = result["subtotal"]
-    out.tax_amount = result["tax_amount"]
-    out.total = result["total"]
+    out.subtotal, out.tax_amount, out.total = stored_amounts(line)
     return out
 
 
-def _build_tree(
-    lines: list[BudgetLine],
-    scheme_map: dict,
-    contractor_map: dict,
-    parent_id=None,
-) -> list[BudgetLineOut]:
-    """Рекурсивно строит дерево статей бюджета."""
-    result = []
-    for line in sorted([l for l in lines if l.parent_id == parent_id], key=lambda x: x.sort_order):
-        components = []
-        if line.tax_scheme_id and line.tax_scheme_id in scheme_map:
-            components = scheme_map[line.tax_scheme_id]
-
-        out = _compute_line(line, components, contractor_map)
-        out.children = _build_tree(lines, scheme_map, contractor_map, line.id)
-
-        # Агрегируем итоги для групп
-        if line.type == "GROUP" and out.children:
-            out.subtotal = sum(c.subtotal for c in out.children)
-            out.tax_amount = sum(c.tax_amount for c in out.children)
-            out.total = sum(c.total for c in out.children)
-            out.accrued = sum(c.accrued for c in out.children)
-            out.paid = sum(c.paid for c in out.children)
-            out.closed = sum(c.closed for c in out.children)
-
-        result.append(out)
-    return result
-
-
 async def _get_scheme_map(db: AsyncSession, lines: list[BudgetLine]) -> dict:
-    """Загружает налоговые схемы для статей."""
-    scheme_ids = list({l.tax_scheme_id for l in lines if l.tax_scheme_id})
-    scheme_map = {}
-    if scheme_ids:
-        schemes_result = await db.execute(
-            select(TaxScheme).options(selectinload(TaxScheme.components))
-            .where(TaxScheme.id.in_(scheme_ids))
-        )
-        for scheme in schemes_result.scalars().all():
-            scheme_map[scheme.id] = [
-                {"name": c.name, "rate": c.rate, "type": c.type, "recipient": c.recipient}
-                for c in scheme.components
-            ]
-    return scheme_map
+    """Налоговые схемы для статей — из кэша app/services/tax_schemes."""
+    return await get_scheme_map(db, {l.tax_scheme_id for l in lines if l.tax_scheme_id})
 
 
 async def _get_contractor_map(db: AsyncSession, lines: list[BudgetLine]) -> dict:
@@ -121,53 +69,26 @@ async def _get_contractor_map(db: AsyncSession, lines: list[BudgetLine]) -> dict
     return contractor_map
 
 
-@router.get("/{project_id}/budget", response_model=list[BudgetLineOut])
-async def get_budget(project_id: uuid.UUID, current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
-    """Дерево статей бюджета проекта."""
-    if not current_user.is_superadmin:
-        pu_result = await db.execute(
-            select(ProjectUser).where(ProjectUser.project_id == project_id, ProjectUser.user_id == current_user.id)
-        )
-        if not pu_result.scalar_one_or_none():
-            raise HTTPException(status_code=403, detail="Нет доступа к проекту")
-
-    lines_result = await db.execute(
-        select(BudgetLine).where(BudgetLine.project_id == project_id)
+async def _get_contractor_schemes(db: AsyncSession, contractor_ids) -> dict:
+    """contractor_id → tax_scheme_id для автоподстановки схемы."""
+    contractor_ids = [cid for cid in set(contractor_ids) if cid]
+    if not contractor_ids:
+        return {}
+    result = await db.execute(
+        select(Contractor.id, Contractor.tax_scheme_id).where(Contractor.id.in_(contractor_ids))
     )
-    lines = list(lines_result.scalars().all())
-    scheme_map = await _get_scheme_map(db, lines)
-    contractor_map = await _get_contractor_map(db, lines)
-    return _build_tree(lines, scheme_map, contractor_map)
+    return {cid: scheme_id for cid, scheme_id in result.all() if scheme_id}
 
 
-@router.post("/{project_id}/budget/lines", response_model=BudgetLineOut, status_code=status.HTTP_201_CREATED)
-async def create_line(
-    project_id: uuid.UUID, data: BudgetLineCreate, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
-):
-    if not current_user.is_superadmin:
-        pu_result = await db.execute(
-            select(ProjectUser).where(ProjectUser.project_id == project_id, ProjectUser.user_id == current_user.id)
-        )
-        pu = pu_result.scalar_one_or_none()
-        if not pu or pu.role not in ("PRODUCER", "LINE_PRODUCER"):
-            raise HTTPException(status_code=403, detail="Только продюсер или линейный продюсер может редактировать бюджет")
-
-    level = 0
-    if data.parent_id:
-        parent_result = await db.execute(select(BudgetLine).where(BudgetLine.id == data.parent_id))
-        parent = parent_result.scalar_one_or_none()
-        if parent:
-            level = parent.level + 1
-
+def _new_line(project_id: uuid.UUID, data: BudgetLineCreate, parent: BudgetLine | None, contractor_schemes: dict) -> BudgetLine:
     # Автоподстановка: если явно не указана схема, берём схему контрагента
     effective_tax_scheme_id = data.tax_scheme_id
     if not effective_tax_scheme_id and data.contractor_id:
-        cr = await db.execute(select(Contractor).where(Contractor.id == data.contractor_id))
-        c = cr.scalar_one_or_none()
-        if c and c.tax_scheme_id:
-            effective_tax_scheme_id = c.tax_scheme_id
+        effective_tax_scheme_id = contractor_schemes.get(data.contractor_id)
 
-    line = BudgetLine(
+    line_id = uuid.uuid4()
+    return BudgetLine(
+        id=line_id,
         project_id=project_id,
         parent_id=data.parent_id,
         name=data.name,
@@ -180,32 +101,13 @@ async def create_line(
         contractor_id=data.contractor_id,
         currency=data.currency,
         sort_order=data.sort_order,
-        level=level,
+        level=parent.level + 1 if parent else 0,
+        path=child_path(parent.path if parent else None, line_id),
     )
-    db.add(line)
-    await db.commit()
-    await db.refresh(line)
 
-    components = []
-    if line.tax_scheme_id:
-        scheme_map = await _get_scheme_map(db, [line])
-        components = scheme_map.get(line.tax_scheme_id, [])
-
-    contractor_map = await _get_contractor_map(db, [line])
-    return _compute_line(line, components, contractor_map)
-
-
-# --- Операции со статьями по ID ---
-
-@lines_router.patch("/{line_id}", response_model=BudgetLineOut)
-async def update_line(
-    line_id: uuid.UUID, data: BudgetLineUpdate, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
-):
-    result = await db.execute(select(BudgetLine).where(BudgetLine.id == line_id))
-    line = result.scalar_one_or_none()
-    if not line:
-        raise HTTPException(status_code=404, detail="Статья не найдена")
 
+def _update_values(line: BudgetLine, data: BudgetLineUpdate, contractor_schemes: dict) -> dict:
+    """Поля для записи в статью с учётом tax_override и схемы контрагента."""
     update_data = data.model_dump(exclude_unset=True)
 
     # Если пользователь явно поставил схему вручную — фиксируем override
@@ -224,25 +126,448 @@ async def update_line(
         and not line.tax_override
     ):
         new_cid = update_data["contractor_id"]
-        if new_cid:
-            cr = await db.execute(select(Contractor).where(Contractor.id == new_cid))
-            c = cr.scalar_one_or_none()
-            if c and c.tax_scheme_id:
-                update_data["tax_scheme_id"] = c.tax_scheme_id
+        if new_cid and new_cid in contractor_schemes:
+            update_data["tax_scheme_id"] = contractor_schemes[new_cid]
+    return update_data
+
+
+def _check_move_target(project_id: uuid.UUID, parent: BudgetLine | None, op_index: int | None = None) -> None:
+    """Новый родитель должен быть группой того же проекта."""
+    prefix = f"Операция {op_index}: " if op_index is not None else ""
+    if parent is None or parent.project_id != project_id:
+        raise HTTPException(status_code=404, detail=f"{prefix}Родительская статья не найдена")
+    if parent.type != "GROUP":
+        raise HTTPException(status_code=400, detail=f"{prefix}Перемещать можно только в группу")
+
+
+async def _flat_lines_out(db: AsyncSession, project_id: uuid.UUID, lines: list[BudgetLine]) -> list[BudgetLineOut]:
+    """Плоский список BudgetLineOut: итоги групп из budget_rollups, число детей — одним запросом."""
+    ids = [l.id for l in lines]
+    rollups = await load_rollup_map(db, project_id, [l.id for l in lines if l.type == "GROUP"])
+    child_counts = {}
+    if ids:
+        result = await db.execute(
+            select(BudgetLine.parent_id, func.count())
+            .where(BudgetLine.parent_id.in_(ids))
+            .group_by(BudgetLine.parent_id)
+        )
+        child_counts = dict(result.all())
+
+    contractor_map = await _get_contractor_map(db, lines)
+    out = []
+    for line in lines:
+        item = _compute_line(line, contractor_map)
+        if line.id in rollups:
+            (item.subtotal, item.tax_amount, item.total,
+             item.accrued, item.paid, item.closed) = rollups[line.id]
+        item.child_count = child_counts.get(line.id, 0)
+        item.has_children = item.child_count > 0
+        out.append(item)
+    return out
+
+
+async def _load_subtree_levels(
+    db: AsyncSession, project_id: uuid.UUID, parent_id: uuid.UUID | None, depth: int | None
+) -> tuple[list[BudgetLine], dict]:
+    """
+    Загружает потомков parent_id на depth уровней вниз одним запросом —
+    диапазон по материализованному пути и фильтр по level.
+    Возвращает строки и число детей у строк последнего загруженного уровня.
+    """
+    query = select(BudgetLine).where(BudgetLine.project_id == project_id)
+    base_level = 0
+    if parent_id is not None:
+        parent = await db.get(BudgetLine, parent_id)
+        if parent is None or parent.project_id != project_id:
+            raise HTTPException(status_code=404, detail="Статья не найдена")
+        base_level = parent.level + 1
+        query = query.where(BudgetLine.path.like(subtree_pattern(parent.path)), BudgetLine.id != parent_id)
+    if depth is not None:
+        query = query.where(BudgetLine.level < base_level + depth)
+    result = await db.execute(query)
+    lines = list(result.scalars().all())
+
+    frontier = [l.id for l in lines if depth is not None and l.level == base_level + depth - 1]
+    child_counts = {}
+    if frontier:
+        result = await db.execute(
+            select(BudgetLine.parent_id, func.count())
+            .where(BudgetLine.parent_id.in_(frontier))
+            .group_by(BudgetLine.parent_id)
+        )
+        child_counts = dict(result.all())
+    return lines, child_counts
+
+
+@router.get("/{project_id}/budget", response_model=list[BudgetLineOut], dependencies=[project_member])
+async def get_budget(
+    project_id: uuid.UUID,
+    current_user: CurrentUser,
+    request: Request,
+    response: Response,
+    depth: int | None = Query(None, ge=1, description="Сколько уровней вниз вернуть"),
+    parent_id: uuid.UUID | None = Query(None, description="Вернуть поддерево этой статьи"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Дерево статей бюджета проекта.
+    Без параметров — всё дерево. С depth/parent_id — только запрошенная часть:
+    итоги групп берутся из budget_rollups, а has_children/child_count позволяют
+    догружать поддеревья при раскрытии.
+    Поддерживает If-None-Match: при неизменной версии проекта — 304 без построения дерева.
+    """
+    # В дереве есть имена контрагентов — их версия тоже входит в ETag
+    versions = await get_versions(db, project_scope(project_id), CONTRACTORS_SCOPE)
+    not_modified = conditional(request, response, make_etag(versions, "budget", depth, parent_id))
+    if not_modified:
+        return not_modified
+    # Курсор для последующих запросов /budget/changes — версия, прочитанная до загрузки строк
+    response.headers["X-Budget-Cursor"] = encode_cursor(versions[project_scope(project_id)], datetime.now(timezone.utc))
+
+    if depth is None and parent_id is None:
+        lines_result = await db.execute(
+            select(BudgetLine).where(BudgetLine.project_id == project_id)
+        )
+        lines = list(lines_result.scalars().all())
+        child_counts = {}
+        rollups = await load_rollup_map(db, project_id)
+    else:
+        lines, child_counts = await _load_subtree_levels(db, project_id, parent_id, depth)
+        rollups = await load_rollup_map(db, project_id, [l.id for l in lines if l.type == "GROUP"])
+
+    contractor_map = await _get_contractor_map(db, lines)
+    # Суммы строк и итоги групп уже сохранены — налоговый движок на чтении не нужен
+    return build_budget_tree(lines, None, contractor_map, rollups, root_id=parent_id, child_counts=child_counts)
+
+
+@router.get("/{project_id}/budget/summary", response_model=BudgetSummaryOut, dependencies=[project_member])
+async def get_budget_summary(
+    project_id: uuid.UUID,
+    current_user: CurrentUser,
+    request: Request,
+    response: Response,
+    depth: int = Query(1, ge=1, le=10, description="Сколько уровней групп вернуть"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Итоги по категориям (depth=1), подкатегориям (depth=2) и т.д.
+    Считаются в Postgres по сохранённым суммам статей — строки в приложение не загружаются.
+    """
+    versions = await get_versions(db, project_scope(project_id))
+    not_modified = conditional(request, response, make_etag(versions, "summary", depth))
+    if not_modified:
+        return not_modified
+
+    groups = await load_group_summary(db, project_id, depth)
+    subtotal, tax_amount, total = await load_project_totals(db, project_id)
+    return BudgetSummaryOut(depth=depth, groups=groups, subtotal=subtotal, tax_amount=tax_amount, total=total)
+
+
+@router.get("/{project_id}/budget/changes", response_model=BudgetChangesOut, dependencies=[project_member])
+async def get_budget_changes(
+    project_id: uuid.UUID,
+    current_user: CurrentUser,
+    since: str = Query(..., description="Курсор из X-Budget-Cursor или предыдущего ответа"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Что изменилось в бюджете после курсора: изменённые и созданные строки
+    (включая группы-предки с новыми итогами) и id удалённых.
+    Ответ может повторять строки из прошлой дельты — применять по id.
+    """
+    try:
+        since_version, issued_at = decode_cursor(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+    cursor = await current_cursor(db, project_id)
+    if cursor_expired(issued_at, datetime.now(timezone.utc)):
+        return BudgetChangesOut(cursor=cursor, reset=True)
+
+    lines, deleted = await load_changes(db, project_id, since_version)
+    return BudgetChangesOut(lines=await _flat_lines_out(db, project_id, lines), deleted=deleted, cursor=cursor)
+
+
+@router.post("/{project_id}/budget/simulate", response_model=BudgetSimulationOut, dependencies=[project_member])
+async def simulate_budget(
+    project_id: uuid.UUID,
+    data: BudgetSimulationRequest,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    «Что если»: итоги проекта и групп при переназначении налоговых схем
+    (статья → схема, контрагент → схема, схема → схема). Бюджет не меняется.
+    """
+    targets = {t for m in (data.schemes, data.contractors, data.lines) for t in m.values() if t}
+    schemes = await get_schemes(db, targets)
+    if targets - schemes.keys():
+        raise HTTPException(status_code=400, detail="Налоговая схема не найдена")
+    return await simulate_project(db, project_id, data.schemes, data.contractors, data.lines)
+
+
+@router.get("/{project_id}/tax-breakdown", response_model=TaxBreakdownOut, dependencies=[project_member])
+async def get_tax_breakdown(
+    project_id: uuid.UUID,
+    current_user: CurrentUser,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+):
+    """Налоги по компонентам и получателям (CONTRACTOR / BUDGET) — по бюджету и по отчётам."""
+    versions = await breakdown_versions(db, project_id)
+    not_modified = conditional(request, response, make_etag(versions, "tax-breakdown"))
+    if not_modified:
+        return not_modified
+    return TaxBreakdownOut(
+        budget=await load_breakdown(db, project_id, "budget", versions),
+        reports=await load_breakdown(db, project_id, "reports", versions),
+    )
+
+
+async def _rollup_drift(db: AsyncSession, project_id: uuid.UUID) -> tuple[list[BudgetLine], list]:
+    lines_result = await db.execute(select(BudgetLine).where(BudgetLine.project_id == project_id))
+    lines = list(lines_result.scalars().all())
+    return lines, await check_rollups(db, project_id, lines)
+
+
+@router.get("/{project_id}/budget/rollups/check", dependencies=[project_member])
+async def check_budget_rollups(project_id: uuid.UUID, current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
+    """Пересчитывает итоги групп с нуля и сообщает о расхождениях с сохранёнными. Ничего не меняет."""
+    lines, drift = await _rollup_drift(db, project_id)
+    return {"groups_checked": sum(1 for l in lines if l.type == "GROUP"), "drift": drift}
+
+
+@router.post("/{project_id}/budget/rollups/repair", dependencies=[require_editor(EDIT_DENIED)])
+async def repair_budget_rollups(project_id: uuid.UUID, current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
+    """Как check, но при расхождениях перезаписывает итоги групп пересчитанными."""
+    lines, drift = await _rollup_drift(db, project_id)
+    if drift:
+        await rebuild_rollups(db, project_id, lines)
+        await bump_budget(db, project_id)
+        await db.commit()
+    return {"groups_checked": sum(1 for l in lines if l.type == "GROUP"), "drift": drift, "repaired": bool(drift)}
+
+
+@router.post("/{project_id}/budget/lines", response_model=BudgetLineOut, status_code=status.HTTP_201_CREATED, dependencies=[require_editor(EDIT_DENIED)])
+async def create_line(
+    project_id: uuid.UUID, data: BudgetLineCreate, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
+):
+    parent = None
+    if data.parent_id:
+        parent_result = await db.execute(
+            select(BudgetLine).where(BudgetLine.id == data.parent_id, BudgetLine.project_id == project_id)
+        )
+        parent = parent_result.scalar_one_or_none()
+        _check_move_target(project_id, parent)
+
+    line = _new_line(project_id, data, parent, await _get_contractor_schemes(db, [data.contractor_id]))
+    amounts = store_line_amounts(line, await _get_scheme_map(db, [line]))
+    db.add(line)
+    await db.flush()
+
+    if line.type == "GROUP":
+        db.add(new_group_rollup(line))
+    else:
+        await apply_delta(db, ancestor_ids(line.path), amounts_delta((0.0, 0.0, 0.0), amounts))
+    await bump_budget(db, project_id)
+
+    await db.commit()
+    await db.refresh(line)
+
+    contractor_map = await _get_contractor_map(db, [line])
+    return _compute_line(line, contractor_map)
+
+
+def _check_batch_deletes(ops: list, lines: dict) -> None:
+    """
+    Ни одна create/update/move пакета не должна касаться поддерева, удаляемого в нём же:
+    каскад по parent_id при flush снесёт созданную или перемещённую строку без следа.
+    Проверка по исходным путям — до любых изменений.
+    """
+    deleted_ids = {op.id for op in ops if op.op == "delete"}
+    if not deleted_ids:
+        return
+
+    def in_deleted(line_id: uuid.UUID | None) -> bool:
+        line = lines.get(line_id)
+        return line is not None and not deleted_ids.isdisjoint(path_ids(line.path))
+
+    for i, op in enumerate(ops):
+        if op.op == "delete":
+            continue
+        if op.op != "create" and in_deleted(op.id):
+            raise HTTPException(status_code=400, detail=f"Операция {i}: статья {op.id} удаляется в этом же пакете")
+        if op.op != "update" and in_deleted(op.data.parent_id):
+            raise HTTPException(status_code=400, detail=f"Операция {i}: родительская статья удаляется в этом же пакете")
+
+
+def _add_delta(deltas: dict, group_ids: list[uuid.UUID], amounts: tuple, sign: float) -> None:
+    for group_id in group_ids:
+        acc = deltas.setdefault(group_id, dict.fromkeys(ROLLUP_FIELDS[:3], 0.0))
+        for field, value in zip(ROLLUP_FIELDS, amounts):
+            acc[field] += sign * value
+
+
+@router.post("/{project_id}/budget/lines:batch", response_model=BudgetBatchOut, dependencies=[require_editor(EDIT_DENIED)])
+async def batch_lines(
+    project_id: uuid.UUID, data: BudgetBatchRequest, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
+):
+    """
+    Пакет операций create/update/delete/move в одной транзакции (вставка диапазона из Excel).
+    Статьи, контрагенты и схемы загружаются одним запросом каждого вида, UPDATE уходят
+    пачкой при flush, итоги групп сдвигаются одним executemany (своя дельта на группу).
+    Ошибка в любой операции откатывает весь пакет.
+    """
+    ops = data.operations
+    ref_ids = {op.id for op in ops if op.op != "create"}
+    ref_ids |= {op.data.parent_id for op in ops if op.op in ("create", "move") and op.data.parent_id}
+    lines: dict = {}
+    if ref_ids:
+        result = await db.execute(
+            select(BudgetLine).where(BudgetLine.project_id == project_id, BudgetLine.id.in_(ref_ids))
+        )
+        lines = {l.id: l for l in result.scalars().all()}
+    _check_batch_deletes(ops, lines)
+    contractor_schemes = await _get_contractor_schemes(
+        db, [op.data.contractor_id for op in ops if op.op in ("create", "update")]
+    )
+
+    # ITEM → (предки, суммы) до пакета: итоговая дельта не зависит от порядка операций
+    before: dict = {}
+    created: list[BudgetLine] = []
+    changed: dict = {}
+    deleted: dict = {}
+    # Перемещение или удаление группы — итоги пересчитываются целиком одним запросом
+    rebuild = False
+    moved: list[uuid.UUID] = []
+    renumber_parents: set = set()
+
+    def get_line(i: int, line_id: uuid.UUID | None) -> BudgetLine | None:
+        if line_id is None:
+            return None
+        line = lines.get(line_id)
+        if line is None or line_id in deleted:
+            raise HTTPException(status_code=404, detail=f"Операция {i}: статья {line_id} не найдена")
+        return line
+
+    for i, op in enumerate(ops):
+        if op.op == "create":
+            parent = get_line(i, op.data.parent_id)
+            if parent is not None:
+                _check_move_target(project_id, parent, i)
+            line = _new_line(project_id, op.data, parent, contractor_schemes)
+            created.append(line)
+            continue
+
+        line = get_line(i, op.id)
+        if line.id not in before:
+            before[line.id] = (ancestor_ids(line.path), stored_amounts(line) if line.type != "GROUP" else None)
+        if op.op == "update":
+            for field, value in _update_values(line, op.data, contractor_schemes).items():
+                setattr(line, field, value)
+            changed[line.id] = line
+        elif op.op == "delete":
+            rebuild = rebuild or line.type == "GROUP"
+            deleted[line.id] = line
+            changed.pop(line.id, None)
+        else:
+            parent = get_line(i, op.data.parent_id)
+            if parent is not None:
+                _check_move_target(line.project_id, parent, i)
+            rebuild = rebuild or line.type == "GROUP"
+            renumber_parents.update((line.parent_id, op.data.parent_id))
+            line.parent_id = op.data.parent_id
+            line.sort_order = op.data.sort_order
+            moved.append(line.id)
+            changed[line.id] = line
+
+    # Суммы пересчитываются после всех операций: одна загрузка схем на пакет
+    recompute = created + list(changed.values())
+    with db.no_autoflush:
+        scheme_map = await _get_scheme_map(db, recompute)
+    store_lines_amounts(recompute, scheme_map)
+
+    db.add_all(created)
+    if deleted:
+        await record_subtree_deletion(db, project_id, list(deleted.values()))
+        for line in deleted.values():
+            await db.delete(line)
+    await db.flush()
+
+    moved = [line_id for line_id in moved if line_id not in deleted]
+    if moved:
+        if await find_cycle(db, moved):
+            raise HTTPException(status_code=400, detail="Нельзя переместить статью внутрь её собственного поддерева")
+        await renumber_after_move(db, project_id, renumber_parents - deleted.keys(), moved)
+        # Пути и коды сменились в БД мимо объектов сессии — перечитываем
+        result = await db.execute(
+            select(BudgetLine)
+            .where(BudgetLine.id.in_([l.id for l in recompute]))
+            .execution_options(populate_existing=True)
+        )
+        result.scalars().all()
+
+    for line in created:
+        if line.type == "GROUP":
+            db.add(new_group_rollup(line))
+    if rebuild:
+        await db.flush()
+        await rebuild_rollups_in_db(db, [project_id])
+    else:
+        deltas: dict = {}
+        for groups, amounts in before.values():
+            if amounts is not None:
+                _add_delta(deltas, groups, amounts, -1.0)
+        for line in recompute:
+            if line.type != "GROUP":
+                _add_delta(deltas, ancestor_ids(line.path), stored_amounts(line), 1.0)
+        await apply_deltas(db, deltas)
+    await bump_budget(db, project_id)
+
+    # Ответ: созданные и изменённые статьи + все их группы-предки (старые и новые) с новыми итогами
+    out_ids = {l.id for l in recompute}
+    out_ids.update(g for groups, _ in before.values() for g in groups)
+    out_ids.update(g for l in recompute for g in ancestor_ids(l.path))
+    out_ids -= deleted.keys()
+    result = await db.execute(
+        select(BudgetLine).where(BudgetLine.id.in_(out_ids)).execution_options(populate_existing=True)
+    )
+    out = await _flat_lines_out(db, project_id, list(result.scalars().all()))
+
+    await db.commit()
+    return BudgetBatchOut(lines=out, created=[l.id for l in created], deleted=list(deleted))
+
+
+# --- Операции со статьями по ID ---
+
+@lines_router.patch("/{line_id}", response_model=BudgetLineOut)
+async def update_line(
+    line_id: uuid.UUID, data: BudgetLineUpdate, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
+):
+    result = await db.execute(select(BudgetLine).where(BudgetLine.id == line_id))
+    line = result.scalar_one_or_none()
+    if not line:
+        raise HTTPException(status_code=404, detail="Статья не найдена")
+    await check_project_access(db, current_user, line.project_id, EDITOR_ROLES, EDIT_DENIED)
+
+    contractor_schemes = await _get_contractor_schemes(db, [data.contractor_id])
+    update_data = _update_values(line, data, contractor_schemes)
+
+    old_amounts = stored_amounts(line)
 
     for field, value in update_data.items():
         setattr(line, field, value)
 
+    new_amounts = store_line_amounts(line, await _get_scheme_map(db, [line]))
+    await apply_delta(db, ancestor_ids(line.path), amounts_delta(old_amounts, new_amounts))
+    await bump_budget(db, line.project_id)
+
     await db.commit()
     await db.refresh(line)
 
-    components = []
-    if line.tax_scheme_id:
-        scheme_map = await _get_scheme_map(db, [line])
-        components = scheme_map.get(line.tax_scheme_id, [])
-
     contractor_map = await _get_contractor_map(db, [line])
-    return _compute_line(line, components, contractor_map)
+    return _compute_line(line, contractor_map)
 
 
 @lines_router.delete("/{line_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -251,6 +576,13 @@ async def delete_line(line_id: uuid.UUID, current_user: CurrentUser, db: AsyncSe
     line = result.scalar_one_or_none()
     if not line:
         raise HTTPException(status_code=404, detail="Статья не найдена")
+    await check_project_access(db, current_user, line.project_id, EDITOR_ROLES, EDIT_DENIED)
+
+    contribution = await line_contribution(db, line)
+    await apply_delta(db, ancestor_ids(line.path), negate(contribution))
+    await record_subtree_deletion(db, line.project_id, [line])
+    await bump_budget(db, line.project_id)
+
     await db.delete(line)
     await db.commit()
 
@@ -263,18 +595,31 @@ async def move_line(
     line = result.scalar_one_or_none()
     if not line:
         raise HTTPException(status_code=404, detail="Статья не найдена")
+    await check_project_access(db, current_user, line.project_id, EDITOR_ROLES, EDIT_DENIED)
 
-    line.parent_id = data.parent_id
-    line.sort_order = data.sort_order
-
+    parent = None
     if data.parent_id:
         parent_result = await db.execute(select(BudgetLine).where(BudgetLine.id == data.parent_id))
         parent = parent_result.scalar_one_or_none()
-        if parent:
-            line.level = parent.level + 1
-    else:
-        line.level = 0
+        _check_move_target(line.project_id, parent)
+        # Цикл: новый родитель лежит в поддереве перемещаемой строки — видно по пути
+        if is_in_subtree(parent.path, line.path):
+            raise HTTPException(status_code=400, detail="Нельзя переместить статью внутрь её собственного поддерева")
+
+    # Итоги: вычитаем вклад из старой цепочки предков, прибавляем к новой
+    contribution = await line_contribution(db, line)
+    await apply_delta(db, ancestor_ids(line.path), negate(contribution))
+
+    old_parent_id = line.parent_id
+    line.parent_id = data.parent_id
+    line.sort_order = data.sort_order
+    await db.flush()
+
+    # Уровни, коды и пути поддерева и сдвинутых соседей — одним запросом
+    await renumber_after_move(db, line.project_id, {old_parent_id, line.parent_id}, [line.id])
+    await apply_delta(db, path_ids(parent.path) if parent else [], contribution)
+    await bump_budget(db, line.project_id)
 
     await db.commit()
     await db.refresh(line)
-    return _line_to_out(line)
+    return line_to_out(line)
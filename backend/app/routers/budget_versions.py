@@ -0,0 +1,122 @@
+"""Роутер неизменяемых версий бюджета (утверждённый, переутверждённый, для инвестора…)."""
+import json
+import uuid
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from app.database import get_db
+from app.models.contractor import Contractor
+from app.schemas.budget import BudgetLineOut, BudgetVersionCreate, BudgetVersionOut
+from app.routers.deps import CurrentUser, check_project_access
+from app.services.project_access import EDITOR_ROLES
+from app.core.budget_tree import build_budget_tree
+from app.core.budget_versions import VersionLine
+from app.core.budget_diff import diff_states
+from app.services.budget_versions import list_versions, load_version_state, create_version, current_state
+from app.services.versions import CONTRACTORS_SCOPE, get_versions, make_etag, conditional
+
+router = APIRouter(prefix="/projects", tags=["budget-versions"])
+
+
+async def _contractor_names(db: AsyncSession, lines) -> dict:
+    contractor_ids = list({l.contractor_id for l in lines if l.contractor_id})
+    if not contractor_ids:
+        return {}
+    result = await db.execute(select(Contractor.id, Contractor.full_name).where(Contractor.id.in_(contractor_ids)))
+    return dict(result.all())
+
+
+@router.get("/{project_id}/budget/versions", response_model=list[BudgetVersionOut])
+async def get_versions_list(project_id: uuid.UUID, current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
+    await check_project_access(db, current_user, project_id)
+    return await list_versions(db, project_id)
+
+
+@router.post("/{project_id}/budget/versions", response_model=BudgetVersionOut, status_code=status.HTTP_201_CREATED)
+async def create_budget_version(
+    project_id: uuid.UUID, data: BudgetVersionCreate, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
+):
+    """Фиксирует текущий бюджет. Хранится только дельта к предыдущей версии (периодически — полная база)."""
+    await check_project_access(
+        db, current_user, project_id, EDITOR_ROLES,
+        "Только продюсер или линейный продюсер может фиксировать версии",
+    )
+    version = await create_version(db, project_id, data.name, current_user.id)
+    await db.commit()
+    return version
+
+
+@router.get("/{project_id}/budget/versions/{number}", response_model=list[BudgetLineOut])
+async def get_version_tree(
+    project_id: uuid.UUID,
+    number: int,
+    current_user: CurrentUser,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+):
+    """Дерево бюджета в версии. Версия не меняется — ETag зависит только от неё и справочника контрагентов."""
+    await check_project_access(db, current_user, project_id)
+    versions = await list_versions(db, project_id)
+    version = next((v for v in versions if v.number == number), None)
+    if not version:
+        raise HTTPException(status_code=404, detail="Версия не найдена")
+
+    etag = make_etag(await get_versions(db, CONTRACTORS_SCOPE), "version", version.id)
+    not_modified = conditional(request, response, etag)
+    if not_modified:
+        return not_modified
+
+    state = await load_version_state(db, version, versions)
+    lines = [VersionLine(line_id, project_id, snap, version.created_at) for line_id, snap in state.items()]
+    contractor_map = await _contractor_names(db, lines)
+    # Суммы строк сохранены в снимке, итоги групп — сумма детей
+    return build_budget_tree(lines, None, contractor_map)
+
+
+async def _load_state(db: AsyncSession, project_id: uuid.UUID, ref: str) -> dict:
+    """Состояние бюджета: ref = "current" или номер версии."""
+    if ref == "current":
+        return await current_state(db, project_id)
+    if not ref.isdigit():
+        raise HTTPException(status_code=400, detail="Версия: current или номер")
+    versions = await list_versions(db, project_id)
+    version = next((v for v in versions if v.number == int(ref)), None)
+    if not version:
+        raise HTTPException(status_code=404, detail=f"Версия {ref} не найдена")
+    return await load_version_state(db, version, versions)
+
+
+@router.get("/{project_id}/budget/diff")
+async def diff_budget(
+    project_id: uuid.UUID,
+    current_user: CurrentUser,
+    base: str = Query("current", description="Исходный бюджет: current или номер версии"),
+    target: str = Query("current", description="Сравниваемый бюджет: current или номер версии"),
+    target_project_id: uuid.UUID | None = Query(None, description="Сравнить с бюджетом другого проекта"),
+    key: Literal["id", "code"] | None = Query(None, description="Сопоставление строк; по умолчанию id, между проектами — code"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Сравнение двух бюджетов потоком NDJSON: по событию на строку (added, removed,
+    changed, moved), изменения итогов групп (group) и последней строкой — summary.
+    """
+    other_project_id = target_project_id or project_id
+    await check_project_access(db, current_user, project_id)
+    if other_project_id != project_id:
+        await check_project_access(db, current_user, other_project_id)
+    if key is None:
+        key = "id" if other_project_id == project_id else "code"
+
+    old = await _load_state(db, project_id, base)
+    new = await _load_state(db, other_project_id, target)
+
+    def lines():
+        for event in diff_states(old, new, key):
+            yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
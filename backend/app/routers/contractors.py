@@ -1,13 +1,20 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, union
 
 from app.database import get_db
 from app.models.contractor import Contractor
+from app.models.contract import Contract
+from app.models.budget import BudgetLine
 from app.core.security import encrypt_field, decrypt_field
-from app.schemas.contractor import ContractorCreate, ContractorUpdate, ContractorOut
-from app.routers.deps import CurrentUser
+from app.schemas.contractor import (
+    ContractorCreate, ContractorUpdate, ContractorOut, ContractorSensitiveBatch, ContractorSensitiveOut,
+)
+from app.routers.deps import CurrentUser, check_project_access
+from app.services.crypto import load_sensitive
+from app.services.project_access import EDITOR_ROLES
+from app.services.versions import CONTRACTORS_SCOPE, bump_version, get_versions, make_etag, conditional
 
 router = APIRouter(prefix="/contractors", tags=["contractors"])
 
@@ -30,7 +37,13 @@ def _to_out(c: Contractor) -> ContractorOut:
 
 
 @router.get("", response_model=list[ContractorOut])
-async def list_contractors(current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
+async def list_contractors(
+    current_user: CurrentUser, request: Request, response: Response, db: AsyncSession = Depends(get_db)
+):
+    not_modified = conditional(request, response, make_etag(await get_versions(db, CONTRACTORS_SCOPE), "list"))
+    if not_modified:
+        return not_modified
+
     result = await db.execute(select(Contractor).order_by(Contractor.full_name))
     return [_to_out(c) for c in result.scalars().all()]
 
@@ -50,6 +63,7 @@ async def create_contractor(data: ContractorCreate, current_user: CurrentUser, d
         bank_details_enc=encrypt_field(data.bank_details) if data.bank_details else None,
     )
     db.add(c)
+    await bump_version(db, CONTRACTORS_SCOPE)
     await db.commit()
     await db.refresh(c)
     return _to_out(c)
@@ -77,6 +91,29 @@ async def get_sensitive(contractor_id: uuid.UUID, current_user: CurrentUser, db:
     }
 
 
+@router.post("/sensitive:batch", response_model=list[ContractorSensitiveOut])
+async def get_sensitive_batch(
+    data: ContractorSensitiveBatch, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
+):
+    """
+    Расшифрованные реквизиты контрагентов проекта одним пакетом — для выгрузок.
+    Только продюсеры проекта; контрагенты вне договоров и статей проекта не отдаются.
+    """
+    await check_project_access(
+        db, current_user, data.project_id, EDITOR_ROLES, "Только продюсер может выгружать реквизиты"
+    )
+    linked = union(
+        select(Contract.contractor_id).where(Contract.project_id == data.project_id),
+        select(BudgetLine.contractor_id).where(
+            BudgetLine.project_id == data.project_id, BudgetLine.contractor_id.isnot(None)
+        ),
+    )
+    ids = set((await db.execute(linked)).scalars().all())
+    if data.contractor_ids is not None:
+        ids &= set(data.contractor_ids)
+    return await load_sensitive(db, list(ids))
+
+
 @router.patch("/{contractor_id}", response_model=ContractorOut)
 async def update_contractor(
     contractor_id: uuid.UUID, data: ContractorUpdate, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
@@ -97,6 +134,7 @@ async def update_contractor(
     for field, value in update_data.items():
         setattr(c, field, value)
 
+    await bump_version(db, CONTRACTORS_SCOPE)
     await db.commit()
     await db.refresh(c)
     return _to_out(c)
@@ -8,7 +8,8 @@ from app.database import get_db
 from app.models.contract import Contract, ContractBudgetLine
 from app.models.contractor import Contractor
 from app.schemas.contract import ContractCreate, ContractUpdate, ContractOut
-from app.routers.deps import CurrentUser
+from app.models.user import ProjectUser
+from app.routers.deps import CurrentUser, check_project_access
 
 router = APIRouter(prefix="/contracts", tags=["contracts"])
 
@@ -60,7 +61,11 @@ async def list_contracts(
         selectinload(Contract.budget_line_links),
     )
     if project_id:
+        await check_project_access(db, current_user, project_id)
         q = q.where(Contract.project_id == project_id)
+    elif not current_user.is_superadmin:
+        # Без фильтра — договоры проектов пользователя
+        q = q.join(ProjectUser, ProjectUser.project_id == Contract.project_id).where(ProjectUser.user_id == current_user.id)
     if contractor_id:
         q = q.where(Contract.contractor_id == contractor_id)
     q = q.order_by(Contract.created_at.desc())
@@ -74,6 +79,8 @@ async def create_contract(
     current_user: CurrentUser,
     db: AsyncSession = Depends(get_db),
 ):
+    await check_project_access(db, current_user, data.project_id)
+
     # Подтянуть налог из контрагента если не передан и нет tax_override
     tax_scheme_id = data.tax_scheme_id
     if not tax_scheme_id and not data.tax_override:
@@ -113,7 +120,9 @@ async def get_contract(
     current_user: CurrentUser,
     db: AsyncSession = Depends(get_db),
 ):
-    return _to_out(await _load_contract(contract_id, db))
+    c = await _load_contract(contract_id, db)
+    await check_project_access(db, current_user, c.project_id)
+    return _to_out(c)
 
 
 @router.patch("/{contract_id}", response_model=ContractOut)
@@ -124,6 +133,7 @@ async def update_contract(
     db: AsyncSession = Depends(get_db),
 ):
     c = await _load_contract(contract_id, db)
+    await check_project_access(db, current_user, c.project_id)
     update_data = data.model_dump(exclude_none=True)
 
     # Обновляем связи budget_lines отдельно
@@ -152,5 +162,6 @@ async def delete_contract(
     db: AsyncSession = Depends(get_db),
 ):
     c = await _load_contract(contract_id, db)
+    await check_project_access(db, current_user, c.project_id)
     await db.delete(c)
     await db.commit()
@@ -6,11 +6,10 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
-from app.core.security import decode_token
 from app.database import get_db
-from app.models.user import User, ProjectUser
+from app.services.auth_cache import AuthUser, access_token_subject, load_active_user
+from app.services.project_access import EDITOR_ROLES, resolve_project_role
 
 bearer = HTTPBearer()
 
@@ -18,24 +17,39 @@ bearer = HTTPBearer()
 async def get_current_user(
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(bearer)],
     db: AsyncSession = Depends(get_db),
-) -> User:
-    token = credentials.credentials
+) -> AuthUser:
+    """Пользователь access-токена; токен и пользователь берутся из кэша аутентификации."""
     try:
-        payload = decode_token(token)
-        if payload.get("type") != "access":
-            raise JWTError("wrong token type")
-        user_id = payload.get("sub")
+        user_id = access_token_subject(credentials.credentials)
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Недействительный токен")
 
-    result = await db.execute(select(User).where(User.id == uuid.UUID(user_id)))
-    user = result.scalar_one_or_none()
-    if not user or not user.is_active:
+    user = await load_active_user(db, user_id)
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Пользователь не найден")
     return user
 
 
-CurrentUser = Annotated[User, Depends(get_current_user)]
+CurrentUser = Annotated[AuthUser, Depends(get_current_user)]
+
+
+async def check_project_access(
+    db: AsyncSession,
+    user: AuthUser,
+    project_id: uuid.UUID,
+    roles: tuple[str, ...] | None = None,
+    detail: str = "Недостаточно прав",
+) -> str:
+    """
+    Роль пользователя в проекте (через кэш ролей). 403, если он не в команде
+    или его роль не из roles. Для маршрутов, где проект известен по сущности.
+    """
+    role = await resolve_project_role(db, user, project_id)
+    if role is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Нет доступа к проекту")
+    if roles and role not in roles:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+    return role
 
 
 async def get_project_role(
@@ -43,25 +57,24 @@ async def get_project_role(
     current_user: CurrentUser,
     db: AsyncSession = Depends(get_db),
 ) -> str:
-    """Возвращает роль пользователя в проекте или 404."""
-    if current_user.is_superadmin:
-        return "PRODUCER"
-    result = await db.execute(
-        select(ProjectUser).where(
-            ProjectUser.project_id == project_id,
-            ProjectUser.user_id == current_user.id,
-        )
-    )
-    pu = result.scalar_one_or_none()
-    if not pu:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Нет доступа к проекту")
-    return pu.role
+    """Роль пользователя в проекте из пути или 403. В пределах запроса вычисляется один раз."""
+    return await check_project_access(db, current_user, project_id)
+
+
+ProjectRole = Annotated[str, Depends(get_project_role)]
+# Для dependencies=[...] маршрутов, которым достаточно участия в проекте
+project_member = Depends(get_project_role)
 
 
-def require_roles(*roles: str):
+def require_roles(*roles: str, detail: str = "Недостаточно прав"):
     """Декоратор-зависимость для проверки роли."""
-    async def check_role(role: str = Depends(get_project_role)):
+    async def check_role(role: ProjectRole):
         if role not in roles:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав")
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
         return role
     return check_role
+
+
+def require_editor(detail: str):
+    """Продюсер или линейный продюсер проекта из пути."""
+    return Depends(require_roles(*EDITOR_ROLES, detail=detail))
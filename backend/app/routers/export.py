@@ -1,95 +1,197 @@
-"""Роутер для загрузки шаблона бюджета в проект и экспорта в Excel."""
+"""Роутер для шаблонов бюджета (загрузка в проект, сохранение) и экспорта (задачи экспорта, Excel, CSV/NDJSON)."""
 import uuid
-from datetime import datetime
+from datetime import date, datetime
+from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
-from sqlalchemy.orm import selectinload
 
-from app.database import get_db
+from app.database import AsyncSessionLocal, get_db
 from app.models.budget import BudgetLine
-from app.models.user import ProjectUser
-from app.core.budget_template import build_flat_lines
-from app.routers.deps import CurrentUser
+from app.models.budget_template import BudgetTemplate
+from app.routers.deps import CurrentUser, check_project_access, project_member, require_editor
+from app.schemas.budget import BudgetTemplateCreate, BudgetTemplateOut
+from app.schemas.export import ExportJobCreate, ExportJobOut
+from app.services.budget_rollups import rebuild_rollups_in_db
+from app.services import export_jobs, raw_export
+from app.services.budget_templates import load_compiled, compile_project, insert_template
+from app.services.budget_changes import bump_budget, record_project_deletion
 
 router = APIRouter(tags=["budget-template"])
 
 
-@router.post("/projects/{project_id}/budget/from-template", status_code=201)
-async def load_template(project_id: uuid.UUID, current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
-    """Загружает стандартный шаблон бюджета в проект (удаляет существующие статьи)."""
-    # Проверяем доступ
-    if not current_user.is_superadmin:
-        pu_result = await db.execute(
-            select(ProjectUser).where(ProjectUser.project_id == project_id, ProjectUser.user_id == current_user.id)
-        )
-        pu = pu_result.scalar_one_or_none()
-        if not pu or pu.role not in ("PRODUCER", "LINE_PRODUCER"):
-            raise HTTPException(status_code=403, detail="Только продюсер может загружать шаблон")
-
-    # Удаляем существующие статьи
+@router.post(
+    "/projects/{project_id}/budget/from-template",
+    status_code=201,
+    dependencies=[require_editor("Только продюсер может загружать шаблон")],
+)
+async def load_template(
+    project_id: uuid.UUID,
+    current_user: CurrentUser,
+    template_id: uuid.UUID | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Загружает шаблон бюджета в проект (удаляет существующие статьи).
+    Без template_id — стандартный шаблон. Строки вставляются одним запросом.
+    """
+    compiled = await load_compiled(db, template_id)
+    if compiled is None:
+        raise HTTPException(status_code=404, detail="Шаблон не найден")
+
+    # Удаляем существующие статьи (со следами для /budget/changes)
+    await record_project_deletion(db, project_id)
     await db.execute(delete(BudgetLine).where(BudgetLine.project_id == project_id))
 
-    # Генерируем плоский список из шаблона
-    lines_data = build_flat_lines(project_id=project_id)
+    count = await insert_template(db, project_id, compiled)
+    await rebuild_rollups_in_db(db, [project_id])
+    await bump_budget(db, project_id)
+    await db.commit()
 
-    # Bulk insert
-    lines = [BudgetLine(**d) for d in lines_data]
-    db.add_all(lines)
+    return {"message": f"Загружено {count} статей бюджета", "count": count}
+
+
+@router.get("/budget-templates", response_model=list[BudgetTemplateOut])
+async def list_templates(current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
+    """Сохранённые шаблоны (стандартный встроен и в список не входит)."""
+    result = await db.execute(select(BudgetTemplate).order_by(BudgetTemplate.name))
+    return result.scalars().all()
+
+
+@router.post(
+    "/projects/{project_id}/budget/save-as-template",
+    response_model=BudgetTemplateOut,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[require_editor("Только продюсер может сохранять шаблон")],
+)
+async def save_as_template(
+    project_id: uuid.UUID, data: BudgetTemplateCreate, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
+):
+    """Сохраняет бюджет проекта шаблоном (структура, ставки, налоговые схемы; без контрагентов)."""
+    existing = await db.execute(select(BudgetTemplate.id).where(BudgetTemplate.name == data.name))
+    if existing.scalar_one_or_none():
+        raise HTTPException(status_code=400, detail="Шаблон с таким названием уже существует")
+
+    compiled = await compile_project(db, project_id)
+    template = BudgetTemplate(
+        name=data.name,
+        description=data.description,
+        line_count=len(compiled),
+        data=compiled.to_data(),
+        created_by=current_user.id,
+    )
+    db.add(template)
+    await db.commit()
+    await db.refresh(template)
+    return template
+
+
+@router.delete("/budget-templates/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_template(template_id: uuid.UUID, current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(BudgetTemplate).where(BudgetTemplate.id == template_id))
+    template = result.scalar_one_or_none()
+    if not template:
+        raise HTTPException(status_code=404, detail="Шаблон не найден")
+    if not current_user.is_superadmin and template.created_by != current_user.id:
+        raise HTTPException(status_code=403, detail="Удалить шаблон может только его автор")
+    await db.delete(template)
     await db.commit()
 
-    return {"message": f"Загружено {len(lines)} статей бюджета", "count": len(lines)}
 
+def _export_file(job: export_jobs.ExportJob) -> FileResponse:
+    """Готовый файл задачи из кэша экспорта."""
+    if job.status == export_jobs.FAILED:
+        raise HTTPException(status_code=500, detail=f"Экспорт не удался: {job.error}")
+    if job.status != export_jobs.DONE:
+        raise HTTPException(status_code=409, detail="Экспорт ещё не готов")
+    if not export_jobs.touch(job.path):
+        raise HTTPException(status_code=410, detail="Файл экспорта удалён из кэша, запустите экспорт заново")
+    spec = export_jobs.EXPORT_TYPES[job.type]
+    prefix = job.type.removesuffix("_xlsx")
+    filename = f"{prefix}_{job.project_id}_{datetime.now().strftime('%Y%m%d')}{spec.suffix}"
+    return FileResponse(job.path, media_type=spec.media_type, filename=filename)
 
-@router.get("/projects/{project_id}/budget/export")
+
+async def _load_job(db: AsyncSession, current_user, job_id: uuid.UUID) -> export_jobs.ExportJob:
+    job = export_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача экспорта не найдена")
+    await check_project_access(db, current_user, job.project_id)
+    return job
+
+
+@router.get("/projects/{project_id}/budget/export", dependencies=[project_member])
 async def export_budget_excel(project_id: uuid.UUID, current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
-    """Экспорт бюджета в Excel."""
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment
-        import io
-    except ImportError:
-        raise HTTPException(status_code=500, detail="openpyxl не установлен")
-
-    lines_result = await db.execute(
-        select(BudgetLine).where(BudgetLine.project_id == project_id).order_by(BudgetLine.sort_order)
-    )
-    lines = list(lines_result.scalars().all())
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Бюджет"
-
-    # Заголовки
-    headers = ["Код", "Статья", "Ед.изм.", "Кол-во ед.", "Ставка", "Кол-во", "Итого нетто", "Лимит"]
-    for col, h in enumerate(headers, 1):
-        ws.cell(row=1, column=col, value=h).font = Font(bold=True)
-
-    # Данные
-    for row, line in enumerate(lines, 2):
-        indent = "  " * line.level
-        ws.cell(row=row, column=1, value=line.code)
-        ws.cell(row=row, column=2, value=indent + line.name)
-        ws.cell(row=row, column=3, value=line.unit)
-        ws.cell(row=row, column=4, value=line.quantity_units)
-        ws.cell(row=row, column=5, value=line.rate)
-        ws.cell(row=row, column=6, value=line.quantity)
-        ws.cell(row=row, column=7, value=line.rate * line.quantity)
-        ws.cell(row=row, column=8, value=line.limit_amount)
-
-        if line.level == 0:
-            for col in range(1, 9):
-                ws.cell(row=row, column=col).font = Font(bold=True)
-
-    buf = io.BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-
-    filename = f"budget_{project_id}_{datetime.now().strftime('%Y%m%d')}.xlsx"
+    """
+    Экспорт бюджета в Excel: дерево статей с налогом и итого, итоги групп и проекта.
+    Синхронный вариант задачи budget_xlsx — файл из кэша или после её завершения.
+    """
+    job = await export_jobs.wait(await export_jobs.submit(db, "budget_xlsx", project_id))
+    return _export_file(job)
+
+
+@router.post(
+    "/projects/{project_id}/exports",
+    response_model=ExportJobOut,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[project_member],
+)
+async def create_export(
+    project_id: uuid.UUID, data: ExportJobCreate, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
+):
+    """Запускает фоновый экспорт (или возвращает готовый/уже выполняющийся для тех же данных)."""
+    return await export_jobs.submit(db, data.type, project_id)
+
+
+@router.get("/exports/{job_id}", response_model=ExportJobOut)
+async def get_export(job_id: uuid.UUID, current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
+    return await _load_job(db, current_user, job_id)
+
+
+@router.get("/exports/{job_id}/download")
+async def download_export(job_id: uuid.UUID, current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
+    return _export_file(await _load_job(db, current_user, job_id))
+
+
+_RAW_FORMATS = {
+    "csv": (raw_export.csv_stream, "text/csv; charset=utf-8"),
+    "ndjson": (raw_export.ndjson_stream, "application/x-ndjson"),
+}
+
+
+@router.get("/projects/{project_id}/export.{fmt}", dependencies=[project_member])
+async def export_raw(
+    project_id: uuid.UUID,
+    fmt: Literal["csv", "ndjson"],
+    current_user: CurrentUser,
+    source: Literal["budget", "reports"] = Query("budget", description="Статьи бюджета или записи отчётов"),
+    columns: str | None = Query(None, description="Колонки через запятую; по умолчанию все"),
+    date_from: date | None = Query(None, description="Начало периода (включительно)"),
+    date_to: date | None = Query(None, description="Конец периода (включительно)"),
+):
+    """
+    Сырая выгрузка для BI потоком CSV или NDJSON: строки с рассчитанными налогом,
+    итого и налогом по получателям. Память сервера не зависит от размера проекта.
+    """
+    available = raw_export.COLUMNS[source]
+    selected = tuple(c.strip() for c in columns.split(",") if c.strip()) if columns else available
+    unknown = [c for c in selected if c not in available]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Неизвестные колонки: {', '.join(unknown) or '—'}")
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from позже date_to")
+    stream, media_type = _RAW_FORMATS[fmt]
+
+    async def body():
+        # Сессия запроса закрывается до отдачи тела — у потока своя
+        async with AsyncSessionLocal() as db:
+            chunks = raw_export.iter_chunks(db, source, project_id, selected, date_from, date_to)
+            async for text in stream(chunks, selected):
+                yield text
+
+    filename = f"{source}_{project_id}_{datetime.now().strftime('%Y%m%d')}.{fmt}"
     return StreamingResponse(
-        buf,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"},
+        body(), media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
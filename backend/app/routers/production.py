@@ -8,13 +8,13 @@ from sqlalchemy.orm import selectinload
 
 from app.database import get_db
 from app.models.production import ProductionReport, ReportEntry
-from app.models.tax import TaxScheme, TaxComponent
-from app.core.tax_logic import calc_tax
 from app.schemas.production import (
     ProductionReportCreate, ProductionReportUpdate, ProductionReportOut,
     ReportEntryCreate, ReportEntryUpdate, ReportEntryOut,
 )
-from app.routers.deps import CurrentUser
+from app.routers.deps import CurrentUser, check_project_access, project_member
+from app.services.tax_schemes import get_scheme
+from app.services.versions import bump_version, reports_scope
 
 router = APIRouter(prefix="/production", tags=["production"])
 
@@ -51,26 +51,14 @@ async def _calc_amounts(
     tax_scheme_id: uuid.UUID | None,
     db: AsyncSession,
 ) -> tuple[float, float]:
-    """Возвращает (amount_net, amount_gross)."""
+    """Возвращает (amount_net, amount_gross). Схема — из кэша, без запросов к БД."""
     amount_net = round(rate * quantity, 2)
-    if not tax_scheme_id:
-        return amount_net, amount_net
-
-    res = await db.execute(
-        select(TaxScheme)
-        .where(TaxScheme.id == tax_scheme_id)
-        .options(selectinload(TaxScheme.components))
-    )
-    scheme = res.scalar_one_or_none()
+    scheme = await get_scheme(db, tax_scheme_id)
     if not scheme or not scheme.components:
         return amount_net, amount_net
 
-    components = [
-        {"name": c.name, "rate": c.rate, "type": c.type, "recipient": c.recipient}
-        for c in sorted(scheme.components, key=lambda x: x.sort_order)
-    ]
-    result = calc_tax(rate, quantity, components)
-    return result["subtotal"], result["total"]
+    subtotal, _, total = scheme.amounts(rate, quantity)
+    return subtotal, total
 
 
 # ─── Сериализация ──────────────────────────────────────────────────────────────
@@ -142,6 +130,15 @@ async def _load_report(report_id: uuid.UUID, db: AsyncSession) -> ProductionRepo
     return r
 
 
+async def _check_report_access(db: AsyncSession, current_user, report_id: uuid.UUID) -> uuid.UUID:
+    """Доступ к отчёту — по участию в его проекте. Возвращает id проекта."""
+    project_id = await db.scalar(select(ProductionReport.project_id).where(ProductionReport.id == report_id))
+    if project_id is None:
+        raise HTTPException(status_code=404, detail="Отчёт не найден")
+    await check_project_access(db, current_user, project_id)
+    return project_id
+
+
 async def _load_entry(entry_id: uuid.UUID, db: AsyncSession) -> ReportEntry:
     res = await db.execute(
         select(ReportEntry)
@@ -160,7 +157,7 @@ async def _load_entry(entry_id: uuid.UUID, db: AsyncSession) -> ReportEntry:
 
 # ─── Роуты: ProductionReport ───────────────────────────────────────────────────
 
-@router.get("/projects/{project_id}/reports", response_model=list[ProductionReportOut])
+@router.get("/projects/{project_id}/reports", response_model=list[ProductionReportOut], dependencies=[project_member])
 async def list_reports(
     project_id: uuid.UUID,
     current_user: CurrentUser,
@@ -179,7 +176,10 @@ async def list_reports(
     return [_report_to_out(r) for r in res.scalars().all()]
 
 
-@router.post("/projects/{project_id}/reports", response_model=ProductionReportOut, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/projects/{project_id}/reports", response_model=ProductionReportOut, status_code=status.HTTP_201_CREATED,
+    dependencies=[project_member],
+)
 async def create_report(
     project_id: uuid.UUID,
     data: ProductionReportCreate,
@@ -197,6 +197,7 @@ async def create_report(
         created_by=current_user.id,
     )
     db.add(r)
+    await bump_version(db, reports_scope(project_id))
     await db.commit()
     return _report_to_out(await _load_report(r.id, db))
 
@@ -207,6 +208,7 @@ async def get_report(
     current_user: CurrentUser,
     db: AsyncSession = Depends(get_db),
 ):
+    await _check_report_access(db, current_user, report_id)
     return _report_to_out(await _load_report(report_id, db))
 
 
@@ -217,9 +219,11 @@ async def update_report(
     current_user: CurrentUser,
     db: AsyncSession = Depends(get_db),
 ):
+    project_id = await _check_report_access(db, current_user, report_id)
     r = await _load_report(report_id, db)
     for field, value in data.model_dump(exclude_none=True).items():
         setattr(r, field, value)
+    await bump_version(db, reports_scope(project_id))
     await db.commit()
     return _report_to_out(await _load_report(report_id, db))
 
@@ -230,8 +234,10 @@ async def delete_report(
     current_user: CurrentUser,
     db: AsyncSession = Depends(get_db),
 ):
+    project_id = await _check_report_access(db, current_user, report_id)
     r = await _load_report(report_id, db)
     await db.delete(r)
+    await bump_version(db, reports_scope(project_id))
     await db.commit()
 
 
@@ -244,8 +250,8 @@ async def create_entry(
     current_user: CurrentUser,
     db: AsyncSession = Depends(get_db),
 ):
-    # Убеждаемся что отчёт существует
-    await _load_report(report_id, db)
+    # Отчёт существует и доступен пользователю
+    project_id = await _check_report_access(db, current_user, report_id)
 
     overtime = _calc_overtime(data.shift_start, data.shift_end, data.lunch_break_minutes, data.gap_minutes)
     amount_net, amount_gross = await _calc_amounts(data.rate, data.quantity, data.tax_scheme_id, db)
@@ -271,6 +277,7 @@ async def create_entry(
         raw_text=data.raw_text,
     )
     db.add(e)
+    await bump_version(db, reports_scope(project_id))
     await db.commit()
     return _entry_to_out(await _load_entry(e.id, db))
 
@@ -283,6 +290,7 @@ async def update_entry(
     db: AsyncSession = Depends(get_db),
 ):
     e = await _load_entry(entry_id, db)
+    project_id = await _check_report_access(db, current_user, e.report_id)
     update_data = data.model_dump(exclude_none=True)
 
     for field, value in update_data.items():
@@ -295,6 +303,7 @@ async def update_entry(
     if any(k in update_data for k in ("rate", "quantity", "tax_scheme_id")):
         e.amount_net, e.amount_gross = await _calc_amounts(e.rate, e.quantity, e.tax_scheme_id, db)
 
+    await bump_version(db, reports_scope(project_id))
     await db.commit()
     return _entry_to_out(await _load_entry(entry_id, db))
 
@@ -306,5 +315,7 @@ async def delete_entry(
     db: AsyncSession = Depends(get_db),
 ):
     e = await _load_entry(entry_id, db)
+    project_id = await _check_report_access(db, current_user, e.report_id)
     await db.delete(e)
+    await bump_version(db, reports_scope(project_id))
     await db.commit()
@@ -7,12 +7,17 @@ from sqlalchemy.orm import selectinload
 from app.database import get_db
 from app.models.project import Project
 from app.models.user import ProjectUser, User
-from app.schemas.project import ProjectCreate, ProjectUpdate, ProjectOut
+from app.schemas.project import ProjectCreate, ProjectUpdate, ProjectOut, ProjectClone, ProjectCloneOut
 from app.schemas.user import ProjectUserOut, ProjectUserCreate
-from app.routers.deps import CurrentUser
+from app.routers.deps import CurrentUser, project_member, require_editor
+from app.services.project_clone import clone_project_data
+from app.services.budget_changes import bump_budget
+from app.services.project_access import invalidate_project_roles
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
+TEAM_DENIED = "Только продюсер может управлять командой"
+
 
 @router.get("", response_model=list[ProjectOut])
 async def list_projects(current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
@@ -43,25 +48,20 @@ async def create_project(data: ProjectCreate, current_user: CurrentUser, db: Asy
     return project
 
 
-@router.get("/{project_id}", response_model=ProjectOut)
+@router.get("/{project_id}", response_model=ProjectOut, dependencies=[project_member])
 async def get_project(project_id: uuid.UUID, current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(Project).where(Project.id == project_id))
     project = result.scalar_one_or_none()
     if not project:
         raise HTTPException(status_code=404, detail="Проект не найден")
 
-    # Проверяем доступ
-    if not current_user.is_superadmin:
-        pu_result = await db.execute(
-            select(ProjectUser).where(ProjectUser.project_id == project_id, ProjectUser.user_id == current_user.id)
-        )
-        if not pu_result.scalar_one_or_none():
-            raise HTTPException(status_code=403, detail="Нет доступа к проекту")
-
     return project
 
 
-@router.patch("/{project_id}", response_model=ProjectOut)
+@router.patch(
+    "/{project_id}", response_model=ProjectOut,
+    dependencies=[require_editor("Только продюсер или линейный продюсер может изменять проект")],
+)
 async def update_project(
     project_id: uuid.UUID, data: ProjectUpdate, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
 ):
@@ -78,7 +78,43 @@ async def update_project(
     return project
 
 
-@router.get("/{project_id}/team", response_model=list[ProjectUserOut])
+@router.post(
+    "/{project_id}/clone", response_model=ProjectCloneOut, status_code=status.HTTP_201_CREATED,
+    dependencies=[require_editor("Только продюсер или линейный продюсер может копировать проект")],
+)
+async def clone_project(
+    project_id: uuid.UUID, data: ProjectClone, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
+):
+    """Новый проект с копией бюджета (и договоров) исходного; копирование — внутри Postgres."""
+    result = await db.execute(select(Project).where(Project.id == project_id))
+    source = result.scalar_one_or_none()
+    if not source:
+        raise HTTPException(status_code=404, detail="Проект не найден")
+
+    project = Project(
+        name=data.name,
+        currency_primary=source.currency_primary,
+        currencies_allowed=list(source.currencies_allowed or []),
+        exchange_rate_mode=source.exchange_rate_mode,
+        exchange_rate_fixed=source.exchange_rate_fixed,
+        status="PREP",
+    )
+    db.add(project)
+    await db.flush()
+    db.add(ProjectUser(project_id=project.id, user_id=current_user.id, role="PRODUCER"))
+    await db.flush()
+
+    counts = await clone_project_data(
+        db, project_id, project.id,
+        include_contracts=data.include_contracts, rate_factor=data.rate_factor,
+    )
+    await bump_budget(db, project.id)
+    await db.commit()
+    await db.refresh(project)
+    return ProjectCloneOut(project=ProjectOut.model_validate(project), **counts)
+
+
+@router.get("/{project_id}/team", response_model=list[ProjectUserOut], dependencies=[project_member])
 async def get_team(project_id: uuid.UUID, current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
     result = await db.execute(
         select(ProjectUser).options(selectinload(ProjectUser.user))
@@ -87,21 +123,17 @@ async def get_team(project_id: uuid.UUID, current_user: CurrentUser, db: AsyncSe
     return result.scalars().all()
 
 
-@router.post("/{project_id}/team", response_model=ProjectUserOut, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/{project_id}/team", response_model=ProjectUserOut, status_code=status.HTTP_201_CREATED,
+    dependencies=[require_editor(TEAM_DENIED)],
+)
 async def add_team_member(
     project_id: uuid.UUID, data: ProjectUserCreate, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
 ):
-    # Только продюсер может добавлять
-    pu_check = await db.execute(
-        select(ProjectUser).where(ProjectUser.project_id == project_id, ProjectUser.user_id == current_user.id)
-    )
-    pu = pu_check.scalar_one_or_none()
-    if not current_user.is_superadmin and (not pu or pu.role not in ("PRODUCER", "LINE_PRODUCER")):
-        raise HTTPException(status_code=403, detail="Только продюсер может управлять командой")
-
     new_pu = ProjectUser(project_id=project_id, user_id=data.user_id, role=data.role)
     db.add(new_pu)
     await db.commit()
+    invalidate_project_roles(project_id, data.user_id)
 
     result = await db.execute(
         select(ProjectUser).options(selectinload(ProjectUser.user))
@@ -110,7 +142,10 @@ async def add_team_member(
     return result.scalar_one()
 
 
-@router.delete("/{project_id}/team/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{project_id}/team/{user_id}", status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[require_editor(TEAM_DENIED)],
+)
 async def remove_team_member(
     project_id: uuid.UUID, user_id: uuid.UUID, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
 ):
@@ -122,3 +157,4 @@ async def remove_team_member(
         raise HTTPException(status_code=404, detail="Пользователь не найден в проекте")
     await db.delete(pu)
     await db.commit()
+    invalidate_project_roles(project_id, user_id)
@@ -1,19 +1,29 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete
 from sqlalchemy.orm import selectinload
 
 from app.database import get_db
 from app.models.tax import TaxScheme, TaxComponent
-from app.schemas.tax import TaxSchemeOut, TaxSchemeCreate
+from app.schemas.tax import TaxSchemeOut, TaxSchemeCreate, TaxSchemeUpdate
 from app.routers.deps import CurrentUser
+from app.services.budget_amounts import recompute_scheme_lines, clear_scheme_lines
+from app.services.budget_changes import bump_budgets
+from app.services.tax_schemes import invalidate as invalidate_schemes
+from app.services.versions import TAX_SCHEMES_SCOPE, bump_version, get_versions, make_etag, conditional
 
 router = APIRouter(prefix="/tax-schemes", tags=["tax-schemes"])
 
 
 @router.get("", response_model=list[TaxSchemeOut])
-async def list_schemes(current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
+async def list_schemes(
+    current_user: CurrentUser, request: Request, response: Response, db: AsyncSession = Depends(get_db)
+):
+    not_modified = conditional(request, response, make_etag(await get_versions(db, TAX_SCHEMES_SCOPE), "list"))
+    if not_modified:
+        return not_modified
+
     result = await db.execute(
         select(TaxScheme).options(selectinload(TaxScheme.components)).order_by(TaxScheme.name)
     )
@@ -30,7 +40,9 @@ async def create_scheme(data: TaxSchemeCreate, current_user: CurrentUser, db: As
         c = TaxComponent(scheme_id=scheme.id, sort_order=i, **comp.model_dump())
         db.add(c)
 
+    await bump_version(db, TAX_SCHEMES_SCOPE)
     await db.commit()
+    invalidate_schemes()
     result = await db.execute(
         select(TaxScheme).options(selectinload(TaxScheme.components)).where(TaxScheme.id == scheme.id)
     )
@@ -48,6 +60,39 @@ async def get_scheme(scheme_id: uuid.UUID, current_user: CurrentUser, db: AsyncS
     return s
 
 
+@router.patch("/{scheme_id}", response_model=TaxSchemeOut)
+async def update_scheme(
+    scheme_id: uuid.UUID, data: TaxSchemeUpdate, current_user: CurrentUser, db: AsyncSession = Depends(get_db)
+):
+    """Изменение схемы. При замене компонентов пересчитываются все статьи бюджета с этой схемой."""
+    result = await db.execute(select(TaxScheme).where(TaxScheme.id == scheme_id))
+    s = result.scalar_one_or_none()
+    if not s:
+        raise HTTPException(status_code=404, detail="Схема не найдена")
+    if s.is_system:
+        raise HTTPException(status_code=400, detail="Системную схему нельзя изменить")
+
+    if data.name is not None:
+        s.name = data.name
+
+    if data.components is not None:
+        await db.execute(delete(TaxComponent).where(TaxComponent.scheme_id == scheme_id))
+        for i, comp in enumerate(data.components):
+            db.add(TaxComponent(scheme_id=scheme_id, **{**comp.model_dump(), "sort_order": i}))
+        await db.flush()
+        await bump_budgets(db, await recompute_scheme_lines(db, scheme_id))
+
+    await bump_version(db, TAX_SCHEMES_SCOPE)
+    await db.commit()
+    invalidate_schemes()
+    result = await db.execute(
+        select(TaxScheme).options(selectinload(TaxScheme.components))
+        .where(TaxScheme.id == scheme_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
+
+
 @router.delete("/{scheme_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_scheme(scheme_id: uuid.UUID, current_user: CurrentUser, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(TaxScheme).where(TaxScheme.id == scheme_id))
@@ -56,5 +101,8 @@ async def delete_scheme(scheme_id: uuid.UUID, current_user: CurrentUser, db: Asy
         raise HTTPException(status_code=404, detail="Схема не найдена")
     if s.is_system:
         raise HTTPException(status_code=400, detail="Системную схему нельзя удалить")
+    await bump_budgets(db, await clear_scheme_lines(db, scheme_id))
+    await bump_version(db, TAX_SCHEMES_SCOPE)
     await db.delete(s)
     await db.commit()
+    invalidate_schemes()
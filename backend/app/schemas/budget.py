@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime, date
-from pydantic import BaseModel
-from typing import Optional, Any
+from pydantic import BaseModel, Field
+from typing import Optional, Any, Literal, Union, Annotated
 
 
 class BudgetLineCreate(BaseModel):
@@ -70,6 +70,9 @@ class BudgetLineOut(BaseModel):
     advance: float = 0.0
 
     children: list["BudgetLineOut"] = []
+    # Есть ли дети в БД (при ленивой загрузке children может быть пустым)
+    has_children: bool = False
+    child_count: int = 0
     updated_at: datetime
 
     model_config = {"from_attributes": True}
@@ -78,3 +81,142 @@ class BudgetLineOut(BaseModel):
 class BudgetLineMoveRequest(BaseModel):
     parent_id: Optional[uuid.UUID] = None
     sort_order: int
+
+
+class BudgetChangesOut(BaseModel):
+    """Дельта бюджета после курсора: изменённые строки (плоско, без children) и id удалённых."""
+    lines: list[BudgetLineOut] = []
+    deleted: list[uuid.UUID] = []
+    cursor: str
+    # Курсор слишком старый — дельта неполна, нужно перечитать дерево целиком
+    reset: bool = False
+
+
+class BudgetSummaryRow(BaseModel):
+    id: uuid.UUID
+    parent_id: Optional[uuid.UUID]
+    code: str
+    name: str
+    level: int
+    limit_amount: float
+    subtotal: float
+    tax_amount: float
+    total: float
+
+
+class BudgetSummaryOut(BaseModel):
+    """Итоги групп уровней 0..depth-1 (плоско, по уровням) и итог проекта."""
+    depth: int
+    groups: list[BudgetSummaryRow]
+    subtotal: float
+    tax_amount: float
+    total: float
+
+
+class BudgetSimulationRequest(BaseModel):
+    """Переназначение налоговых схем; значение null — «без налога»."""
+    schemes: dict[uuid.UUID, Optional[uuid.UUID]] = Field(default_factory=dict, max_length=1000)
+    contractors: dict[uuid.UUID, Optional[uuid.UUID]] = Field(default_factory=dict, max_length=10000)
+    lines: dict[uuid.UUID, Optional[uuid.UUID]] = Field(default_factory=dict, max_length=50000)
+
+
+class AmountChange(BaseModel):
+    old: float
+    new: float
+    delta: float
+
+
+class BudgetSimulationGroup(BaseModel):
+    id: uuid.UUID
+    parent_id: Optional[uuid.UUID]
+    code: str
+    name: str
+    level: int
+    subtotal: AmountChange
+    tax_amount: AmountChange
+    total: AmountChange
+
+
+class BudgetSimulationOut(BaseModel):
+    """Итоги проекта и групп при переназначении схем (группы — только изменившиеся)."""
+    changed_lines: int
+    subtotal: AmountChange
+    tax_amount: AmountChange
+    total: AmountChange
+    groups: list[BudgetSimulationGroup]
+
+
+class BudgetVersionCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=255)
+
+
+class BudgetVersionOut(BaseModel):
+    id: uuid.UUID
+    number: int
+    name: str
+    is_base: bool
+    line_count: int
+    changed_lines: int
+    subtotal: float
+    tax_amount: float
+    total: float
+    created_by: Optional[uuid.UUID]
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class BudgetTemplateCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=255)
+    description: Optional[str] = None
+
+
+class BudgetTemplateOut(BaseModel):
+    id: uuid.UUID
+    name: str
+    description: Optional[str]
+    line_count: int
+    created_by: Optional[uuid.UUID]
+    created_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+# --- Пакетное редактирование (POST /projects/{id}/budget/lines:batch) ---
+
+class BatchCreateOp(BaseModel):
+    op: Literal["create"]
+    data: BudgetLineCreate
+
+
+class BatchUpdateOp(BaseModel):
+    op: Literal["update"]
+    id: uuid.UUID
+    data: BudgetLineUpdate
+
+
+class BatchDeleteOp(BaseModel):
+    op: Literal["delete"]
+    id: uuid.UUID
+
+
+class BatchMoveOp(BaseModel):
+    op: Literal["move"]
+    id: uuid.UUID
+    data: BudgetLineMoveRequest
+
+
+BatchOperation = Annotated[
+    Union[BatchCreateOp, BatchUpdateOp, BatchDeleteOp, BatchMoveOp], Field(discriminator="op")
+]
+
+
+class BudgetBatchRequest(BaseModel):
+    operations: list[BatchOperation] = Field(..., min_length=1, max_length=2000)
+
+
+class BudgetBatchOut(BaseModel):
+    """Изменённые строки (плоско, включая группы-предки с новыми итогами) и id удалённых."""
+    lines: list[BudgetLineOut] = []
+    created: list[uuid.UUID] = []  # id созданных строк в порядке операций create
+    deleted: list[uuid.UUID] = []
@@ -47,3 +47,17 @@ class ContractorOut(BaseModel):
     has_bank_details: bool = False
 
     model_config = {"from_attributes": True}
+
+
+class ContractorSensitiveBatch(BaseModel):
+    """Запрос реквизитов для выгрузки (реестр платежей) по контрагентам проекта."""
+    project_id: uuid.UUID
+    # None — все контрагенты договоров и статей проекта
+    contractor_ids: Optional[list[uuid.UUID]] = None
+
+
+class ContractorSensitiveOut(BaseModel):
+    id: uuid.UUID
+    full_name: str
+    passport_data: Optional[str]
+    bank_details: Optional[str]
@@ -0,0 +1,21 @@
+import uuid
+from datetime import datetime
+from typing import Literal, Optional
+
+from pydantic import BaseModel
+
+
+class ExportJobCreate(BaseModel):
+    type: Literal["budget_xlsx", "reports_xlsx"]
+
+
+class ExportJobOut(BaseModel):
+    id: uuid.UUID
+    type: str
+    project_id: uuid.UUID
+    status: str  # PENDING, RUNNING, DONE, FAILED
+    error: Optional[str]
+    created_at: datetime
+    finished_at: Optional[datetime]
+
+    model_config = {"from_attributes": True}
@@ -1,3 +1,4 @@
+import datetime as dt
 import uuid
 from datetime import datetime, date, time
 from pydantic import BaseModel
@@ -82,7 +83,8 @@ class ProductionReportCreate(BaseModel):
 
 class ProductionReportUpdate(BaseModel):
     shoot_day_number: Optional[int] = None
-    date: Optional[date] = None
+    # dt.date: аннотация date здесь указывала бы на само поле (None)
+    date: Optional[dt.date] = None
     location: Optional[str] = None
     shooting_group: Optional[str] = None
     notes: Optional[str] = None
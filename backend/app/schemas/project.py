@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
 
@@ -33,3 +33,17 @@ class ProjectOut(BaseModel):
     created_at: datetime
 
     model_config = {"from_attributes": True}
+
+
+class ProjectClone(BaseModel):
+    name: str
+    include_contracts: bool = False
+    # Множитель ставок статей (индексация бюджета); суммы пересчитываются
+    rate_factor: float = Field(1.0, gt=0)
+
+
+class ProjectCloneOut(BaseModel):
+    project: ProjectOut
+    lines: int
+    contracts: int
+    contract_links: int
@@ -34,3 +34,27 @@ class TaxComponentCreate(BaseModel):
 class TaxSchemeCreate(BaseModel):
     name: str
     components: list[TaxComponentCreate]
+
+
+class TaxSchemeUpdate(BaseModel):
+    name: Optional[str] = None
+    components: Optional[list[TaxComponentCreate]] = None
+
+
+class TaxBreakdownComponent(BaseModel):
+    name: str
+    recipient: str
+    amount: float
+    lines: int  # строк с этим компонентом
+
+
+class TaxBreakdownSection(BaseModel):
+    components: list[TaxBreakdownComponent]
+    by_recipient: dict[str, float]
+    total: float
+
+
+class TaxBreakdownOut(BaseModel):
+    """Налоги проекта по компонентам: по статьям бюджета и по производственным отчётам."""
+    budget: TaxBreakdownSection
+    reports: TaxBreakdownSection
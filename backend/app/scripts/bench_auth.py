@@ -0,0 +1,75 @@
+"""
+Бенчмарк зависимости get_current_user: разбор JWT + чтение пользователя на каждый
+запрос против кэша аутентификации.
+Запуск: python -m app.scripts.bench_auth [--requests 20000] [--db-ms 0.3]
+
+БД не нужна: запрос к users заменён заглушкой, которая ждёт --db-ms миллисекунд
+(типичное время SELECT по первичному ключу с учётом сети и пула).
+"""
+import argparse
+import asyncio
+import sys
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.core.security import create_access_token
+from app.models.user import User
+from app.routers.deps import get_current_user
+from app.services import auth_cache
+
+
+class _Session:
+    def __init__(self, user: User, delay: float):
+        self.user = user
+        self.delay = delay
+        self.queries = 0
+
+    async def execute(self, statement):
+        self.queries += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return SimpleNamespace(scalar_one_or_none=lambda: self.user)
+
+
+async def _run(n: int, tokens: list[str], db: _Session) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=tokens[i % len(tokens)])
+        await get_current_user(credentials, db)
+    return (time.perf_counter() - t0) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--db-ms", type=float, default=0.3)
+    args = parser.parse_args()
+
+    users = [
+        User(id=uuid.uuid4(), email=f"u{i}@bench", full_name="Bench", hashed_password="x",
+             is_active=True, is_superadmin=False, created_at=datetime.now(timezone.utc))
+        for i in range(args.users)
+    ]
+    tokens = [create_access_token(str(u.id)) for u in users]
+
+    print(f"{'режим':<10} {'мкс/запрос':>11} {'запросов к users':>17}")
+    for mode in ("без кэша", "с кэшем"):
+        auth_cache.clear()
+        ttl = 0 if mode == "без кэша" else 60
+        auth_cache._tokens.ttl = auth_cache._users.ttl = ttl
+        # Одна и та же заглушка для всех пользователей: важен только счёт запросов
+        db = _Session(users[0], args.db_ms / 1000)
+        per_request = asyncio.run(_run(args.requests, tokens, db))
+        print(f"{mode:<10} {per_request * 1e6:>11.1f} {db.queries:>17}")
+
+
+if __name__ == "__main__":
+    main()
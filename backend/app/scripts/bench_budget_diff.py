@@ -0,0 +1,64 @@
+"""
+Бенчмарк сравнения бюджетов: два синтетических бюджета по n строк, ~5% изменений.
+Запуск: python -m app.scripts.bench_budget_diff [--sizes 1000,10000,50000]
+"""
+import argparse
+import random
+import sys
+import os
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.core.budget_diff import diff_states
+from app.core.budget_tree import store_line_amounts
+from app.core.budget_versions import snapshot_line
+from app.scripts.bench_budget_tree import make_lines
+
+
+def make_pair(n: int, seed: int = 7) -> tuple[dict, dict]:
+    rnd = random.Random(seed)
+    lines, scheme_map = make_lines(n)
+    for i, line in enumerate(lines):
+        store_line_amounts(line, scheme_map)
+        line.code = str(i)
+    old = {line.id: snapshot_line(line) for line in lines}
+
+    new = {line_id: dict(snap) for line_id, snap in old.items()}
+    items = [line_id for line_id, snap in new.items() if snap["type"] == "ITEM"]
+    for line_id in rnd.sample(items, len(items) // 20):
+        snap = new[line_id]
+        snap["rate"] += 1000
+        snap["subtotal"] += 1000 * snap["quantity"]
+        snap["total"] += 1000 * snap["quantity"]
+    for line_id in rnd.sample(items, len(items) // 100):
+        new.pop(line_id, None)
+    for _ in range(len(items) // 100):
+        added = dict(old[items[0]])
+        new[uuid.uuid4()] = added
+    return old, new
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'строк':>8} {'по id, с':>10} {'по code, с':>11} {'событий':>9}")
+    for n in (int(x) for x in args.sizes.split(",")):
+        old, new = make_pair(n)
+        timings = {}
+        for key in ("id", "code"):
+            best = float("inf")
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                events = list(diff_states(old, new, key))
+                best = min(best, time.perf_counter() - t0)
+            timings[key] = best
+        print(f"{n:>8} {timings['id']:>10.3f} {timings['code']:>11.3f} {len(events):>9}")
+
+
+if __name__ == "__main__":
+    main()
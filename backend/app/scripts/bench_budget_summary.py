@@ -0,0 +1,109 @@
+"""
+Бенчмарк сводки бюджета: загрузка всех строк + сборка дерева в Python
+против агрегации в Postgres (GET /projects/{id}/budget/summary).
+Запуск: python -m app.scripts.bench_budget_summary [--sizes 1000,10000,50000] [--depth 2]
+
+Нужна рабочая БД из DATABASE_URL с применёнными миграциями. Синтетический проект
+коммитится и анализируется (ANALYZE), как данные после обычной загрузки: в незакоммиченной
+транзакции статистика видит пустую таблицу и планы не те, что в работе. В конце проект
+удаляется.
+"""
+import argparse
+import asyncio
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from sqlalchemy import select, insert, delete, text
+
+from app.database import AsyncSessionLocal, engine
+from app.models.budget import BudgetLine
+from app.models.project import Project
+from app.core.budget_tree import build_budget_tree, store_line_amounts
+from app.scripts.bench_budget_tree import make_lines
+from app.services.budget_rollups import load_rollup_map, rebuild_rollups_in_db
+from app.services.budget_summary import load_group_summary, load_project_totals
+
+COLUMNS = [c.key for c in BudgetLine.__table__.columns]
+# NULL вставляется явно только в nullable-колонки; остальные без значения (created_at) — по умолчанию модели
+NULLABLE = {c.key for c in BudgetLine.__table__.columns if c.nullable}
+
+
+async def _python_path(db, project_id, depth: int) -> dict:
+    """Как get_budget без depth: все строки + итоги групп, дерево в Python, затем срез по уровням."""
+    db.expunge_all()  # каждый прогон строит ORM-объекты заново, как в отдельном запросе
+    result = await db.execute(select(BudgetLine).where(BudgetLine.project_id == project_id))
+    lines = list(result.scalars().all())
+    tree = build_budget_tree(lines, None, {}, await load_rollup_map(db, project_id))
+    totals = {}
+    stack = list(tree)
+    while stack:
+        node = stack.pop()
+        if node.type == "GROUP" and node.level < depth:
+            totals[node.id] = node.total
+            stack.extend(node.children)
+    return totals
+
+
+async def _sql_path(db, project_id, depth: int) -> dict:
+    groups = await load_group_summary(db, project_id, depth)
+    await load_project_totals(db, project_id)
+    return {g["id"]: g["total"] for g in groups}
+
+
+async def _timeit(fn, repeat: int) -> tuple[float, dict]:
+    best, value = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        value = await fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, value
+
+
+async def run(sizes: list[int], depth: int, repeat: int):
+    print(f"{'строк':>8} {'python, с':>12} {'sql, с':>12} {'ускорение':>10}")
+    for n in sizes:
+        lines, scheme_map = make_lines(n)
+        async with AsyncSessionLocal() as db:
+            project = Project(id=lines[0].project_id, name=f"bench {n}")
+            db.add(project)
+            await db.flush()
+            rows = []
+            # Родители раньше детей (внешний ключ parent_id); набор колонок у всех строк один
+            for line in sorted(lines, key=lambda l: l.level):
+                store_line_amounts(line, scheme_map)
+                line.tax_scheme_id = None  # синтетические схемы не существуют в БД
+                line.code = line.code or ""
+                rows.append({c: getattr(line, c, None) for c in COLUMNS if c in NULLABLE or getattr(line, c, None) is not None})
+            await db.execute(insert(BudgetLine), rows)
+            await rebuild_rollups_in_db(db, [project.id])
+            await db.commit()
+            try:
+                await db.execute(text("ANALYZE budget_lines, budget_rollups"))
+                db.expunge_all()
+
+                py_t, py_totals = await _timeit(lambda: _python_path(db, project.id, depth), repeat)
+                sql_t, sql_totals = await _timeit(lambda: _sql_path(db, project.id, depth), repeat)
+                assert py_totals.keys() == sql_totals.keys(), "разный набор групп"
+                assert all(abs(py_totals[k] - sql_totals[k]) < 0.01 for k in py_totals), "итоги расходятся"
+                print(f"{n:>8} {py_t:>12.3f} {sql_t:>12.3f} {py_t / sql_t:>9.1f}x")
+            finally:
+                await db.rollback()
+                await db.execute(delete(Project).where(Project.id == project.id))
+                await db.commit()
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run([int(x) for x in args.sizes.split(",")], args.depth, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
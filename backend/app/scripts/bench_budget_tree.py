@@ -0,0 +1,135 @@
+"""
+Бенчмарк сборки дерева бюджета: прежний рекурсивный _build_tree vs build_budget_tree.
+Запуск: python -m app.scripts.bench_budget_tree [--sizes 1000,10000,50000] [--legacy-max 50000]
+
+Прежняя реализация квадратична: на 50k строк она работает минуты,
+поэтому её можно ограничить флагом --legacy-max.
+"""
+import argparse
+import random
+import sys
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.models.budget import BudgetLine
+from app.core.budget_tree import build_budget_tree, line_to_out
+from app.core.budget_path import child_path
+from app.core.tax_logic import calc_tax, SYSTEM_TAX_SCHEMES
+
+
+def _legacy_build_tree(lines, scheme_map, contractor_map, parent_id=None):
+    """Копия прежнего _build_tree из app/routers/budget.py — для сравнения."""
+    result = []
+    for line in sorted([l for l in lines if l.parent_id == parent_id], key=lambda x: x.sort_order):
+        components = []
+        if line.tax_scheme_id and line.tax_scheme_id in scheme_map:
+            components = scheme_map[line.tax_scheme_id]
+
+        out = line_to_out(line, contractor_map)
+        if line.type != "GROUP":
+            r = calc_tax(line.rate, line.quantity, components)
+            out.subtotal, out.tax_amount, out.total = r["subtotal"], r["tax_amount"], r["total"]
+        out.children = _legacy_build_tree(lines, scheme_map, contractor_map, line.id)
+
+        if line.type == "GROUP" and out.children:
+            out.subtotal = sum(c.subtotal for c in out.children)
+            out.tax_amount = sum(c.tax_amount for c in out.children)
+            out.total = sum(c.total for c in out.children)
+            out.accrued = sum(c.accrued for c in out.children)
+            out.paid = sum(c.paid for c in out.children)
+            out.closed = sum(c.closed for c in out.children)
+
+        result.append(out)
+    return result
+
+
+def _comparable(nodes) -> list[dict]:
+    """model_dump без полей, которых не было у прежней реализации."""
+    result = []
+    for node in nodes:
+        d = node.model_dump(exclude={"has_children", "child_count", "children"})
+        d["children"] = _comparable(node.children)
+        result.append(d)
+    return result
+
+
+def make_lines(n: int, seed: int = 42) -> tuple[list[BudgetLine], dict]:
+    """Синтетический бюджет: категории → подкатегории → статьи, ~n строк."""
+    rnd = random.Random(seed)
+    project_id = uuid.uuid4()
+    now = datetime.now(timezone.utc)
+    scheme_map = {uuid.uuid4(): comps for comps in SYSTEM_TAX_SCHEMES.values()}
+    scheme_ids = list(scheme_map) + [None]
+
+    lines: list[BudgetLine] = []
+
+    def add(parent, level, sort_order, type_):
+        line_id = uuid.uuid4()
+        line = BudgetLine(
+            id=line_id, project_id=project_id, parent_id=parent.id if parent else None,
+            path=child_path(parent.path if parent else None, line_id),
+            sort_order=sort_order, level=level, code="", name=f"Статья {len(lines)}", type=type_,
+            unit="смена", quantity_units=1.0, rate=float(rnd.randint(0, 200_000)), quantity=float(rnd.randint(1, 60)),
+            tax_scheme_id=rnd.choice(scheme_ids) if type_ == "ITEM" else None, contractor_id=None,
+            tax_override=False, currency="RUB", limit_amount=0.0, updated_at=now,
+        )
+        lines.append(line)
+        return line
+
+    categories = max(n // 200, 1)
+    per_sub = 20
+    subs_per_cat = max((n // categories - 1) // (per_sub + 1), 1)
+    c = 0
+    while len(lines) < n:
+        cat = add(None, 0, c, "GROUP")
+        for s in range(subs_per_cat):
+            if len(lines) >= n:
+                break
+            sub = add(cat, 1, s, "GROUP")
+            for i in range(per_sub):
+                if len(lines) >= n:
+                    break
+                add(sub, 2, i, "ITEM")
+        c += 1
+
+    rnd.shuffle(lines)  # из БД строки приходят без гарантированного порядка
+    return lines, scheme_map
+
+
+def _timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--legacy-max", type=int, default=10000, help="не запускать старую версию выше этого размера")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'строк':>8} {'старый, с':>12} {'новый, с':>12} {'ускорение':>10}")
+    for n in (int(x) for x in args.sizes.split(",")):
+        lines, scheme_map = make_lines(n)
+        new_t = _timeit(lambda: build_budget_tree(lines, scheme_map, {}), args.repeat)
+
+        if n <= args.legacy_max:
+            legacy_t = _timeit(lambda: _legacy_build_tree(lines, scheme_map, {}), 1)
+            legacy = _legacy_build_tree(lines, scheme_map, {})
+            new = build_budget_tree(lines, scheme_map, {})
+            assert _comparable(legacy) == _comparable(new), "деревья расходятся"
+            print(f"{n:>8} {legacy_t:>12.3f} {new_t:>12.3f} {legacy_t / new_t:>9.1f}x")
+        else:
+            print(f"{n:>8} {'—':>12} {new_t:>12.3f} {'—':>10}")
+
+
+if __name__ == "__main__":
+    main()
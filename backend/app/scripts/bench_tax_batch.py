@@ -0,0 +1,49 @@
+"""
+Бенчмарк налогового расчёта: calc_tax построчно vs calc_tax_batch на NumPy.
+Запуск: python -m app.scripts.bench_tax_batch [--sizes 1000,10000,100000]
+
+Обе версии считают одни и те же строки; результаты сверяются побитно.
+«расчёт» — только налоговая арифметика на заранее собранных данных,
+«строки» — вместе с чтением атрибутов ORM-объектов BudgetLine.
+"""
+import argparse
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.core.tax_batch import TaxTable, calc_tax_batch, line_amounts_batch
+from app.core.tax_logic import calc_tax
+from app.core.budget_tree import line_amounts
+from app.scripts.bench_budget_tree import make_lines, _timeit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'строк':>8} {'':>8} {'calc_tax, с':>12} {'numpy, с':>12} {'ускорение':>10}")
+    for n in (int(x) for x in args.sizes.split(",")):
+        lines, scheme_map = make_lines(n)
+        items = [line for line in lines if line.type != "GROUP"]
+
+        rows = [(line.rate, line.quantity, scheme_map.get(line.tax_scheme_id, [])) for line in items]
+        table = TaxTable(scheme_map)
+        rates = [line.rate for line in items]
+        quantities = [line.quantity for line in items]
+        idx = table.lookup(line.tax_scheme_id for line in items)
+        scalar_t = _timeit(lambda: [calc_tax(*row) for row in rows], args.repeat)
+        batch_t = _timeit(lambda: calc_tax_batch(rates, quantities, idx, table), args.repeat)
+        print(f"{n:>8} {'расчёт':>8} {scalar_t:>12.4f} {batch_t:>12.4f} {scalar_t / batch_t:>9.1f}x")
+
+        scalar_t = _timeit(lambda: {line.id: line_amounts(line, scheme_map) for line in items}, args.repeat)
+        batch_t = _timeit(lambda: line_amounts_batch(items, scheme_map), args.repeat)
+        scalar = {line.id: line_amounts(line, scheme_map) for line in items}
+        assert scalar == line_amounts_batch(items, scheme_map), "суммы расходятся"
+        print(f"{n:>8} {'строки':>8} {scalar_t:>12.4f} {batch_t:>12.4f} {scalar_t / batch_t:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Ротация ключа шифрования полей контрагентов.
+Запуск: ENCRYPTION_KEY=<новый> ENCRYPTION_KEY_PREVIOUS=<старый> python -m app.scripts.rotate_encryption_key
+
+Пока идёт ротация, приложение должно работать с той же парой ключей: оно читает
+значения под любым из них. После завершения ENCRYPTION_KEY_PREVIOUS можно убрать.
+"""
+import argparse
+import asyncio
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.core.config import settings
+from app.database import AsyncSessionLocal, engine
+from app.services.crypto import ROTATION_CHUNK, rotate_contractor_keys
+
+
+async def main(chunk_size: int):
+    if not settings.encryption_key_previous:
+        print("ENCRYPTION_KEY_PREVIOUS не задан — перешифровывать нечего")
+        return
+    async with AsyncSessionLocal() as db:
+        result = await rotate_contractor_keys(db, chunk_size)
+    await engine.dispose()
+    print(f"Просмотрено контрагентов: {result['scanned']}, перешифровано: {result['rotated']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunk", type=int, default=ROTATION_CHUNK)
+    asyncio.run(main(parser.parse_args().chunk))
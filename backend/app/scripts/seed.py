@@ -15,7 +15,7 @@ from app.database import AsyncSessionLocal, engine
 from app.database import Base
 from app.models.user import User
 from app.models.tax import TaxScheme, TaxComponent
-from app.core.security import hash_password
+from app.services.passwords import hash_password_async
 from app.core.tax_logic import SYSTEM_TAX_SCHEMES
 
 
@@ -56,7 +56,7 @@ async def seed_admin(db: AsyncSession, email: str, password: str, full_name: str
 
     user = User(
         email=email,
-        hashed_password=hash_password(password),
+        hashed_password=await hash_password_async(password),
         full_name=full_name,
         is_active=True,
         is_superadmin=True,
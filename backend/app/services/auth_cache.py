@@ -0,0 +1,86 @@
+"""
+Кэш аутентификации: разобранные access-токены и активные пользователи.
+
+Каждый API-запрос проверяет JWT и читает пользователя из users. Оба результата
+кэшируются в памяти процесса на settings.auth_cache_ttl секунд: токен — не дольше
+его exp, пользователь — снимком AuthUser (ORM-объект между сессиями не делится).
+Изменение или удаление User через ORM сбрасывает его запись сразу; изменения из
+других процессов видны не позже чем через auth_cache_ttl.
+"""
+import time
+import uuid
+from datetime import datetime
+
+from jose import JWTError
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+from app.core.security import decode_token
+from app.models.user import User
+
+_tokens = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+_users = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+
+
+class AuthUser:
+    """Неизменяемый снимок пользователя для зависимостей и /auth/me."""
+    __slots__ = ("id", "email", "full_name", "is_active", "is_superadmin", "created_at")
+
+    def __init__(self, id: uuid.UUID, email: str, full_name: str, is_active: bool, is_superadmin: bool, created_at: datetime):
+        self.id = id
+        self.email = email
+        self.full_name = full_name
+        self.is_active = is_active
+        self.is_superadmin = is_superadmin
+        self.created_at = created_at
+
+    @classmethod
+    def from_user(cls, user: User) -> "AuthUser":
+        return cls(*(getattr(user, f) for f in cls.__slots__))
+
+
+def access_token_subject(token: str) -> uuid.UUID:
+    """id пользователя из access-токена. Бросает JWTError (в том числе для refresh-токена)."""
+    user_id = _tokens.get(token)
+    if user_id is not MISSING:
+        return user_id
+    payload = decode_token(token)
+    if payload.get("type") != "access":
+        raise JWTError("wrong token type")
+    try:
+        user_id = uuid.UUID(payload.get("sub"))
+    except (TypeError, ValueError):
+        raise JWTError("bad subject")
+    _tokens.set(token, user_id, ttl=payload["exp"] - time.time())
+    return user_id
+
+
+async def load_active_user(db: AsyncSession, user_id: uuid.UUID) -> AuthUser | None:
+    """Активный пользователь (из кэша или users) или None. Неактивные не кэшируются."""
+    user = _users.get(user_id)
+    if user is not MISSING:
+        return user
+    result = await db.execute(select(User).where(User.id == user_id))
+    row = result.scalar_one_or_none()
+    if not row or not row.is_active:
+        return None
+    user = AuthUser.from_user(row)
+    _users.set(user_id, user)
+    return user
+
+
+def invalidate_user(user_id: uuid.UUID) -> None:
+    _users.pop(user_id)
+
+
+def clear() -> None:
+    _tokens.clear()
+    _users.clear()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target: User) -> None:
+    invalidate_user(target.id)
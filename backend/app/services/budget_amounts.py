@@ -0,0 +1,63 @@
+"""
+Пакетный пересчёт сохранённых сумм статей (subtotal/tax_amount/total).
+
+Используется, когда меняются компоненты налоговой схемы: все затронутые
+строки пересчитываются одним UPDATE внутри Postgres, затем итоги групп
+затронутых проектов пересобираются там же. Формула налога повторяет
+app/core/tax_logic.calc_tax: floor на единицу по каждому компоненту.
+"""
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.budget_rollups import rebuild_rollups_in_db
+
+_RECOMPUTE_SQL = text("""
+UPDATE budget_lines b SET
+    subtotal = b.rate * b.quantity,
+    tax_amount = t.per_unit * b.quantity,
+    total = (b.rate + t.per_unit) * b.quantity,
+    updated_at = now(),
+    sync_version = NULL
+FROM (
+    SELECT l.id,
+           COALESCE(SUM(FLOOR(CASE c.type
+               WHEN 'INTERNAL' THEN l.rate / (1 - c.rate) * c.rate
+               WHEN 'EXTERNAL' THEN l.rate * c.rate
+               ELSE 0 END)), 0) AS per_unit
+    FROM budget_lines l
+    LEFT JOIN tax_components c ON c.scheme_id = l.tax_scheme_id
+    WHERE l.tax_scheme_id = :scheme_id AND l.type <> 'GROUP'
+    GROUP BY l.id
+) t
+WHERE b.id = t.id
+RETURNING b.project_id
+""")
+
+# Строки схемы, которая удаляется: налог обнуляется (FK станет NULL)
+_CLEAR_SQL = text("""
+UPDATE budget_lines SET
+    tax_amount = 0,
+    total = subtotal,
+    updated_at = now(),
+    sync_version = NULL
+WHERE tax_scheme_id = :scheme_id AND type <> 'GROUP'
+RETURNING project_id
+""")
+
+
+async def recompute_scheme_lines(db: AsyncSession, scheme_id: uuid.UUID) -> set[uuid.UUID]:
+    """Пересчитывает все строки со схемой scheme_id и итоги их проектов. Возвращает id проектов."""
+    result = await db.execute(_RECOMPUTE_SQL, {"scheme_id": scheme_id})
+    project_ids = set(result.scalars().all())
+    await rebuild_rollups_in_db(db, project_ids)
+    return project_ids
+
+
+async def clear_scheme_lines(db: AsyncSession, scheme_id: uuid.UUID) -> set[uuid.UUID]:
+    """Снимает налог со строк удаляемой схемы и пересобирает итоги их проектов."""
+    result = await db.execute(_CLEAR_SQL, {"scheme_id": scheme_id})
+    project_ids = set(result.scalars().all())
+    await rebuild_rollups_in_db(db, project_ids)
+    return project_ids
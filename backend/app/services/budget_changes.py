@@ -0,0 +1,135 @@
+"""
+Дельта-синхронизация бюджета: что изменилось в проекте после курсора.
+
+Курсор — версия проекта (data_versions, project:<id>), прочитанная до выборки,
+и момент её выдачи. Каждая запись статьи, итогов группы или следа удаления
+оставляет sync_version = NULL, а bump_budget в той же транзакции увеличивает
+версию проекта и проставляет её этим строкам. Блокировка строки версии держится
+до commit, поэтому версии фиксируются строго по порядку: строка с версией не
+больше курсора уже была видна, когда курсор читался, — как бы долго ни шла
+записавшая её транзакция. Клиент применяет ответ идемпотентно (перезапись по
+id), поэтому повторно пришедшие строки безвредны.
+
+Следы удалений хранятся TOMBSTONE_RETENTION; курсор старше CURSOR_TTL —
+reset=true, клиент перечитывает дерево целиком.
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete, literal, union, or_, text, DateTime
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.budget_path import subtree_pattern
+from app.models.budget import BudgetLine, BudgetRollup, BudgetLineTombstone
+from app.services.versions import project_scope, bump_version, get_versions
+
+TOMBSTONE_RETENTION = timedelta(days=30)
+# Запас на транзакции, записавшие след задолго до выдачи курсора
+CURSOR_TTL = TOMBSTONE_RETENTION - timedelta(days=1)
+
+_SYNC_TABLES = ("budget_lines", "budget_rollups", "budget_line_tombstones")
+
+
+async def bump_budget(db: AsyncSession, project_id: uuid.UUID) -> int:
+    """
+    Новая версия проекта (ETag и курсор синхронизации). Строки, итоги и следы,
+    изменённые в этой транзакции (sync_version IS NULL), получают её.
+    Вызывается после всех записей в бюджет проекта, перед commit.
+    """
+    version = await bump_version(db, project_scope(project_id))
+    for table in _SYNC_TABLES:
+        await db.execute(
+            text(f"UPDATE {table} SET sync_version = :version WHERE project_id = :project_id AND sync_version IS NULL"),
+            {"version": version, "project_id": project_id},
+        )
+    return version
+
+
+async def bump_budgets(db: AsyncSession, project_ids) -> None:
+    for project_id in sorted(set(project_ids)):  # фиксированный порядок — без взаимных блокировок
+        await bump_budget(db, project_id)
+
+
+async def current_cursor(db: AsyncSession, project_id: uuid.UUID) -> str:
+    """Курсор по зафиксированной версии проекта — читать до загрузки строк."""
+    versions = await get_versions(db, project_scope(project_id))
+    return encode_cursor(versions[project_scope(project_id)], datetime.now(timezone.utc))
+
+
+def encode_cursor(version: int, issued_at: datetime) -> str:
+    return f"{version}.{int(issued_at.timestamp())}"
+
+
+def decode_cursor(cursor: str) -> tuple[int, datetime]:
+    """Курсор → (версия, момент выдачи в UTC). ValueError — курсор некорректен."""
+    version, _, issued = cursor.partition(".")
+    version, issued = int(version), int(issued)
+    if version < 0:
+        raise ValueError(cursor)
+    return version, datetime.fromtimestamp(issued, timezone.utc)
+
+
+def cursor_expired(issued_at: datetime, now: datetime) -> bool:
+    """Следы удалений, нужные этому курсору, уже могли быть удалены — дельта неполна."""
+    return now - issued_at > CURSOR_TTL
+
+
+async def _write_tombstones(db: AsyncSession, rows, project_id: uuid.UUID) -> None:
+    moment = datetime.now(timezone.utc)
+    stmt = insert(BudgetLineTombstone).from_select(
+        ["line_id", "project_id", "parent_id", "deleted_at"],
+        select(rows.c.id, rows.c.project_id, rows.c.parent_id, literal(moment, DateTime(timezone=True))),
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["line_id"], set_={"deleted_at": stmt.excluded.deleted_at, "sync_version": None}
+        )
+    )
+    await db.execute(
+        delete(BudgetLineTombstone).where(
+            BudgetLineTombstone.project_id == project_id,
+            BudgetLineTombstone.deleted_at < moment - TOMBSTONE_RETENTION,
+        )
+    )
+
+
+async def record_subtree_deletion(db: AsyncSession, project_id: uuid.UUID, lines: list[BudgetLine]) -> None:
+    """Записывает следы строк и всех их потомков (до удаления — каскад снесёт их)."""
+    subtree = [BudgetLine.path.like(subtree_pattern(line.path)) for line in lines if line.path]
+    rows = (
+        select(BudgetLine.id, BudgetLine.project_id, BudgetLine.parent_id)
+        .where(BudgetLine.project_id == project_id, or_(BudgetLine.id.in_([l.id for l in lines]), *subtree))
+        .subquery()
+    )
+    await _write_tombstones(db, rows, project_id)
+
+
+async def record_project_deletion(db: AsyncSession, project_id: uuid.UUID) -> None:
+    """Следы всех строк проекта — перед полной заменой бюджета."""
+    rows = (
+        select(BudgetLine.id, BudgetLine.project_id, BudgetLine.parent_id)
+        .where(BudgetLine.project_id == project_id)
+        .subquery()
+    )
+    await _write_tombstones(db, rows, project_id)
+
+
+async def load_changes(db: AsyncSession, project_id: uuid.UUID, since: int) -> tuple[list[BudgetLine], list[uuid.UUID]]:
+    """
+    Строки, изменённые после версии since (включая группы, у которых поменялись итоги),
+    и id удалённых строк. Запросы идут по индексам (project_id, sync_version).
+    """
+    changed_ids = union(
+        select(BudgetLine.id).where(BudgetLine.project_id == project_id, BudgetLine.sync_version > since),
+        select(BudgetRollup.line_id).where(BudgetRollup.project_id == project_id, BudgetRollup.sync_version > since),
+    ).subquery()
+    result = await db.execute(select(BudgetLine).where(BudgetLine.id.in_(select(changed_ids))))
+    lines = list(result.scalars().all())
+
+    result = await db.execute(
+        select(BudgetLineTombstone.line_id).where(
+            BudgetLineTombstone.project_id == project_id, BudgetLineTombstone.sync_version > since
+        )
+    )
+    return lines, list(result.scalars().all())
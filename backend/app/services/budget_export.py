@@ -0,0 +1,132 @@
+"""
+Экспорт бюджета в Excel с постоянной памятью.
+
+Строки читаются серверным курсором (yield_per) в порядке дерева — ключ сортировки
+собирается рекурсивным CTE из sort_order предков. Каждая порция уходит в
+write-only лист openpyxl (строки сразу пишутся во временный файл, а не в память);
+суммы статей пересчитываются пакетом app/core/tax_batch по кэшу схем, итоги
+групп берутся из budget_rollups в том же запросе. Работа openpyxl идёт в
+отдельном пуле потоков, event loop занят только чтением из БД.
+"""
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.tax_batch import TaxTable, calc_tax_batch
+from app.services.tax_schemes import get_scheme_map
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+HEADERS = ("Код", "Статья", "Ед.изм.", "Кол-во ед.", "Ставка", "Кол-во", "Итого нетто", "Налог", "Итого", "Лимит")
+CHUNK = 1000
+
+_TREE_SQL = text("""
+WITH RECURSIVE tree AS (
+    SELECT id, ARRAY[sort_order] AS sort_key
+    FROM budget_lines
+    WHERE project_id = :project_id AND parent_id IS NULL
+    UNION ALL
+    SELECT b.id, t.sort_key || b.sort_order
+    FROM budget_lines b
+    JOIN tree t ON b.parent_id = t.id
+)
+SELECT b.id, b.type, b.level, b.code, b.name, b.unit, b.quantity_units, b.rate, b.quantity,
+       b.tax_scheme_id, b.limit_amount, r.subtotal, r.tax_amount, r.total
+FROM tree t
+JOIN budget_lines b ON b.id = t.id
+LEFT JOIN budget_rollups r ON r.line_id = b.id
+ORDER BY t.sort_key, b.id
+""")
+
+_executor = ThreadPoolExecutor(max_workers=settings.export_workers, thread_name_prefix="export")
+
+
+def sheet_rows(rows, table: TaxTable) -> list[tuple]:
+    """Порция строк БД → значения колонок HEADERS. Суммы ITEM — одним пакетом."""
+    items = [i for i, row in enumerate(rows) if row.type != "GROUP"]
+    amounts = {}
+    if items:
+        result = calc_tax_batch(
+            [rows[i].rate for i in items],
+            [rows[i].quantity for i in items],
+            table.lookup(rows[i].tax_scheme_id for i in items),
+            table,
+        )
+        amounts = dict(zip(items, zip(result.subtotal.tolist(), result.tax_amount.tolist(), result.total.tolist())))
+
+    out = []
+    for i, row in enumerate(rows):
+        if row.type == "GROUP":
+            subtotal, tax_amount, total = row.subtotal or 0.0, row.tax_amount or 0.0, row.total or 0.0
+        else:
+            subtotal, tax_amount, total = amounts[i]
+        out.append((
+            row.code, "  " * row.level + row.name, row.unit, row.quantity_units, row.rate, row.quantity,
+            subtotal, tax_amount, total, row.limit_amount,
+        ))
+    return out
+
+
+class BudgetSheetWriter:
+    """Write-only книга с одним листом; все методы выполняются в потоке пула."""
+
+    def __init__(self):
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+
+        self._cell = WriteOnlyCell
+        self._bold = Font(bold=True)
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet("Бюджет")
+        self.totals = [0.0, 0.0, 0.0]
+        self._append_bold(HEADERS)
+
+    def _append_bold(self, values) -> None:
+        cells = []
+        for value in values:
+            cell = self._cell(self.ws, value=value)
+            cell.font = self._bold
+            cells.append(cell)
+        self.ws.append(cells)
+
+    def write(self, rows, table: TaxTable) -> int:
+        """Порция строк БД на лист; статьи верхнего уровня — жирным. Итог проекта — по ITEM."""
+        totals = self.totals
+        for values, row in zip(sheet_rows(rows, table), rows):
+            if row.level == 0:
+                self._append_bold(values)
+            else:
+                self.ws.append(values)
+            if row.type != "GROUP":
+                totals[0] += values[6]
+                totals[1] += values[7]
+                totals[2] += values[8]
+        return len(rows)
+
+    def save(self, path: str) -> None:
+        self._append_bold(("", "Итого по проекту", None, None, None, None, *self.totals, None))
+        self.wb.save(path)
+
+
+async def run_in_export_pool(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+
+async def write_budget_xlsx(db: AsyncSession, project_id: uuid.UUID, path: str) -> int:
+    """Пишет бюджет проекта в path. Возвращает число строк."""
+    table = TaxTable(await get_scheme_map(db))
+    writer = await run_in_export_pool(BudgetSheetWriter)
+    count = 0
+    result = await db.stream(_TREE_SQL.execution_options(yield_per=CHUNK), {"project_id": project_id})
+    async for partition in result.partitions():
+        count += await run_in_export_pool(writer.write, partition, table)
+    await run_in_export_pool(writer.save, path)
+    return count
+
+
+def shutdown() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
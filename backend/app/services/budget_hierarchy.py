@@ -0,0 +1,100 @@
+"""
+Структура дерева бюджета: проверка циклов и перенумерация после перемещения.
+
+Код статьи позиционный ('1', '1.2', '1.2.3' — как в шаблоне), поэтому перемещение
+меняет коды, уровни и материализованные пути всего перенесённого поддерева и
+соседей, сдвинутых в старом и новом родителе. Всё это пересчитывается одним
+рекурсивным UPDATE.
+"""
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Подъём от перемещённых строк к корню; цикл — если вернулись в исходную строку
+_CYCLE_SQL = text("""
+WITH RECURSIVE up(start_id, id, depth) AS (
+    SELECT id, parent_id, 1 FROM budget_lines WHERE id = ANY(:line_ids) AND parent_id IS NOT NULL
+    UNION ALL
+    SELECT up.start_id, b.parent_id, up.depth + 1
+    FROM up JOIN budget_lines b ON b.id = up.id
+    WHERE b.parent_id IS NOT NULL AND up.id <> up.start_id AND up.depth < :max_depth
+)
+SELECT start_id FROM up WHERE id = start_id LIMIT 1
+""").bindparams(bindparam("line_ids", type_=ARRAY(UUID(as_uuid=True))))
+
+# Дети затронутых родителей нумеруются заново (перемещённая строка встаёт перед
+# соседом с тем же sort_order), дальше код, уровень и путь спускаются по поддеревьям.
+# Если один затронутый родитель лежит внутри другого, строка достижима дважды —
+# берётся вывод с наибольшим числом шагов: он идёт от верхнего родителя, чьи
+# код и путь не меняются в этом запросе.
+_RENUMBER_SQL = text("""
+WITH RECURSIVE ranked AS (
+    SELECT id, parent_id,
+           ROW_NUMBER() OVER (
+               PARTITION BY parent_id
+               ORDER BY sort_order, (id = ANY(:moved_ids)) DESC, id
+           ) AS rn
+    FROM budget_lines
+    WHERE project_id = :project_id
+),
+tree(id, code, level, sort_order, path, hops) AS (
+    SELECT r.id,
+           CASE WHEN p.id IS NULL THEN r.rn::text ELSE p.code || '.' || r.rn::text END,
+           COALESCE(p.level + 1, 0),
+           (r.rn - 1)::int,
+           COALESCE(p.path, '') || r.id::text || '/',
+           0
+    FROM ranked r LEFT JOIN budget_lines p ON p.id = r.parent_id
+    WHERE r.parent_id = ANY(:parent_ids) OR (:include_root AND r.parent_id IS NULL)
+    UNION ALL
+    SELECT r.id, t.code || '.' || r.rn::text, t.level + 1, (r.rn - 1)::int,
+           t.path || r.id::text || '/', t.hops + 1
+    FROM tree t JOIN ranked r ON r.parent_id = t.id
+),
+best AS (
+    SELECT DISTINCT ON (id) id, code, level, sort_order, path FROM tree ORDER BY id, hops DESC
+)
+UPDATE budget_lines b
+SET code = best.code, level = best.level, sort_order = best.sort_order, path = best.path, updated_at = :now,
+    sync_version = NULL
+FROM best
+WHERE b.id = best.id
+  AND (b.code, b.level, b.sort_order, b.path) IS DISTINCT FROM
+      (best.code, best.level, best.sort_order, best.path)
+""").bindparams(
+    bindparam("moved_ids", type_=ARRAY(UUID(as_uuid=True))),
+    bindparam("parent_ids", type_=ARRAY(UUID(as_uuid=True))),
+)
+
+# Ограничение глубины подъёма — на случай уже испорченных данных
+MAX_DEPTH = 1000
+
+
+async def find_cycle(db: AsyncSession, line_ids: list[uuid.UUID]) -> uuid.UUID | None:
+    """После перемещения: id строки, ставшей собственным предком, или None."""
+    if not line_ids:
+        return None
+    result = await db.execute(_CYCLE_SQL, {"line_ids": list(line_ids), "max_depth": MAX_DEPTH})
+    return result.scalar_one_or_none()
+
+
+async def renumber_after_move(
+    db: AsyncSession, project_id: uuid.UUID, parent_ids, moved_ids: list[uuid.UUID]
+) -> None:
+    """
+    Пересчитывает sort_order, code, level и path детей parent_ids (None — корень проекта)
+    и всех их потомков. Строки без изменений не трогаются.
+    """
+    parent_ids = set(parent_ids)
+    include_root = None in parent_ids
+    parent_ids.discard(None)
+    await db.execute(_RENUMBER_SQL, {
+        "project_id": project_id,
+        "parent_ids": list(parent_ids),
+        "include_root": include_root,
+        "moved_ids": list(moved_ids),
+        "now": datetime.now(timezone.utc),
+    })
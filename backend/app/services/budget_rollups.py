@@ -0,0 +1,164 @@
+"""
+Сохранённые итоги групп бюджета (budget_rollups).
+
+Каждая запись статьи меняет итоги только на цепочке её предков, поэтому вместо
+пересчёта всего дерева к предкам прибавляется дельта — одним UPDATE по id
+предков из материализованного пути строки. rebuild_rollups/check_rollups
+пересчитывают всё с нуля и служат проверкой согласованности.
+"""
+import uuid
+
+from sqlalchemy import select, update, delete, text, bindparam
+from sqlalchemy.dialects.postgresql import insert, ARRAY, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.budget_tree import ROLLUP_FIELDS, compute_group_rollups, stored_amounts
+from app.models.budget import BudgetLine, BudgetRollup
+
+# Допуск при сравнении: дельты копятся во float
+DRIFT_TOLERANCE = 0.005
+
+
+async def apply_delta(db: AsyncSession, line_ids: list[uuid.UUID], delta: dict) -> None:
+    """Прибавляет delta (поле → число) к итогам групп line_ids — обычно ancestor_ids(line.path)."""
+    values = {f: getattr(BudgetRollup, f) + v for f, v in delta.items() if v}
+    if not line_ids or not values:
+        return
+    await db.execute(
+        update(BudgetRollup)
+        .where(BudgetRollup.line_id.in_(line_ids))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def apply_deltas(db: AsyncSession, deltas: dict) -> None:
+    """Разные дельты для разных групп (line_id → {поле: число}) — одним executemany."""
+    rows = [
+        {"b_line_id": line_id, **{f"b_{f}": delta.get(f, 0.0) for f in ROLLUP_FIELDS[:3]}}
+        for line_id, delta in deltas.items()
+        if any(delta.values())
+    ]
+    if not rows:
+        return
+    stmt = (
+        update(BudgetRollup.__table__)
+        .where(BudgetRollup.__table__.c.line_id == bindparam("b_line_id"))
+        .values(**{f: getattr(BudgetRollup.__table__.c, f) + bindparam(f"b_{f}") for f in ROLLUP_FIELDS[:3]})
+    )
+    await db.execute(stmt, rows)
+
+
+def amounts_delta(old: tuple, new: tuple) -> dict:
+    """Дельта между (subtotal, tax_amount, total) до и после изменения."""
+    return {f: n - o for f, o, n in zip(ROLLUP_FIELDS, old, new)}
+
+
+def negate(delta: dict) -> dict:
+    return {f: -v for f, v in delta.items()}
+
+
+async def line_contribution(db: AsyncSession, line: BudgetLine) -> dict:
+    """
+    Вклад строки в итоги родителя: для ITEM — её сохранённые суммы,
+    для GROUP — её сохранённые итоги.
+    """
+    if line.type != "GROUP":
+        return dict(zip(ROLLUP_FIELDS, stored_amounts(line)))
+    rollup = await db.get(BudgetRollup, line.id)
+    if not rollup:
+        return {}
+    return {f: getattr(rollup, f) for f in ROLLUP_FIELDS}
+
+
+def new_group_rollup(line: BudgetLine) -> BudgetRollup:
+    """Пустые итоги для только что созданной группы."""
+    return BudgetRollup(line_id=line.id, project_id=line.project_id, **{f: 0.0 for f in ROLLUP_FIELDS})
+
+
+async def load_rollup_map(db: AsyncSession, project_id: uuid.UUID, line_ids: list | None = None) -> dict:
+    """line_id → кортеж по ROLLUP_FIELDS для групп проекта (или только для line_ids)."""
+    q = select(BudgetRollup.line_id, *(getattr(BudgetRollup, f) for f in ROLLUP_FIELDS))
+    if line_ids is None:
+        q = q.where(BudgetRollup.project_id == project_id)
+    elif not line_ids:
+        return {}
+    else:
+        q = q.where(BudgetRollup.line_id.in_(line_ids))
+    result = await db.execute(q)
+    return {row[0]: tuple(row[1:]) for row in result.all()}
+
+
+async def write_rollups(db: AsyncSession, project_id: uuid.UUID, rollups: dict) -> None:
+    """Полностью заменяет итоги групп проекта."""
+    await db.execute(delete(BudgetRollup).where(BudgetRollup.project_id == project_id))
+    if rollups:
+        await db.execute(
+            insert(BudgetRollup),
+            [
+                {"line_id": line_id, "project_id": project_id, **dict(zip(ROLLUP_FIELDS, values))}
+                for line_id, values in rollups.items()
+            ],
+        )
+
+
+async def rebuild_rollups(db: AsyncSession, project_id: uuid.UUID, lines: list[BudgetLine], scheme_map: dict | None = None) -> dict:
+    """Пересчитывает итоги групп с нуля по уже загруженным строкам и сохраняет их."""
+    rollups = compute_group_rollups(lines, scheme_map)
+    await write_rollups(db, project_id, rollups)
+    return rollups
+
+
+async def check_rollups(db: AsyncSession, project_id: uuid.UUID, lines: list[BudgetLine], scheme_map: dict | None = None) -> list[dict]:
+    """Сравнивает сохранённые итоги с пересчитанными с нуля. Возвращает список расхождений."""
+    actual = compute_group_rollups(lines, scheme_map)
+    stored = await load_rollup_map(db, project_id)
+    by_id = {line.id: line for line in lines}
+
+    drift = []
+    for line_id in actual.keys() | stored.keys():
+        line = by_id.get(line_id)
+        expected = actual.get(line_id)
+        found = stored.get(line_id)
+        for i, field in enumerate(ROLLUP_FIELDS):
+            exp_v = expected[i] if expected else None
+            got_v = found[i] if found else None
+            if exp_v is None or got_v is None or abs(exp_v - got_v) > DRIFT_TOLERANCE:
+                drift.append({
+                    "line_id": line_id,
+                    "code": line.code if line else None,
+                    "name": line.name if line else None,
+                    "field": field,
+                    "stored": got_v,
+                    "actual": exp_v,
+                })
+    return drift
+
+
+# Итог группы = сумма сохранённых сумм всех её ITEM-потомков. Предки строки — элементы
+# её материализованного пути, поэтому это один проход по строкам проектов с GROUP BY:
+# без рекурсии и соединений, план не зависит от статистики только что вставленных строк.
+# Группа сама входит в свой набор (с нулём), чтобы итог был и у групп без статей.
+_REBUILD_SQL = text("""
+INSERT INTO budget_rollups (line_id, project_id, subtotal, tax_amount, total, accrued, paid, closed)
+SELECT a.group_id::uuid, b.project_id,
+       SUM(CASE WHEN b.type = 'GROUP' THEN 0 ELSE b.subtotal END),
+       SUM(CASE WHEN b.type = 'GROUP' THEN 0 ELSE b.tax_amount END),
+       SUM(CASE WHEN b.type = 'GROUP' THEN 0 ELSE b.total END),
+       0, 0, 0
+FROM budget_lines b
+CROSS JOIN LATERAL unnest(string_to_array(b.path, '/')) AS a(group_id)
+WHERE b.project_id = ANY(:project_ids)
+  AND a.group_id <> ''
+  AND (b.type = 'GROUP' OR a.group_id <> b.id::text)
+GROUP BY a.group_id, b.project_id
+""").bindparams(bindparam("project_ids", type_=ARRAY(UUID(as_uuid=True))))
+
+
+async def rebuild_rollups_in_db(db: AsyncSession, project_ids) -> None:
+    """Пересчитывает итоги групп проектов целиком внутри Postgres, без загрузки строк."""
+    project_ids = list(set(project_ids))
+    if not project_ids:
+        return
+    await db.execute(delete(BudgetRollup).where(BudgetRollup.project_id.in_(project_ids)))
+    await db.execute(_REBUILD_SQL, {"project_ids": project_ids})
@@ -0,0 +1,52 @@
+"""
+Симуляция налоговых схем по проекту (app/core/tax_simulation.py) с кэшем результатов.
+
+Строки читаются одним запросом только нужных колонок, схемы — из кэша
+app/services/tax_schemes, итоги групп — из budget_rollups. Ничего не пишется.
+Результат кэшируется по (проект, версии проекта и справочника схем, хеш
+переназначения): повтор того же вопроса к неизменённому бюджету — без расчёта.
+"""
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+from app.core.tax_simulation import remapping_key, simulate
+from app.models.budget import BudgetLine
+from app.services.budget_rollups import load_rollup_map
+from app.services.tax_schemes import get_scheme_map
+from app.services.versions import TAX_SCHEMES_SCOPE, project_scope, get_versions
+
+_COLUMNS = (
+    "id", "parent_id", "path", "level", "code", "name", "type", "rate", "quantity",
+    "tax_scheme_id", "contractor_id", "tax_override", "subtotal", "tax_amount", "total",
+)
+
+_results = TTLCache(maxsize=settings.simulation_cache_size, ttl=settings.simulation_cache_ttl)
+
+
+async def simulate_project(
+    db: AsyncSession, project_id: uuid.UUID, by_scheme: dict, by_contractor: dict, by_line: dict,
+) -> dict:
+    """Изменение итогов проекта и групп при переназначении схем (см. app/core/tax_simulation)."""
+    versions = await get_versions(db, project_scope(project_id), TAX_SCHEMES_SCOPE)
+    key = (project_id, tuple(sorted(versions.items())), remapping_key(by_scheme, by_contractor, by_line))
+    cached = _results.get(key)
+    if cached is not MISSING:
+        return cached
+
+    result = await db.execute(
+        select(*(getattr(BudgetLine, c) for c in _COLUMNS)).where(BudgetLine.project_id == project_id)
+    )
+    rows = result.all()
+    targets = {*by_scheme.values(), *by_contractor.values(), *by_line.values()}
+    scheme_map = await get_scheme_map(db, targets)
+    simulation = simulate(rows, scheme_map, await load_rollup_map(db, project_id), by_scheme, by_contractor, by_line)
+    _results.set(key, simulation)
+    return simulation
+
+
+def clear() -> None:
+    _results.clear()
@@ -0,0 +1,51 @@
+"""
+Сводка бюджета по группам верхних уровней — агрегация целиком в Postgres.
+
+Каждая статья вносит свои сохранённые суммы в предков на уровнях 0..depth-1;
+id предка на уровне k — (k+1)-й элемент материализованного пути. Поэтому сводка —
+один проход по статьям проекта с GROUP BY, без рекурсии и без передачи строк
+в приложение.
+"""
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+_SUMMARY_SQL = text("""
+WITH item_sums AS (
+    SELECT split_part(b.path, '/', k.lvl + 1)::uuid AS group_id,
+           SUM(b.subtotal) AS subtotal, SUM(b.tax_amount) AS tax_amount, SUM(b.total) AS total
+    FROM budget_lines b
+    CROSS JOIN generate_series(0, CAST(:depth AS integer) - 1) AS k(lvl)
+    WHERE b.project_id = :project_id
+      AND b.type <> 'GROUP'
+      AND split_part(b.path, '/', k.lvl + 2) <> ''
+    GROUP BY 1
+)
+SELECT g.id, g.parent_id, g.code, g.name, g.level, g.limit_amount,
+       COALESCE(s.subtotal, 0), COALESCE(s.tax_amount, 0), COALESCE(s.total, 0)
+FROM budget_lines g
+LEFT JOIN item_sums s ON s.group_id = g.id
+WHERE g.project_id = :project_id AND g.type = 'GROUP' AND g.level < :depth
+ORDER BY g.level, g.parent_id, g.sort_order
+""")
+
+_TOTALS_SQL = text("""
+SELECT COALESCE(SUM(subtotal), 0), COALESCE(SUM(tax_amount), 0), COALESCE(SUM(total), 0)
+FROM budget_lines
+WHERE project_id = :project_id AND type <> 'GROUP'
+""")
+
+SUMMARY_FIELDS = ("id", "parent_id", "code", "name", "level", "limit_amount", "subtotal", "tax_amount", "total")
+
+
+async def load_group_summary(db: AsyncSession, project_id: uuid.UUID, depth: int) -> list[dict]:
+    """Группы уровней 0..depth-1 с суммами по всем ITEM-потомкам."""
+    result = await db.execute(_SUMMARY_SQL, {"project_id": project_id, "depth": depth})
+    return [dict(zip(SUMMARY_FIELDS, row)) for row in result.all()]
+
+
+async def load_project_totals(db: AsyncSession, project_id: uuid.UUID) -> tuple[float, float, float]:
+    """(subtotal, tax_amount, total) по всем статьям проекта."""
+    result = await db.execute(_TOTALS_SQL, {"project_id": project_id})
+    return tuple(result.one())
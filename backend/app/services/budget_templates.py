@@ -0,0 +1,78 @@
+"""
+Шаблоны бюджета: чтение из БД, сохранение бюджета проекта шаблоном и вставка.
+
+Вставка — один INSERT … SELECT FROM unnest(массивов колонок): один запрос к
+Postgres при любом размере шаблона. Суммы статей считаются в том же запросе по
+формуле app/core/tax_logic.calc_tax (floor на единицу по каждому компоненту);
+ссылки на удалённые с момента сохранения налоговые схемы обнуляются.
+"""
+import uuid
+
+from sqlalchemy import select, text, bindparam, Text, Integer, Float
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.budget_template import TEMPLATE_FIELDS, CompiledTemplate, compile_lines, standard_template
+from app.models.budget import BudgetLine
+from app.models.budget_template import BudgetTemplate
+
+_INSERT_SQL = text("""
+INSERT INTO budget_lines (
+    id, project_id, parent_id, path, sort_order, level, code, name, type, unit,
+    quantity_units, rate, quantity, tax_scheme_id, tax_override, currency, limit_amount,
+    subtotal, tax_amount, total, created_at, updated_at
+)
+SELECT u.id, :project_id, u.parent_id, u.path, u.sort_order, u.level, u.code, u.name, u.type, u.unit,
+       u.quantity_units, u.rate, u.quantity, s.id, false, u.currency, u.limit_amount,
+       CASE WHEN u.type = 'GROUP' THEN 0 ELSE u.rate * u.quantity END,
+       CASE WHEN u.type = 'GROUP' THEN 0 ELSE t.per_unit * u.quantity END,
+       CASE WHEN u.type = 'GROUP' THEN 0 ELSE (u.rate + t.per_unit) * u.quantity END,
+       now(), now()
+FROM unnest(
+    CAST(:id AS uuid[]), CAST(:parent_id AS uuid[]), CAST(:path AS text[]),
+    CAST(:sort_order AS integer[]), CAST(:level AS integer[]), CAST(:code AS text[]),
+    CAST(:name AS text[]), CAST(:type AS text[]), CAST(:unit AS text[]),
+    CAST(:quantity_units AS double precision[]), CAST(:rate AS double precision[]),
+    CAST(:quantity AS double precision[]), CAST(:tax_scheme_id AS uuid[]),
+    CAST(:currency AS text[]), CAST(:limit_amount AS double precision[])
+) AS u(id, parent_id, path, sort_order, level, code, name, type, unit,
+       quantity_units, rate, quantity, tax_scheme_id, currency, limit_amount)
+LEFT JOIN tax_schemes s ON s.id = u.tax_scheme_id
+CROSS JOIN LATERAL (
+    SELECT COALESCE(SUM(FLOOR(CASE c.type
+               WHEN 'INTERNAL' THEN u.rate / (1 - c.rate) * c.rate
+               WHEN 'EXTERNAL' THEN u.rate * c.rate
+               ELSE 0 END)), 0) AS per_unit
+    FROM tax_components c
+    WHERE c.scheme_id = s.id
+) t
+""").bindparams(
+    *(bindparam(f, type_=ARRAY(UUID(as_uuid=True))) for f in ("id", "parent_id", "tax_scheme_id")),
+    *(bindparam(f, type_=ARRAY(Text)) for f in ("path", "code", "name", "type", "unit", "currency")),
+    *(bindparam(f, type_=ARRAY(Integer)) for f in ("sort_order", "level")),
+    *(bindparam(f, type_=ARRAY(Float)) for f in ("quantity_units", "rate", "quantity", "limit_amount")),
+)
+
+
+async def load_compiled(db: AsyncSession, template_id: uuid.UUID | None) -> CompiledTemplate | None:
+    """Скомпилированный шаблон по id; None в template_id — встроенный стандартный."""
+    if template_id is None:
+        return standard_template()
+    result = await db.execute(select(BudgetTemplate.data).where(BudgetTemplate.id == template_id))
+    data = result.scalar_one_or_none()
+    return CompiledTemplate(data) if data is not None else None
+
+
+async def compile_project(db: AsyncSession, project_id: uuid.UUID) -> CompiledTemplate:
+    """Бюджет проекта как шаблон (только нужные колонки, без ORM-объектов)."""
+    columns = [BudgetLine.id, BudgetLine.parent_id, BudgetLine.sort_order, *(getattr(BudgetLine, f) for f in TEMPLATE_FIELDS)]
+    result = await db.execute(select(*columns).where(BudgetLine.project_id == project_id))
+    return compile_lines(result.all())
+
+
+async def insert_template(db: AsyncSession, project_id: uuid.UUID, compiled: CompiledTemplate) -> int:
+    """Вставляет строки шаблона в проект одним запросом. Возвращает их число."""
+    if not len(compiled):
+        return 0
+    await db.execute(_INSERT_SQL, compiled.instantiate(project_id))
+    return len(compiled)
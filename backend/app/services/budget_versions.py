@@ -0,0 +1,98 @@
+"""Хранение и чтение неизменяемых версий бюджета (см. app/core/budget_versions.py)."""
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.budget_versions import (
+    SNAPSHOT_FIELDS, snapshot_line, diff_snapshots, apply_version_delta, needs_rebase,
+)
+from app.models.budget import BudgetLine
+from app.models.budget_version import BudgetVersion, BudgetVersionLine
+from app.models.project import Project
+
+
+async def list_versions(db: AsyncSession, project_id: uuid.UUID) -> list[BudgetVersion]:
+    result = await db.execute(
+        select(BudgetVersion).where(BudgetVersion.project_id == project_id).order_by(BudgetVersion.number)
+    )
+    return list(result.scalars().all())
+
+
+def _chain(version: BudgetVersion, by_id: dict) -> list[BudgetVersion]:
+    """Версии от ближайшей базы до version включительно."""
+    chain = [version]
+    while not chain[-1].is_base:
+        chain.append(by_id[chain[-1].previous_id])
+    chain.reverse()
+    return chain
+
+
+async def load_version_state(db: AsyncSession, version: BudgetVersion, versions: list[BudgetVersion] | None = None) -> dict:
+    """Состояние версии: line_id → снимок строки. Один запрос на всю цепочку."""
+    if versions is None:
+        versions = await list_versions(db, version.project_id)
+    chain = _chain(version, {v.id: v for v in versions})
+    result = await db.execute(
+        select(BudgetVersionLine.version_id, BudgetVersionLine.line_id, BudgetVersionLine.data)
+        .where(BudgetVersionLine.version_id.in_([v.id for v in chain]))
+    )
+    deltas: dict = {v.id: {} for v in chain}
+    for version_id, line_id, data in result.all():
+        deltas[version_id][line_id] = data
+
+    state: dict = {}
+    for v in chain:
+        apply_version_delta(state, deltas[v.id])
+    return state
+
+
+async def current_state(db: AsyncSession, project_id: uuid.UUID) -> dict:
+    """Снимки текущих строк проекта (только нужные колонки, без ORM-объектов)."""
+    columns = [BudgetLine.id, *(getattr(BudgetLine, f) for f in SNAPSHOT_FIELDS)]
+    result = await db.execute(select(*columns).where(BudgetLine.project_id == project_id))
+    return {row.id: snapshot_line(row) for row in result.all()}
+
+
+async def create_version(db: AsyncSession, project_id: uuid.UUID, name: str, user_id: uuid.UUID | None) -> BudgetVersion:
+    """Фиксирует текущий бюджет новой версией: дельтой к последней или новой базой."""
+    # Блокировка проекта: номера версий выдаются последовательно
+    await db.execute(select(Project.id).where(Project.id == project_id).with_for_update())
+
+    versions = await list_versions(db, project_id)
+    state = await current_state(db, project_id)
+    latest = versions[-1] if versions else None
+
+    delta = state
+    is_base = True
+    if latest is not None:
+        delta = diff_snapshots(await load_version_state(db, latest, versions), state)
+        is_base = needs_rebase(latest.chain_length + 1, len(delta), len(state))
+        if is_base:
+            delta = state
+
+    items = [s for s in state.values() if s["type"] != "GROUP"]
+    version = BudgetVersion(
+        id=uuid.uuid4(),
+        project_id=project_id,
+        number=latest.number + 1 if latest else 1,
+        name=name,
+        is_base=is_base,
+        previous_id=None if is_base else latest.id,
+        chain_length=0 if is_base else latest.chain_length + 1,
+        line_count=len(state),
+        changed_lines=len(delta),
+        subtotal=sum(s["subtotal"] for s in items),
+        tax_amount=sum(s["tax_amount"] for s in items),
+        total=sum(s["total"] for s in items),
+        created_by=user_id,
+    )
+    db.add(version)
+    await db.flush()
+    if delta:
+        await db.execute(
+            insert(BudgetVersionLine),
+            [{"version_id": version.id, "line_id": line_id, "data": snap} for line_id, snap in delta.items()],
+        )
+    return version
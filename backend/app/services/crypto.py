@@ -0,0 +1,102 @@
+"""
+Пакетное шифрование полей контрагентов вне event loop и ротация ключа.
+
+Пакет делится на части по BATCH_CHUNK значений, части выполняются в небольшом
+пуле потоков параллельно. Ротация идёт по контрагентам порциями по id (keyset):
+в памяти одна порция, каждая фиксируется отдельной транзакцией, так что
+прерванную ротацию можно просто запустить заново. Порция читается с FOR UPDATE:
+правка контрагента, пришедшая во время ротации, ждёт её commit и не затирается
+перешифрованным старым значением.
+"""
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select, update, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.crypto import FieldCipher
+from app.core.security import field_cipher
+from app.models.contractor import Contractor
+
+BATCH_CHUNK = 256
+ROTATION_CHUNK = 500
+ENCRYPTED_FIELDS = ("passport_data_enc", "bank_details_enc")
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="crypto")
+
+
+async def _map_chunks(fn_name: str, values: list, cipher: FieldCipher | None = None) -> list:
+    cipher = cipher or field_cipher()
+    fn = getattr(cipher, fn_name)
+    loop = asyncio.get_running_loop()
+    chunks = [values[i:i + BATCH_CHUNK] for i in range(0, len(values), BATCH_CHUNK)]
+    results = await asyncio.gather(*(loop.run_in_executor(_executor, fn, chunk) for chunk in chunks))
+    return [v for chunk in results for v in chunk]
+
+
+async def encrypt_many(values: list[str | None]) -> list[str | None]:
+    return await _map_chunks("encrypt_many", values)
+
+
+async def decrypt_many(values: list[str | None]) -> list[str | None]:
+    return await _map_chunks("decrypt_many", values)
+
+
+async def load_sensitive(db: AsyncSession, contractor_ids: list[uuid.UUID]) -> list[dict]:
+    """Расшифрованные паспортные и банковские данные контрагентов (одним пакетом)."""
+    if not contractor_ids:
+        return []
+    result = await db.execute(
+        select(Contractor.id, Contractor.full_name, *(getattr(Contractor, f) for f in ENCRYPTED_FIELDS))
+        .where(Contractor.id.in_(contractor_ids))
+        .order_by(Contractor.full_name)
+    )
+    rows = result.all()
+    plain = await decrypt_many([v for row in rows for v in row[2:]])
+    return [
+        {"id": row.id, "full_name": row.full_name, "passport_data": plain[2 * i], "bank_details": plain[2 * i + 1]}
+        for i, row in enumerate(rows)
+    ]
+
+
+def _rotate_rows(cipher: FieldCipher, rows) -> list[dict]:
+    updates = []
+    for row in rows:
+        values = {f: cipher.rotate(getattr(row, f)) for f in ENCRYPTED_FIELDS}
+        if any(v is not None for v in values.values()):
+            updates.append({"id": row.id, **{f: values[f] or getattr(row, f) for f in ENCRYPTED_FIELDS}})
+    return updates
+
+
+async def rotate_contractor_keys(db: AsyncSession, chunk_size: int = ROTATION_CHUNK) -> dict:
+    """
+    Перешифровывает текущим ключом поля, зашифрованные предыдущим.
+    Возвращает {"scanned": …, "rotated": …}.
+    """
+    cipher = field_cipher()
+    loop = asyncio.get_running_loop()
+    scanned = rotated = 0
+    last_id = None
+    while True:
+        q = (
+            select(Contractor.id, *(getattr(Contractor, f) for f in ENCRYPTED_FIELDS))
+            .where(or_(*(getattr(Contractor, f).isnot(None) for f in ENCRYPTED_FIELDS)))
+            .order_by(Contractor.id)
+            .limit(chunk_size)
+            .with_for_update()
+        )
+        if last_id is not None:
+            q = q.where(Contractor.id > last_id)
+        rows = (await db.execute(q)).all()
+        if not rows:
+            break
+        updates = await loop.run_in_executor(_executor, _rotate_rows, cipher, rows)
+        if updates:
+            # ORM bulk UPDATE по первичному ключу — один executemany на порцию
+            await db.execute(update(Contractor), updates)
+        await db.commit()
+        scanned += len(rows)
+        rotated += len(updates)
+        last_id = rows[-1].id
+    return {"scanned": scanned, "rotated": rotated}
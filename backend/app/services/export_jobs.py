@@ -0,0 +1,169 @@
+"""
+Фоновые задачи экспорта с кэшем готовых файлов на диске.
+
+Файл адресуется содержимым: ключ — хеш (тип экспорта, проект, версии данных, от
+которых он зависит). Поэтому повторный экспорт неизменённых данных отдаётся с
+диска сразу, а одновременные запросы одного и того же экспорта ждут одну задачу.
+Каталог кэша ограничен settings.export_cache_max_bytes: после каждой записи
+удаляются давно не читанные файлы (mtime обновляется при каждой выдаче).
+
+Задачи живут в памяти процесса (статус доступен settings.export_job_ttl секунд);
+файлы кэша общие для процессов, если у них общий export_cache_dir.
+"""
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+from app.database import AsyncSessionLocal
+from app.services.budget_export import XLSX_MEDIA_TYPE, write_budget_xlsx
+from app.services.reports_export import write_reports_xlsx
+from app.services.versions import CONTRACTORS_SCOPE, TAX_SCHEMES_SCOPE, project_scope, reports_scope, get_versions
+
+
+@dataclass(frozen=True, slots=True)
+class ExportType:
+    name: str
+    suffix: str
+    media_type: str
+    scopes: Callable[[uuid.UUID], tuple[str, ...]]   # области версий, от которых зависит файл
+    write: Callable[[AsyncSession, uuid.UUID, str], Awaitable[int]]
+
+
+EXPORT_TYPES = {
+    t.name: t for t in (
+        ExportType("budget_xlsx", ".xlsx", XLSX_MEDIA_TYPE,
+                   lambda p: (project_scope(p), TAX_SCHEMES_SCOPE), write_budget_xlsx),
+        ExportType("reports_xlsx", ".xlsx", XLSX_MEDIA_TYPE,
+                   lambda p: (reports_scope(p), CONTRACTORS_SCOPE), write_reports_xlsx),  # в файле ФИО контрагентов
+    )
+}
+
+PENDING, RUNNING, DONE, FAILED = "PENDING", "RUNNING", "DONE", "FAILED"
+
+
+@dataclass(slots=True)
+class ExportJob:
+    id: uuid.UUID
+    type: str
+    project_id: uuid.UUID
+    key: str
+    status: str = PENDING
+    error: str | None = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: datetime | None = None
+    task: asyncio.Task | None = None
+
+    @property
+    def path(self) -> str:
+        return cache_path(self.key, EXPORT_TYPES[self.type].suffix)
+
+
+_jobs = TTLCache(maxsize=settings.export_job_cache_size, ttl=settings.export_job_ttl)
+_inflight: dict[str, ExportJob] = {}  # ключ файла → выполняющаяся задача
+
+
+def export_key(export_type: str, project_id: uuid.UUID, versions: dict[str, int]) -> str:
+    raw = "|".join([export_type, str(project_id), *(f"{k}={v}" for k, v in sorted(versions.items()))])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cache_path(key: str, suffix: str) -> str:
+    return os.path.join(settings.export_cache_dir, key + suffix)
+
+
+def touch(path: str) -> bool:
+    """Отмечает файл как использованный (для LRU). False — файла нет."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def evict(max_bytes: int, keep: str | None = None) -> int:
+    """Удаляет давно не использованные файлы кэша, пока каталог больше max_bytes. Возвращает число удалённых."""
+    entries = []
+    with os.scandir(settings.export_cache_dir) as it:
+        for entry in it:
+            if entry.is_file() and not entry.name.endswith(".part"):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+async def _run_job(job: ExportJob) -> None:
+    spec = EXPORT_TYPES[job.type]
+    part = f"{job.path}.{job.id.hex}.part"
+    job.status = RUNNING
+    try:
+        async with AsyncSessionLocal() as db:
+            await spec.write(db, job.project_id, part)
+        os.replace(part, job.path)
+        job.status = DONE
+        await asyncio.to_thread(evict, settings.export_cache_max_bytes, job.path)
+    except Exception as exc:
+        job.status = FAILED
+        job.error = str(exc) or exc.__class__.__name__
+        if os.path.exists(part):
+            os.unlink(part)
+    finally:
+        job.finished_at = datetime.now(timezone.utc)
+        _inflight.pop(job.key, None)
+
+
+async def submit(db: AsyncSession, export_type: str, project_id: uuid.UUID) -> ExportJob:
+    """
+    Задача экспорта: готова сразу, если файл этих версий уже в кэше; та же задача,
+    если такой экспорт уже выполняется; иначе — новая фоновая задача.
+    """
+    spec = EXPORT_TYPES[export_type]
+    versions = await get_versions(db, *spec.scopes(project_id))
+    key = export_key(export_type, project_id, versions)
+    running = _inflight.get(key)
+    if running is not None:
+        return running
+
+    job = ExportJob(id=uuid.uuid4(), type=export_type, project_id=project_id, key=key)
+    _jobs.set(job.id, job)
+    if touch(job.path):
+        job.status = DONE
+        job.finished_at = job.created_at
+        return job
+
+    os.makedirs(settings.export_cache_dir, exist_ok=True)
+    _inflight[key] = job
+    job.task = asyncio.create_task(_run_job(job))
+    return job
+
+
+def get_job(job_id: uuid.UUID) -> ExportJob | None:
+    job = _jobs.get(job_id)
+    return None if job is MISSING else job
+
+
+async def wait(job: ExportJob) -> ExportJob:
+    """Дожидается окончания задачи (для синхронного экспорта)."""
+    if job.task is not None:
+        await asyncio.shield(job.task)
+    return job
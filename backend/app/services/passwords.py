@@ -0,0 +1,91 @@
+"""
+Хэширование паролей bcrypt в отдельном ограниченном пуле потоков.
+
+bcrypt на 12 раундах — это ~0.2 с CPU; прямо в обработчике он останавливает
+event loop для всех запросов. Здесь работа уходит в пул из
+settings.password_hash_workers потоков (bcrypt отпускает GIL). Заданий сверх
+password_hash_queue в очереди не принимается — PasswordPoolBusy, а вызывающий
+отвечает 503, вместо того чтобы копить задержку. stats() — метрики пула.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from app.core.config import settings
+from app.core.security import hash_password, verify_and_update_password
+
+
+class PasswordPoolBusy(Exception):
+    """Пул хэширования переполнен."""
+
+
+class PasswordPool:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending = 0  # выполняются + ждут в очереди
+        self._lock = threading.Lock()  # _pending и счётчики меняются и из потоков пула
+        self._stats = {"submitted": 0, "completed": 0, "rejected": 0, "max_pending": 0,
+                       "wait_seconds": 0.0, "run_seconds": 0.0}
+
+    def _timed(self, queued_at: float, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._stats["wait_seconds"] += started - queued_at
+                self._stats["run_seconds"] += time.perf_counter() - started
+
+    async def run(self, fn, *args):
+        """Выполняет fn(*args) в пуле. PasswordPoolBusy — если очередь заполнена."""
+        with self._lock:
+            if self._pending >= self.workers + self.queue_limit:
+                self._stats["rejected"] += 1
+                raise PasswordPoolBusy()
+            self._pending += 1
+            self._stats["submitted"] += 1
+            self._stats["max_pending"] = max(self._stats["max_pending"], self._pending)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        # Место в пуле освобождает само задание, а не ожидающий его запрос: при отмене
+        # запроса (клиент отключился) bcrypt продолжает работать и занимает поток
+        job = self._executor.submit(self._timed, time.perf_counter(), fn, *args)
+        job.add_done_callback(self._release)
+        return await asyncio.wrap_future(job)
+
+    def _release(self, job: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            if not job.cancelled() and job.exception() is None:
+                self._stats["completed"] += 1
+
+    def stats(self) -> dict:
+        completed = self._stats["completed"] or 1
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "pending": self._pending,
+            **self._stats,
+            "avg_wait_ms": round(self._stats["wait_seconds"] / completed * 1000, 2),
+            "avg_run_ms": round(self._stats["run_seconds"] / completed * 1000, 2),
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+pool = PasswordPool(settings.password_hash_workers, settings.password_hash_queue)
+
+
+async def hash_password_async(password: str) -> str:
+    return await pool.run(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> tuple[bool, str | None]:
+    """(пароль верен, новый хэш, если изменились настройки bcrypt, иначе None)."""
+    return await pool.run(verify_and_update_password, password, hashed)
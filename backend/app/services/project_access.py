@@ -0,0 +1,46 @@
+"""
+Роль пользователя в проекте с кэшем в памяти процесса.
+
+Роль (user, project) читается из project_users один раз и хранится
+settings.project_role_cache_ttl секунд; отсутствие доступа кэшируется так же.
+Изменения команды проекта сбрасывают его записи сразу (в этом процессе).
+"""
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+from app.models.user import ProjectUser
+from app.services.auth_cache import AuthUser
+
+# Роли, которым разрешено редактирование бюджета и управление проектом
+EDITOR_ROLES = ("PRODUCER", "LINE_PRODUCER")
+# Роль суперадмина в любом проекте
+SUPERADMIN_ROLE = "PRODUCER"
+
+_roles = TTLCache(maxsize=settings.project_role_cache_size, ttl=settings.project_role_cache_ttl)
+
+
+async def resolve_project_role(db: AsyncSession, user: AuthUser, project_id: uuid.UUID) -> str | None:
+    """Роль пользователя в проекте или None, если он не в команде."""
+    if user.is_superadmin:
+        return SUPERADMIN_ROLE
+    key = (user.id, project_id)
+    role = _roles.get(key)
+    if role is MISSING:
+        result = await db.execute(
+            select(ProjectUser.role).where(ProjectUser.project_id == project_id, ProjectUser.user_id == user.id)
+        )
+        role = result.scalar_one_or_none()
+        _roles.set(key, role)
+    return role
+
+
+def invalidate_project_roles(project_id: uuid.UUID, user_id: uuid.UUID | None = None) -> None:
+    """Сбрасывает кэш ролей проекта (или одного участника)."""
+    if user_id is not None:
+        _roles.pop((user_id, project_id))
+    else:
+        _roles.pop_where(lambda key: key[1] == project_id)
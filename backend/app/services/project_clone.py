@@ -0,0 +1,110 @@
+"""
+Копирование проекта: бюджет и (по желанию) договоры — целиком в Postgres.
+
+Новые id выводятся из старых детерминированно: md5(старый id || соль)::uuid, где
+соль — id нового проекта. Поэтому каждая таблица копируется одним INSERT … SELECT,
+а parent_id, материализованный путь и привязки договоров переназначаются той же
+функцией — без таблицы соответствий и без передачи строк в приложение.
+При rate_factor ≠ 1 ставки умножаются, а суммы статей считаются заново по формуле
+app/core/tax_logic.calc_tax (floor на единицу по каждому компоненту).
+"""
+import hashlib
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.budget_path import SEPARATOR
+from app.services.budget_rollups import rebuild_rollups_in_db
+
+
+def clone_id(source_id: uuid.UUID | str, salt: str) -> uuid.UUID:
+    """Id копии строки — то же, что md5(id::text || соль)::uuid в запросах ниже."""
+    return uuid.UUID(hashlib.md5((str(source_id) + salt).encode()).hexdigest())
+
+
+def clone_path(path: str, salt: str) -> str:
+    """Материализованный путь копии: каждый id пути переназначен clone_id."""
+    segments = [seg for seg in path.split(SEPARATOR) if seg]
+    return "".join(f"{clone_id(seg, salt)}{SEPARATOR}" for seg in segments)
+
+
+_LINES_SQL = text("""
+INSERT INTO budget_lines (
+    id, project_id, parent_id, path, sort_order, level, code, name, type, unit,
+    date_start, date_end, quantity_units, rate, quantity, tax_scheme_id, contractor_id,
+    tax_override, currency, limit_amount, subtotal, tax_amount, total, created_at, updated_at
+)
+SELECT md5(b.id::text || :salt)::uuid,
+       :target_id,
+       CASE WHEN b.parent_id IS NULL THEN NULL ELSE md5(b.parent_id::text || :salt)::uuid END,
+       COALESCE((
+           SELECT string_agg(md5(seg || :salt)::uuid::text, '/' ORDER BY ord) || '/'
+           FROM unnest(string_to_array(rtrim(b.path, '/'), '/')) WITH ORDINALITY AS p(seg, ord)
+       ), ''),
+       b.sort_order, b.level, b.code, b.name, b.type, b.unit,
+       b.date_start, b.date_end, b.quantity_units, b.rate * :factor, b.quantity,
+       b.tax_scheme_id, b.contractor_id, b.tax_override, b.currency, b.limit_amount,
+       CASE WHEN b.type = 'GROUP' THEN 0 ELSE b.rate * :factor * b.quantity END,
+       CASE WHEN b.type = 'GROUP' THEN 0 ELSE t.per_unit * b.quantity END,
+       CASE WHEN b.type = 'GROUP' THEN 0 ELSE (b.rate * :factor + t.per_unit) * b.quantity END,
+       now(), now()
+FROM budget_lines b
+CROSS JOIN LATERAL (
+    SELECT COALESCE(SUM(FLOOR(CASE c.type
+               WHEN 'INTERNAL' THEN b.rate * :factor / (1 - c.rate) * c.rate
+               WHEN 'EXTERNAL' THEN b.rate * :factor * c.rate
+               ELSE 0 END)), 0) AS per_unit
+    FROM tax_components c
+    WHERE c.scheme_id = b.tax_scheme_id
+) t
+WHERE b.project_id = :source_id
+""")
+
+# Копии договоров — черновики: подписание относится к исходному проекту
+_CONTRACTS_SQL = text("""
+INSERT INTO contracts (
+    id, number, project_id, contractor_id, payment_type, payment_period, currency, status,
+    signed_at, valid_from, valid_to, tax_scheme_id, tax_override, notes, created_at, updated_at
+)
+SELECT md5(c.id::text || :salt)::uuid, c.number, :target_id, c.contractor_id,
+       c.payment_type, c.payment_period, c.currency, 'DRAFT',
+       NULL, c.valid_from, c.valid_to, c.tax_scheme_id, c.tax_override, c.notes, now(), now()
+FROM contracts c
+WHERE c.project_id = :source_id
+""")
+
+# Привязки только к статьям исходного проекта (их копии уже вставлены)
+_CONTRACT_LINKS_SQL = text("""
+INSERT INTO contract_budget_lines (id, contract_id, budget_line_id)
+SELECT md5(cbl.id::text || :salt)::uuid,
+       md5(cbl.contract_id::text || :salt)::uuid,
+       md5(cbl.budget_line_id::text || :salt)::uuid
+FROM contract_budget_lines cbl
+JOIN contracts c ON c.id = cbl.contract_id
+JOIN budget_lines b ON b.id = cbl.budget_line_id
+WHERE c.project_id = :source_id AND b.project_id = :source_id
+""")
+
+
+async def clone_project_data(
+    db: AsyncSession,
+    source_id: uuid.UUID,
+    target_id: uuid.UUID,
+    include_contracts: bool = False,
+    rate_factor: float = 1.0,
+) -> dict:
+    """
+    Копирует бюджет source_id в уже созданный проект target_id, пересобирает итоги
+    групп. Возвращает счётчики скопированных строк.
+    """
+    params = {"source_id": source_id, "target_id": target_id, "salt": str(target_id)}
+    lines = await db.execute(_LINES_SQL, {**params, "factor": rate_factor})
+    counts = {"lines": lines.rowcount, "contracts": 0, "contract_links": 0}
+    if include_contracts:
+        contracts = await db.execute(_CONTRACTS_SQL, params)
+        links = await db.execute(_CONTRACT_LINKS_SQL, params)
+        counts["contracts"] = contracts.rowcount
+        counts["contract_links"] = links.rowcount
+    await rebuild_rollups_in_db(db, [target_id])
+    return counts
@@ -0,0 +1,160 @@
+"""
+Сырые выгрузки для BI: статьи бюджета и записи производственных отчётов в CSV / NDJSON.
+
+Строки читаются серверным курсором (yield_per) и отдаются порциями: в памяти —
+одна порция, независимо от размера проекта. Налоговые колонки считаются для
+каждой порции пакетом app/core/tax_batch по кэшу схем: налог, итого и его
+разделение по получателям (CONTRACTOR / BUDGET). Клиент выбирает колонки и
+период: для отчётов — по дате отчёта, для бюджета — по пересечению с периодом
+статьи (date_start / date_end; статьи без дат входят всегда).
+"""
+import csv
+import io
+import json
+import uuid
+from collections.abc import AsyncIterator
+from datetime import date
+
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.tax_batch import TaxTable, calc_tax_batch
+from app.models.budget import BudgetLine, BudgetRollup
+from app.models.production import ProductionReport, ReportEntry
+from app.services.tax_schemes import get_schemes
+
+CHUNK = 2000
+
+# Налоговые колонки, которые считаются, а не читаются из БД
+TAX_COLUMNS = ("tax_scheme", "subtotal", "tax_amount", "total", "tax_contractor", "tax_budget")
+
+BUDGET_COLUMNS = (
+    "id", "parent_id", "code", "name", "type", "level", "unit", "quantity_units", "rate", "quantity",
+    "tax_scheme_id", "contractor_id", "currency", "limit_amount", "date_start", "date_end", "updated_at",
+    *TAX_COLUMNS,
+)
+REPORT_COLUMNS = (
+    "id", "report_id", "date", "shoot_day_number", "contractor_id", "budget_line_id", "contract_id",
+    "source", "status", "unit", "quantity", "rate", "overtime_hours", "tax_scheme_id",
+    "amount_net", "amount_gross", *TAX_COLUMNS,
+)
+COLUMNS = {"budget": BUDGET_COLUMNS, "reports": REPORT_COLUMNS}
+# Колонки выгрузки отчётов, которые берутся из самого отчёта
+_REPORT_FIELDS = {"date": ProductionReport.date, "shoot_day_number": ProductionReport.shoot_day_number}
+
+
+def _budget_query(project_id: uuid.UUID, date_from: date | None, date_to: date | None):
+    db_columns = [getattr(BudgetLine, c) for c in BUDGET_COLUMNS if c not in TAX_COLUMNS]
+    q = (
+        select(*db_columns, BudgetRollup.subtotal.label("group_subtotal"),
+               BudgetRollup.tax_amount.label("group_tax_amount"), BudgetRollup.total.label("group_total"))
+        .outerjoin(BudgetRollup, BudgetRollup.line_id == BudgetLine.id)
+        .where(BudgetLine.project_id == project_id)
+        .order_by(BudgetLine.level, BudgetLine.parent_id, BudgetLine.sort_order)
+    )
+    if date_from is not None:
+        q = q.where(or_(BudgetLine.date_end.is_(None), BudgetLine.date_end >= date_from))
+    if date_to is not None:
+        q = q.where(or_(BudgetLine.date_start.is_(None), BudgetLine.date_start <= date_to))
+    return q
+
+
+def _reports_query(project_id: uuid.UUID, date_from: date | None, date_to: date | None):
+    db_columns = [
+        _REPORT_FIELDS[c] if c in _REPORT_FIELDS else getattr(ReportEntry, c)
+        for c in REPORT_COLUMNS if c not in TAX_COLUMNS
+    ]
+    q = (
+        select(*db_columns)
+        .join(ProductionReport, ProductionReport.id == ReportEntry.report_id)
+        .where(ProductionReport.project_id == project_id)
+        .order_by(ProductionReport.date, ProductionReport.shoot_day_number, ReportEntry.created_at)
+    )
+    if date_from is not None:
+        q = q.where(ProductionReport.date >= date_from)
+    if date_to is not None:
+        q = q.where(ProductionReport.date <= date_to)
+    return q
+
+
+def tax_columns(rows, table: TaxTable, names: dict) -> list[tuple]:
+    """Налоговые колонки (TAX_COLUMNS) для порции строк с rate, quantity, tax_scheme_id."""
+    idx = table.lookup(row.tax_scheme_id for row in rows)
+    result = calc_tax_batch([row.rate for row in rows], [row.quantity for row in rows], idx, table)
+    contractor = (result.component_total * table.to_contractor[idx]).sum(axis=1)
+    budget = result.tax_amount - contractor
+    return [
+        (names.get(row.tax_scheme_id), *amounts)
+        for row, amounts in zip(rows, zip(
+            result.subtotal.tolist(), result.tax_amount.tolist(), result.total.tolist(),
+            contractor.tolist(), budget.tolist(),
+        ))
+    ]
+
+
+def _budget_values(rows, table: TaxTable, names: dict) -> list[tuple]:
+    """Строки бюджета → значения BUDGET_COLUMNS; у групп — сохранённые итоги, без разделения налога."""
+    computed = tax_columns(rows, table, names)
+    out = []
+    for row, tax in zip(rows, computed):
+        if row.type == "GROUP":
+            tax = (None, row.group_subtotal or 0.0, row.group_tax_amount or 0.0, row.group_total or 0.0, None, None)
+        out.append((*row[:-3], *tax))
+    return out
+
+
+def _reports_values(rows, table: TaxTable, names: dict) -> list[tuple]:
+    return [(*row, *tax) for row, tax in zip(rows, tax_columns(rows, table, names))]
+
+
+async def iter_chunks(
+    db: AsyncSession,
+    source: str,
+    project_id: uuid.UUID,
+    columns: tuple[str, ...],
+    date_from: date | None = None,
+    date_to: date | None = None,
+) -> AsyncIterator[list[tuple]]:
+    """Порции строк выгрузки: кортежи значений columns (подмножество COLUMNS[source])."""
+    schemes = await get_schemes(db)
+    scheme_map = {scheme_id: s.inputs for scheme_id, s in schemes.items()}
+    names = {scheme_id: s.name for scheme_id, s in schemes.items()}
+    table = TaxTable(scheme_map)
+    if source == "budget":
+        query, to_values = _budget_query(project_id, date_from, date_to), _budget_values
+    else:
+        query, to_values = _reports_query(project_id, date_from, date_to), _reports_values
+    positions = [COLUMNS[source].index(c) for c in columns]
+
+    result = await db.stream(query.execution_options(yield_per=CHUNK))
+    async for partition in result.partitions():
+        yield [tuple(values[i] for i in positions) for values in to_values(partition, table, names)]
+
+
+def _json_value(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, date):  # и datetime
+        return value.isoformat()
+    raise TypeError(type(value).__name__)
+
+
+async def csv_stream(chunks: AsyncIterator[list[tuple]], columns: tuple[str, ...]) -> AsyncIterator[str]:
+    """CSV: заголовок и по куску текста на порцию строк."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    yield buf.getvalue()
+    async for rows in chunks:
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(rows)
+        yield buf.getvalue()
+
+
+async def ndjson_stream(chunks: AsyncIterator[list[tuple]], columns: tuple[str, ...]) -> AsyncIterator[str]:
+    """NDJSON: объект на строку, по куску текста на порцию."""
+    async for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=_json_value) + "\n" for row in rows
+        )
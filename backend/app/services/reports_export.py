@@ -0,0 +1,64 @@
+"""
+Экспорт записей производственных отчётов проекта в Excel — как app/services/budget_export:
+серверный курсор, write-only лист, openpyxl в пуле потоков экспорта.
+"""
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.budget_export import CHUNK, run_in_export_pool
+
+HEADERS = ("Дата", "Смена", "Контрагент", "Ед.изм.", "Кол-во", "Ставка", "Нетто", "Налог", "Итого")
+
+_ENTRIES_SQL = text("""
+SELECT r.date, r.shoot_day_number, c.full_name, e.unit, e.quantity, e.rate, e.amount_net, e.amount_gross
+FROM report_entries e
+JOIN production_reports r ON r.id = e.report_id
+JOIN contractors c ON c.id = e.contractor_id
+WHERE r.project_id = :project_id
+ORDER BY r.date, r.shoot_day_number, e.created_at
+""")
+
+
+class ReportsSheetWriter:
+    """Write-only книга с листом записей; методы выполняются в потоке пула."""
+
+    def __init__(self):
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet("Отчёты")
+        header = []
+        for value in HEADERS:
+            cell = WriteOnlyCell(self.ws, value=value)
+            cell.font = Font(bold=True)
+            header.append(cell)
+        self.ws.append(header)
+        self.totals = [0.0, 0.0, 0.0]
+
+    def write(self, rows) -> int:
+        totals = self.totals
+        for day, shoot_day, contractor, unit, quantity, rate, net, gross in rows:
+            self.ws.append((day, shoot_day, contractor, unit, quantity, rate, net, gross - net, gross))
+            totals[0] += net
+            totals[1] += gross - net
+            totals[2] += gross
+        return len(rows)
+
+    def save(self, path: str) -> None:
+        self.ws.append((None, None, "Итого", None, None, None, *self.totals))
+        self.wb.save(path)
+
+
+async def write_reports_xlsx(db: AsyncSession, project_id: uuid.UUID, path: str) -> int:
+    """Пишет записи отчётов проекта в path. Возвращает число записей."""
+    writer = await run_in_export_pool(ReportsSheetWriter)
+    count = 0
+    result = await db.stream(_ENTRIES_SQL.execution_options(yield_per=CHUNK), {"project_id": project_id})
+    async for partition in result.partitions():
+        count += await run_in_export_pool(writer.write, partition)
+    await run_in_export_pool(writer.save, path)
+    return count
@@ -0,0 +1,77 @@
+"""
+Налоги проекта по компонентам (НДФЛ, Страховые, НДС, …) и получателям.
+
+Сумма компонента по строке — floor налога на единицу × количество, как в
+app/core/tax_logic.calc_tax. Агрегация — один GROUP BY в Postgres отдельно по
+статьям бюджета и по записям производственных отчётов; строки в приложение
+не загружаются. Результат кэшируется по версии своей области (бюджет проекта
+или его отчёты) и справочника схем — повторные запросы бухгалтерии без расчёта.
+"""
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+from app.services.versions import TAX_SCHEMES_SCOPE, project_scope, reports_scope, get_versions
+
+_COMPONENT_TAX = """SUM(FLOOR(CASE c.type
+               WHEN 'INTERNAL' THEN {src}.rate / (1 - c.rate) * c.rate
+               WHEN 'EXTERNAL' THEN {src}.rate * c.rate
+               ELSE 0 END) * {src}.quantity)"""
+
+_BUDGET_SQL = text(f"""
+SELECT c.name, c.recipient, {_COMPONENT_TAX.format(src="b")} AS amount, COUNT(DISTINCT b.id)
+FROM budget_lines b
+JOIN tax_components c ON c.scheme_id = b.tax_scheme_id
+WHERE b.project_id = :project_id AND b.type <> 'GROUP'
+GROUP BY c.name, c.recipient
+ORDER BY c.recipient, c.name
+""")
+
+_REPORTS_SQL = text(f"""
+SELECT c.name, c.recipient, {_COMPONENT_TAX.format(src="e")} AS amount, COUNT(DISTINCT e.id)
+FROM report_entries e
+JOIN production_reports r ON r.id = e.report_id
+JOIN tax_components c ON c.scheme_id = e.tax_scheme_id
+WHERE r.project_id = :project_id
+GROUP BY c.name, c.recipient
+ORDER BY c.recipient, c.name
+""")
+
+SOURCES = {"budget": (_BUDGET_SQL, project_scope), "reports": (_REPORTS_SQL, reports_scope)}
+
+_results = TTLCache(maxsize=settings.tax_breakdown_cache_size, ttl=settings.tax_breakdown_cache_ttl)
+
+
+def summarize(rows) -> dict:
+    """Строки (name, recipient, amount, count) → компоненты, итоги по получателям и общий итог."""
+    components = [{"name": name, "recipient": recipient, "amount": amount, "lines": count}
+                  for name, recipient, amount, count in rows]
+    by_recipient: dict[str, float] = {}
+    for comp in components:
+        by_recipient[comp["recipient"]] = by_recipient.get(comp["recipient"], 0.0) + comp["amount"]
+    return {"components": components, "by_recipient": by_recipient, "total": sum(by_recipient.values())}
+
+
+async def breakdown_versions(db: AsyncSession, project_id: uuid.UUID) -> dict[str, int]:
+    """Версии областей, от которых зависит разбивка (для кэша и ETag)."""
+    return await get_versions(db, project_scope(project_id), reports_scope(project_id), TAX_SCHEMES_SCOPE)
+
+
+async def load_breakdown(db: AsyncSession, project_id: uuid.UUID, source: str, versions: dict[str, int]) -> dict:
+    """Разбивка налогов по source ("budget" или "reports") с кэшем по версиям."""
+    sql, scope = SOURCES[source]
+    key = (source, project_id, versions[scope(project_id)], versions[TAX_SCHEMES_SCOPE])
+    cached = _results.get(key)
+    if cached is not MISSING:
+        return cached
+    result = await db.execute(sql, {"project_id": project_id})
+    breakdown = summarize(result.all())
+    _results.set(key, breakdown)
+    return breakdown
+
+
+def clear() -> None:
+    _results.clear()
@@ -0,0 +1,130 @@
+"""
+Кэш скомпилированных налоговых схем.
+
+Схемы меняются редко, а нужны почти каждому запросу бюджета и производственных
+отчётов. Все схемы читаются одним запросом в CompiledScheme (компоненты по
+sort_order, 1 - r посчитан заранее) и держатся в памяти процесса: прогрев при
+старте, сброс из create/update/delete схемы. Изменения из других процессов
+видны не позже чем через settings.tax_scheme_cache_ttl; запрос неизвестной
+схемы перечитывает кэш сразу; id, которого нет и после перечитывания, повторно
+перечитывание не вызывает MISS_RELOAD_INTERVAL секунд.
+"""
+import math
+import time
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.models.tax import TaxScheme
+
+# Ссылка на удалённую схему не должна перечитывать кэш на каждый запрос
+MISS_RELOAD_INTERVAL = 1.0
+
+
+class CompiledComponent:
+    __slots__ = ("name", "rate", "type", "recipient", "one_minus")
+
+    def __init__(self, name: str, rate: float, type: str, recipient: str):
+        self.name = name
+        self.rate = rate
+        self.type = type
+        self.recipient = recipient
+        self.one_minus = 1 - rate
+
+    def tax_per_unit(self, rate: float) -> int:
+        """Налог на единицу — как в calc_tax (тот же порядок операций и floor)."""
+        if self.type == "INTERNAL":
+            return math.floor(rate / self.one_minus * self.rate)
+        if self.type == "EXTERNAL":
+            return math.floor(rate * self.rate)
+        return 0
+
+
+class CompiledScheme:
+    __slots__ = ("id", "name", "is_system", "components", "inputs")
+
+    def __init__(self, scheme: TaxScheme):
+        self.id = scheme.id
+        self.name = scheme.name
+        self.is_system = scheme.is_system
+        ordered = sorted(scheme.components, key=lambda c: c.sort_order)
+        self.components = tuple(CompiledComponent(c.name, c.rate, c.type, c.recipient) for c in ordered)
+        # Компоненты в формате calc_tax / TaxTable (scheme_map)
+        self.inputs = [
+            {"name": c.name, "rate": c.rate, "type": c.type, "recipient": c.recipient} for c in self.components
+        ]
+
+    def amounts(self, rate: float, quantity: float) -> tuple[float, float, float]:
+        """(subtotal, tax_amount, total) — то же, что calc_tax по компонентам схемы."""
+        tax_per_unit = 0
+        total_per_unit = rate
+        for comp in self.components:
+            tax = comp.tax_per_unit(rate)
+            tax_per_unit += tax
+            total_per_unit += tax
+        return rate * quantity, tax_per_unit * quantity, total_per_unit * quantity
+
+
+class _Registry:
+    __slots__ = ("schemes", "scheme_map", "loaded_at", "missing")
+
+    def __init__(self):
+        self.schemes: dict[uuid.UUID, CompiledScheme] = {}
+        self.scheme_map: dict[uuid.UUID, list[dict]] = {}
+        self.loaded_at: float | None = None
+        self.missing: dict[uuid.UUID, float] = {}  # id, не найденный при перечитывании → когда
+
+
+_registry = _Registry()
+
+
+async def load_schemes(db: AsyncSession) -> dict[uuid.UUID, CompiledScheme]:
+    """Перечитывает все схемы одним запросом и заменяет кэш."""
+    result = await db.execute(select(TaxScheme).options(selectinload(TaxScheme.components)))
+    schemes = {s.id: CompiledScheme(s) for s in result.scalars().all()}
+    # Новые словари целиком: читатели держат ссылку на прежний снимок
+    _registry.schemes = schemes
+    _registry.scheme_map = {scheme_id: s.inputs for scheme_id, s in schemes.items()}
+    _registry.loaded_at = time.monotonic()
+    return schemes
+
+
+def _unknown(scheme_ids, now: float) -> list:
+    """id, которых нет в кэше и которые не искали недавно."""
+    schemes, missing = _registry.schemes, _registry.missing
+    return [
+        i for i in scheme_ids
+        if i and i not in schemes and (i not in missing or now - missing[i] >= MISS_RELOAD_INTERVAL)
+    ]
+
+
+async def get_schemes(db: AsyncSession, scheme_ids=()) -> dict[uuid.UUID, CompiledScheme]:
+    """Все скомпилированные схемы; без запросов, если кэш свежий и знает все scheme_ids."""
+    now = time.monotonic()
+    loaded_at = _registry.loaded_at
+    unknown = _unknown(scheme_ids, now)
+    if loaded_at is None or now - loaded_at >= settings.tax_scheme_cache_ttl or unknown:
+        schemes = await load_schemes(db)
+        _registry.missing.update((i, now) for i in unknown if i not in schemes)
+    return _registry.schemes
+
+
+async def get_scheme(db: AsyncSession, scheme_id: uuid.UUID | None) -> CompiledScheme | None:
+    if not scheme_id:
+        return None
+    return (await get_schemes(db, (scheme_id,))).get(scheme_id)
+
+
+async def get_scheme_map(db: AsyncSession, scheme_ids=()) -> dict[uuid.UUID, list[dict]]:
+    """scheme_id → компоненты для calc_tax / build_budget_tree. Словарь общий — не изменять."""
+    await get_schemes(db, scheme_ids)
+    return _registry.scheme_map
+
+
+def invalidate() -> None:
+    """Сбрасывает кэш: следующий запрос перечитает схемы."""
+    _registry.loaded_at = None
+    _registry.missing.clear()
@@ -0,0 +1,73 @@
+"""
+Версии данных и ETag для условных GET.
+
+Каждый путь записи увеличивает счётчик своей области (проект или справочник)
+в той же транзакции. ETag собирается из версий всех областей, от которых
+зависит ответ, поэтому If-None-Match проверяется одним запросом, без
+построения дерева и без загрузки строк.
+"""
+import hashlib
+import uuid
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.version import DataVersion
+
+TAX_SCHEMES_SCOPE = "tax_schemes"
+CONTRACTORS_SCOPE = "contractors"
+
+
+def project_scope(project_id: uuid.UUID) -> str:
+    return f"project:{project_id}"
+
+
+def reports_scope(project_id: uuid.UUID) -> str:
+    """Производственные отчёты проекта — отдельно, чтобы их запись не сбрасывала ETag бюджета."""
+    return f"reports:{project_id}"
+
+
+async def bump_version(db: AsyncSession, scope: str) -> int:
+    """Увеличивает версию области. Строка блокируется до commit — писатели одной области идут по очереди."""
+    stmt = (
+        insert(DataVersion)
+        .values(scope=scope, version=1)
+        .on_conflict_do_update(index_elements=[DataVersion.scope], set_={"version": DataVersion.version + 1})
+        .returning(DataVersion.version)
+    )
+    result = await db.execute(stmt)
+    return result.scalar_one()
+
+
+async def get_versions(db: AsyncSession, *scopes: str) -> dict[str, int]:
+    """Текущие версии областей (0 — ещё не было ни одной записи)."""
+    result = await db.execute(select(DataVersion.scope, DataVersion.version).where(DataVersion.scope.in_(scopes)))
+    found = dict(result.all())
+    return {scope: found.get(scope, 0) for scope in scopes}
+
+
+def make_etag(versions: dict[str, int], *extra) -> str:
+    """Сильный ETag из версий областей и параметров запроса, влияющих на ответ."""
+    raw = "|".join([f"{k}={v}" for k, v in sorted(versions.items())] + [str(e) for e in extra])
+    return '"' + hashlib.sha1(raw.encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Сравнение для If-None-Match (слабое, как требует RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag in candidates
+
+
+def conditional(request: Request, response: Response, etag: str) -> Response | None:
+    """Возвращает 304, если клиент уже имеет эту версию; иначе ставит ETag на ответ."""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
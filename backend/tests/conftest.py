@@ -0,0 +1,48 @@
+"""
+Общие фикстуры. Тесты с SQL, который нельзя проверить на подделке сессии
+(рекурсивные UPDATE, INSERT … SELECT), идут на Postgres из TEST_DATABASE_URL:
+схема создаётся миграциями, каждый тест — в транзакции, которая откатывается.
+Без TEST_DATABASE_URL такие тесты пропускаются.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def pg_url():
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL не задан")
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=BACKEND_DIR, env={**os.environ, "DATABASE_URL": url}, check=True, capture_output=True,
+    )
+    return url
+
+
+@pytest.fixture
+def run_in_db(pg_url):
+    """run_in_db(fn): выполняет async fn(session) в транзакции с откатом; commit внутри — savepoint."""
+    def run(fn):
+        async def main():
+            engine = create_async_engine(pg_url)
+            try:
+                async with engine.connect() as conn:
+                    outer = await conn.begin()
+                    session = AsyncSession(bind=conn, expire_on_commit=False, join_transaction_mode="create_savepoint")
+                    try:
+                        return await fn(session)
+                    finally:
+                        await session.close()
+                        await outer.rollback()
+            finally:
+                await engine.dispose()
+        return asyncio.run(main())
+    return run
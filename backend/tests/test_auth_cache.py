@@ -0,0 +1,61 @@
+"""Тесты кэша аутентификации."""
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from jose import JWTError
+
+from app.core.security import create_access_token, create_refresh_token
+from app.models.user import User
+from app.services import auth_cache
+
+
+class _Session:
+    def __init__(self, user):
+        self.user = user
+        self.queries = 0
+
+    async def execute(self, statement):
+        self.queries += 1
+        return SimpleNamespace(scalar_one_or_none=lambda: self.user)
+
+
+def _user(**kw) -> User:
+    data = dict(id=uuid.uuid4(), email="a@b.c", full_name="A", is_active=True, is_superadmin=False,
+                created_at=datetime.now(timezone.utc), hashed_password="x")
+    data.update(kw)
+    return User(**data)
+
+
+def setup_function():
+    auth_cache.clear()
+
+
+def test_token_subject_cached_and_type_checked():
+    user_id = uuid.uuid4()
+    token = create_access_token(str(user_id))
+    assert auth_cache.access_token_subject(token) == user_id
+    assert auth_cache.access_token_subject(token) == user_id
+    with pytest.raises(JWTError):
+        auth_cache.access_token_subject(create_refresh_token(str(user_id)))
+    with pytest.raises(JWTError):
+        auth_cache.access_token_subject("not-a-token")
+
+
+def test_active_user_cached_until_invalidated():
+    user = _user()
+    db = _Session(user)
+    load = lambda: asyncio.run(auth_cache.load_active_user(db, user.id))
+
+    cached = load()
+    assert cached.id == user.id and not isinstance(cached, User)
+    load()
+    assert db.queries == 1
+
+    user.is_active = False
+    auth_cache.invalidate_user(user.id)
+    assert load() is None
+    assert load() is None
+    assert db.queries == 3  # неактивные не кэшируются
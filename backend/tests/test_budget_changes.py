@@ -0,0 +1,90 @@
+"""Тесты курсора дельта-синхронизации."""
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.budget_path import child_path
+from app.models.budget import BudgetLine
+from app.models.project import Project
+from app.services.budget_changes import (
+    CURSOR_TTL, bump_budget, current_cursor, cursor_expired, decode_cursor, encode_cursor, load_changes,
+    record_subtree_deletion,
+)
+
+
+def test_cursor_roundtrip():
+    moment = datetime(2026, 3, 1, 12, 30, 5, tzinfo=timezone.utc)
+    cursor = encode_cursor(42, moment)
+    assert decode_cursor(cursor) == (42, moment)
+    for bad in ("", "42", "x.1", "-1.0", "2026-03-01T12:30:05Z"):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+def test_cursor_expired():
+    now = datetime.now(timezone.utc)
+    assert not cursor_expired(now - timedelta(hours=1), now)
+    assert cursor_expired(now - CURSOR_TTL - timedelta(seconds=1), now)
+
+
+def _line(project_id, name):
+    line_id = uuid.uuid4()
+    return BudgetLine(id=line_id, project_id=project_id, path=child_path(None, line_id), level=0,
+                      name=name, type="ITEM", rate=1.0, quantity=1.0)
+
+
+def test_late_commit_is_delivered_after_a_newer_cursor(pg_url):
+    """
+    Транзакция записала строку раньше, а зафиксировалась позже другой: курсор,
+    выданный между их commit, всё равно получает её строку в следующей дельте.
+    """
+    async def main():
+        engine = create_async_engine(pg_url)
+        project = Project(name="changes")
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                db.add(project)
+                await db.flush()
+                slow_line, fast_line, gone = (_line(project.id, n) for n in ("slow", "fast", "gone"))
+                db.add_all([slow_line, fast_line, gone])
+                await db.flush()
+                await bump_budget(db, project.id)
+                await db.commit()
+                start = decode_cursor(await current_cursor(db, project.id))[0]
+
+            async with AsyncSession(engine) as slow, AsyncSession(engine) as fast, AsyncSession(engine) as reader:
+                # Долгая транзакция: изменение записано, до commit далеко
+                (await slow.get(BudgetLine, slow_line.id)).name = "slow-edit"
+                await slow.flush()
+
+                (await fast.get(BudgetLine, fast_line.id)).name = "fast-edit"
+                gone_line = await fast.get(BudgetLine, gone.id)
+                await record_subtree_deletion(fast, project.id, [gone_line])
+                await fast.delete(gone_line)
+                await bump_budget(fast, project.id)
+                await fast.commit()
+
+                lines, deleted = await load_changes(reader, project.id, start)
+                assert [l.name for l in lines] == ["fast-edit"] and deleted == [gone.id]
+                cursor = decode_cursor(await current_cursor(reader, project.id))[0]
+                await reader.commit()
+
+                await bump_budget(slow, project.id)
+                await slow.commit()
+
+                lines, deleted = await load_changes(reader, project.id, cursor)
+                assert [l.name for l in lines] == ["slow-edit"] and deleted == []
+                assert await reader.scalar(
+                    select(BudgetLine.sync_version).where(BudgetLine.id == slow_line.id)
+                ) > cursor
+        finally:
+            async with AsyncSession(engine) as db:
+                await db.execute(delete(Project).where(Project.id == project.id))
+                await db.commit()
+            await engine.dispose()
+
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""Тесты сравнения бюджетов."""
+import uuid
+
+from app.core.budget_diff import diff_states, group_totals
+
+
+def _snap(parent=None, type_="ITEM", code="", total=0.0, name="x"):
+    return {
+        "parent_id": str(parent) if parent else None, "sort_order": 0, "level": 0, "code": code,
+        "name": name, "type": type_, "unit": None, "quantity_units": 1.0, "rate": total, "quantity": 1.0,
+        "tax_scheme_id": None, "contractor_id": None, "tax_override": False, "currency": "RUB",
+        "limit_amount": 0.0, "subtotal": total, "tax_amount": 0.0, "total": total,
+    }
+
+
+def _by_type(events):
+    result = {}
+    for e in events:
+        result.setdefault(e["type"], []).append(e)
+    return result
+
+
+def test_diff_by_id():
+    cat, cat2, a, b, c = (uuid.uuid4() for _ in range(5))
+    old = {cat: _snap(type_="GROUP"), cat2: _snap(type_="GROUP"), a: _snap(cat, total=10.0), b: _snap(cat, total=5.0)}
+    new = {cat: _snap(type_="GROUP"), cat2: _snap(type_="GROUP"), a: _snap(cat2, total=10.0), c: _snap(cat, total=7.0)}
+    new[cat]["name"] = "renamed"
+
+    events = _by_type(diff_states(old, new))
+    assert [e["id"] for e in events["added"]] == [str(c)]
+    assert [e["id"] for e in events["removed"]] == [str(b)]
+    assert [e["id"] for e in events["moved"]] == [str(a)]
+    assert events["changed"][0]["fields"] == {"name": {"old": "x", "new": "renamed"}}
+
+    groups = {e["id"]: e for e in events["group"]}
+    assert groups[str(cat)]["total"] == {"old": 15.0, "new": 7.0, "delta": -8.0}
+    assert groups[str(cat2)]["total"]["delta"] == 10.0
+
+    summary = events["summary"][0]
+    assert (summary["added"], summary["removed"], summary["moved"], summary["changed"]) == (1, 1, 1, 1)
+    assert summary["total"]["delta"] == 2.0
+    assert list(diff_states(old, new))[-1]["type"] == "summary"
+
+
+def test_diff_by_code_across_projects():
+    g1, i1 = uuid.uuid4(), uuid.uuid4()
+    g2, i2 = uuid.uuid4(), uuid.uuid4()
+    old = {g1: _snap(type_="GROUP", code="1"), i1: _snap(g1, code="1.1", total=100.0)}
+    new = {g2: _snap(type_="GROUP", code="1"), i2: _snap(g2, code="1.1", total=150.0)}
+    events = _by_type(diff_states(old, new, key="code"))
+    assert "added" not in events and "removed" not in events and "moved" not in events
+    assert events["changed"][0]["fields"]["total"]["delta"] == 50.0
+    assert events["group"][0]["key"] == "1"
+
+
+def test_group_totals_nested():
+    cat, sub, item = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    state = {str(cat): _snap(type_="GROUP"), str(sub): _snap(cat, type_="GROUP"), str(item): _snap(sub, total=3.0)}
+    totals = group_totals(state)
+    assert totals[str(cat)][2] == totals[str(sub)][2] == 3.0
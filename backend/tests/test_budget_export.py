@@ -0,0 +1,58 @@
+"""Тесты потокового экспорта бюджета в Excel."""
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+from openpyxl import load_workbook
+
+from app.core.tax_logic import calc_tax, FL
+from app.services import budget_export, tax_schemes
+
+
+def _row(type_, level, name, rate=0.0, quantity=1.0, scheme=None, rollup=(None, None, None)):
+    return SimpleNamespace(
+        id=uuid.uuid4(), type=type_, level=level, code=name, name=name, unit="смена", quantity_units=1.0,
+        rate=rate, quantity=quantity, tax_scheme_id=scheme, limit_amount=0.0,
+        subtotal=rollup[0], tax_amount=rollup[1], total=rollup[2],
+    )
+
+
+class _Session:
+    """execute — схемы для кэша tax_schemes, stream — строки порциями."""
+
+    def __init__(self, schemes, partitions):
+        self.schemes = schemes
+        self.partitions = partitions
+
+    async def execute(self, statement, params=None):
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: self.schemes))
+
+    async def stream(self, statement, params=None):
+        async def partitions():
+            for p in self.partitions:
+                yield p
+        return SimpleNamespace(partitions=partitions)
+
+
+def test_export_writes_tree_with_batch_amounts_and_totals(tmp_path):
+    tax_schemes.invalidate()
+    fl = SimpleNamespace(id=uuid.uuid4(), name="ФЛ", is_system=True,
+                         components=[SimpleNamespace(sort_order=i, **c) for i, c in enumerate(FL)])
+    item_a = _row("ITEM", 1, "a", 10000.0, 3, fl.id)
+    item_b = _row("ITEM", 1, "b", 500.0, 2)
+    expected_a = calc_tax(10000.0, 3, FL)
+    group = _row("GROUP", 0, "g", rollup=(31000.0, expected_a["tax_amount"], expected_a["total"] + 1000.0))
+    db = _Session([fl], [[group, item_a], [item_b]])
+
+    path = str(tmp_path / "b.xlsx")
+    count = asyncio.run(budget_export.write_budget_xlsx(db, uuid.uuid4(), path))
+    assert count == 3
+
+    rows = list(load_workbook(path).active.iter_rows(values_only=True))
+    assert rows[0] == budget_export.HEADERS
+    assert rows[1][1] == "g" and rows[1][6:9] == (group.subtotal, group.tax_amount, group.total)
+    assert rows[2][1] == "  a"
+    assert rows[2][6:9] == (expected_a["subtotal"], expected_a["tax_amount"], expected_a["total"])
+    assert rows[3][6:9] == (1000.0, 0.0, 1000.0)
+    assert rows[4][1] == "Итого по проекту"
+    assert rows[4][6:9] == (31000.0, expected_a["tax_amount"], expected_a["total"] + 1000.0)
@@ -0,0 +1,174 @@
+"""Тесты перенумерации, проверки циклов при перемещении статей и проверки итогов групп (на Postgres)."""
+import uuid
+from collections import defaultdict
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select, update
+
+from app.models.budget import BudgetLine, BudgetRollup
+from app.models.project import Project
+from app.routers.budget import batch_lines, check_budget_rollups, repair_budget_rollups
+from app.schemas.budget import BudgetBatchRequest
+from app.services.budget_hierarchy import find_cycle, renumber_after_move
+from app.services.budget_rollups import check_rollups, rebuild_rollups_in_db
+
+
+def expected_numbering(lines, moved=()) -> dict:
+    """Модель нумерации: id → (code, level, sort_order, path); перемещённая строка — перед соседом с тем же sort_order."""
+    children = defaultdict(list)
+    for line in lines:
+        children[line.parent_id].append(line)
+    out = {}
+
+    def walk(parent_id, code, level, path):
+        kids = sorted(children[parent_id], key=lambda l: (l.sort_order, l.id not in moved, l.id))
+        for rn, line in enumerate(kids, start=1):
+            line_code = f"{code}.{rn}" if code else str(rn)
+            line_path = f"{path}{line.id}/"
+            out[line.id] = (line_code, level, rn - 1, line_path)
+            walk(line.id, line_code, level + 1, line_path)
+
+    walk(None, "", 0, "")
+    return out
+
+
+async def _seed(db) -> tuple[uuid.UUID, dict]:
+    """Три корневые группы, в каждой две подгруппы по три статьи. Возвращает проект и строки по коду."""
+    project = Project(name="hierarchy")
+    db.add(project)
+    await db.flush()
+    lines = []
+
+    def add(parent, sort_order, type_):
+        line = BudgetLine(id=uuid.uuid4(), project_id=project.id, parent_id=parent.id if parent else None,
+                          sort_order=sort_order, name="x", type=type_, rate=100.0 * (len(lines) + 1),
+                          quantity=1.0, subtotal=0.0, tax_amount=0.0, total=0.0)
+        if type_ == "ITEM":
+            line.subtotal = line.total = line.rate
+        lines.append(line)
+        return line
+
+    for g in range(3):
+        group = add(None, g, "GROUP")
+        for s in range(2):
+            sub = add(group, s, "GROUP")
+            for i in range(3):
+                add(sub, i, "ITEM")
+    for line_id, (code, level, sort_order, path) in expected_numbering(lines).items():
+        line = next(l for l in lines if l.id == line_id)
+        line.code, line.level, line.path = code, level, path
+    db.add_all(lines)
+    await db.flush()
+    await rebuild_rollups_in_db(db, [project.id])
+    return project.id, {l.code: l for l in lines}
+
+
+async def _load(db, project_id) -> list[BudgetLine]:
+    result = await db.execute(
+        select(BudgetLine).where(BudgetLine.project_id == project_id).execution_options(populate_existing=True)
+    )
+    return list(result.scalars().all())
+
+
+def _snapshot(lines, moves=()) -> list:
+    """Родитель и sort_order строк после перемещений moves [(строка, новый родитель, sort_order)] — вход модели."""
+    state = {l.id: SimpleNamespace(id=l.id, parent_id=l.parent_id, sort_order=l.sort_order) for l in lines}
+    for line, parent, sort_order in moves:
+        state[line.id].parent_id = parent.id if parent else None
+        state[line.id].sort_order = sort_order
+    return list(state.values())
+
+
+def _assert_numbering(lines, before, moved):
+    expected = expected_numbering(before, moved)
+    assert {l.id: (l.code, l.level, l.sort_order, l.path) for l in lines} == expected
+
+
+def test_move_under_own_descendant_is_a_cycle(run_in_db):
+    async def scenario(db):
+        project_id, by_code = await _seed(db)
+        by_code["1"].parent_id = by_code["2.1"].id   # законное перемещение
+        await db.flush()
+        assert await find_cycle(db, [by_code["1"].id]) is None
+
+        by_code["2"].parent_id = by_code["2.2"].id   # внутрь собственного поддерева
+        await db.flush()
+        assert await find_cycle(db, [by_code["1"].id, by_code["2"].id]) == by_code["2"].id
+
+    run_in_db(scenario)
+
+
+def test_batch_rejects_move_under_own_descendant(run_in_db):
+    async def scenario(db):
+        project_id, by_code = await _seed(db)
+        request = BudgetBatchRequest(operations=[
+            {"op": "move", "id": by_code["3"].id, "data": {"parent_id": by_code["3.1"].id, "sort_order": 0}},
+        ])
+        with pytest.raises(HTTPException) as exc:
+            await batch_lines(project_id, request, None, db)
+        assert exc.value.status_code == 400
+
+    run_in_db(scenario)
+
+
+@pytest.mark.parametrize("target, sort_order", [("3", 0), ("3", 1), ("2.1", 5), (None, 1)])
+def test_group_move_renumbers_like_model(run_in_db, target, sort_order):
+    async def scenario(db):
+        project_id, by_code = await _seed(db)
+        moved = by_code["1.2"]
+        old_parent = moved.parent_id
+        before = _snapshot(by_code.values(), [(moved, by_code.get(target), sort_order)])
+        moved.parent_id = by_code[target].id if target else None
+        moved.sort_order = sort_order
+        await db.flush()
+
+        await renumber_after_move(db, project_id, {old_parent, moved.parent_id}, [moved.id])
+        lines = await _load(db, project_id)
+        _assert_numbering(lines, before, {moved.id})
+        assert by_code["1.2.3"].level == (by_code[target].level + 2 if target else 1)
+
+    run_in_db(scenario)
+
+
+def test_batch_with_several_moves_rewrites_paths(run_in_db):
+    async def scenario(db):
+        project_id, by_code = await _seed(db)
+        moves = [
+            (by_code["1.1.2"], by_code["2.2"], 0),   # статья в другую подгруппу
+            (by_code["3"], by_code["1"], 1),          # корневая группа внутрь другой
+            (by_code["2.1"], None, 0),                # подгруппа в корень
+        ]
+        request = BudgetBatchRequest(operations=[
+            {"op": "move", "id": line.id, "data": {"parent_id": parent.id if parent else None, "sort_order": order}}
+            for line, parent, order in moves
+        ])
+        before = _snapshot(by_code.values(), moves)
+        await batch_lines(project_id, request, None, db)
+
+        lines = await _load(db, project_id)
+        _assert_numbering(lines, before, {line.id for line, _, _ in moves})
+        by_id = {l.id: l for l in lines}
+        for line in lines:
+            parent = by_id.get(line.parent_id)
+            assert line.path == (parent.path if parent else "") + f"{line.id}/"
+        assert await check_rollups(db, project_id, lines) == []
+
+    run_in_db(scenario)
+
+
+def test_rollups_check_is_read_only_and_repair_fixes_drift(run_in_db):
+    async def scenario(db):
+        project_id, by_code = await _seed(db)
+        await db.execute(update(BudgetRollup).where(BudgetRollup.line_id == by_code["2.1"].id).values(total=0.0))
+
+        report = await check_budget_rollups(project_id, None, db)
+        assert [d["line_id"] for d in report["drift"]] == [by_code["2.1"].id]
+        assert (await check_budget_rollups(project_id, None, db))["drift"] == report["drift"]
+
+        repaired = await repair_budget_rollups(project_id, None, db)
+        assert repaired["repaired"] and repaired["drift"] == report["drift"]
+        assert (await check_budget_rollups(project_id, None, db))["drift"] == []
+
+    run_in_db(scenario)
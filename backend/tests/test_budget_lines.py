@@ -0,0 +1,113 @@
+"""Тесты проверки родителя при создании статей (одиночном и пакетном), пакетов с удалением и чтения поддерева."""
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.budget_path import child_path
+from app.models.budget import BudgetLine
+from app.routers.budget import _load_subtree_levels, batch_lines, create_line
+from app.schemas.budget import BudgetBatchRequest, BudgetLineCreate
+
+
+class _Session:
+    """Отдаёт статьи, подходящие под все параметры WHERE запроса (id, project_id, id IN …)."""
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    async def execute(self, statement, params=None):
+        criteria = statement.compile().params
+
+        def matches(line):
+            for name, value in criteria.items():
+                actual = getattr(line, name.rsplit("_", 1)[0])
+                if actual not in value if isinstance(value, list) else actual != value:
+                    return False
+            return True
+
+        found = [l for l in self.lines if matches(l)]
+        return SimpleNamespace(
+            scalar_one_or_none=lambda: found[0] if found else None,
+            scalars=lambda: SimpleNamespace(all=lambda: found),
+        )
+
+    async def get(self, model, line_id):
+        return next((l for l in self.lines if l.id == line_id), None)
+
+
+def _line(project_id, type_="GROUP"):
+    line_id = uuid.uuid4()
+    return BudgetLine(id=line_id, project_id=project_id, parent_id=None, type=type_, name="g",
+                      level=0, path=child_path(None, line_id))
+
+
+def _create(project_id, db, parent_id):
+    return create_line(project_id, BudgetLineCreate(name="x", parent_id=parent_id), None, db)
+
+
+def _batch(project_id, db, parent_id):
+    request = BudgetBatchRequest(operations=[{"op": "create", "data": {"name": "x", "parent_id": parent_id}}])
+    return batch_lines(project_id, request, None, db)
+
+
+@pytest.mark.parametrize("call", [_create, _batch])
+def test_parent_from_other_project_is_rejected(call):
+    project_id = uuid.uuid4()
+    foreign = _line(uuid.uuid4())
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(call(project_id, _Session([foreign]), foreign.id))
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.parametrize("call", [_create, _batch])
+def test_unknown_parent_is_rejected(call):
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(call(uuid.uuid4(), _Session([]), uuid.uuid4()))
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.parametrize("call", [_create, _batch])
+def test_item_parent_is_rejected(call):
+    project_id = uuid.uuid4()
+    item = _line(project_id, "ITEM")
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(call(project_id, _Session([item]), item.id))
+    assert exc.value.status_code == 400
+
+
+def test_subtree_of_unknown_or_foreign_parent_is_404():
+    project_id = uuid.uuid4()
+    foreign = _line(uuid.uuid4())
+    for parent_id in (foreign.id, uuid.uuid4()):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(_load_subtree_levels(_Session([foreign]), project_id, parent_id, 1))
+        assert exc.value.status_code == 404
+
+
+def _child(parent, type_="GROUP"):
+    line = _line(parent.project_id, type_)
+    line.parent_id, line.level, line.path = parent.id, parent.level + 1, child_path(parent.path, line.id)
+    return line
+
+
+@pytest.mark.parametrize("op", [
+    lambda t: {"op": "create", "data": {"name": "x", "parent_id": t["root"].id}},
+    lambda t: {"op": "create", "data": {"name": "x", "parent_id": t["group"].id}},
+    lambda t: {"op": "move", "id": t["item"].id, "data": {"parent_id": t["other"].id, "sort_order": 0}},
+    lambda t: {"op": "move", "id": t["other"].id, "data": {"parent_id": t["group"].id, "sort_order": 0}},
+    lambda t: {"op": "update", "id": t["item"].id, "data": {"rate": 1.0}},
+], ids=["create-under-deleted", "create-under-descendant", "move-out-of-deleted", "move-into-deleted", "update"])
+def test_batch_rejects_ops_inside_subtree_deleted_later(op):
+    """Операция над поддеревьем, которое удаляется позже в пакете, отклоняется до изменений."""
+    project_id = uuid.uuid4()
+    root = _line(project_id)
+    group = _child(root)
+    tree = {"root": root, "group": group, "item": _child(group, "ITEM"), "other": _line(project_id)}
+    request = BudgetBatchRequest(operations=[op(tree), {"op": "delete", "id": root.id}])
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(batch_lines(project_id, request, None, _Session(list(tree.values()))))
+    assert exc.value.status_code == 400
+    assert tree["item"].parent_id == group.id and tree["other"].parent_id is None
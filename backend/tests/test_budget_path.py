@@ -0,0 +1,32 @@
+"""Тесты материализованного пути статей."""
+import uuid
+
+from app.core.budget_path import child_path, path_ids, ancestor_ids, is_in_subtree
+from app.core.budget_template import standard_template
+
+
+def test_path_roundtrip():
+    a, b, c = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    path = child_path(child_path(child_path(None, a), b), c)
+    assert path_ids(path) == [a, b, c]
+    assert ancestor_ids(path) == [a, b]
+    assert ancestor_ids(child_path("", a)) == []
+    assert path_ids("") == []
+
+
+def test_subtree_check():
+    a, b = uuid.uuid4(), uuid.uuid4()
+    root = child_path(None, a)
+    child = child_path(root, b)
+    assert is_in_subtree(child, root)
+    assert is_in_subtree(root, root)
+    assert not is_in_subtree(root, child)
+    assert not is_in_subtree(child, "")
+
+
+def test_template_paths_follow_parents():
+    rows = standard_template().instantiate(uuid.uuid4())
+    paths = dict(zip(rows["id"], rows["path"]))
+    for line_id, parent_id, path, level in zip(rows["id"], rows["parent_id"], rows["path"], rows["level"]):
+        assert path == child_path(paths[parent_id] if parent_id else None, line_id)
+        assert len(path_ids(path)) == level + 1
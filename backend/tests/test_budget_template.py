@@ -0,0 +1,56 @@
+"""Тесты компиляции шаблонов бюджета."""
+import uuid
+from types import SimpleNamespace
+
+from app.core.budget_path import child_path, path_ids
+from app.core.budget_template import (
+    TEMPLATE, TEMPLATE_FIELDS, CompiledTemplate, compile_lines, compile_tree, standard_template,
+)
+
+
+def _preorder(template, code=""):
+    """(код, уровень, sort_order, имя) строк вложенного шаблона в прямом порядке обхода."""
+    for i, item in enumerate(template):
+        item_code = f"{code}.{i + 1}" if code else str(i + 1)
+        yield item_code, item_code.count("."), i, item["name"]
+        yield from _preorder(item.get("children") or [], item_code)
+
+
+def test_compiled_template_follows_nested_tree():
+    compiled = standard_template()
+    expected = list(_preorder(TEMPLATE))
+    assert list(zip(compiled.code, compiled.level, compiled.sort_order, compiled.name)) == expected
+    assert all(p < i for i, p in enumerate(compiled.parent))
+    for i, p in enumerate(compiled.parent):
+        assert (compiled.code[i].rsplit(".", 1)[0] if p >= 0 else "") == (compiled.code[p] if p >= 0 else "")
+
+
+def test_instantiate_links_parents_and_paths():
+    project_id = uuid.uuid4()
+    rows = standard_template().instantiate(project_id)
+    by_id = dict(zip(rows["id"], range(len(rows["id"]))))
+    for i, line_id in enumerate(rows["id"]):
+        parent_id = rows["parent_id"][i]
+        parent_path = rows["path"][by_id[parent_id]] if parent_id else None
+        assert rows["path"][i] == child_path(parent_path, line_id)
+        assert len(path_ids(rows["path"][i])) == rows["level"][i] + 1
+    # Каждая вставка — новые id
+    assert set(rows["id"]).isdisjoint(standard_template().instantiate(project_id)["id"])
+
+
+def test_compile_lines_roundtrip():
+    """Бюджет, созданный из шаблона, компилируется обратно в тот же шаблон."""
+    rows = compile_tree(TEMPLATE).instantiate(uuid.uuid4())
+    scheme_id = uuid.uuid4()
+    rows["tax_scheme_id"][2] = scheme_id
+    lines = [
+        SimpleNamespace(**{f: rows[f][i] for f in ("id", "parent_id", "sort_order", *TEMPLATE_FIELDS)})
+        for i in range(len(rows["id"]))
+    ]
+    lines.reverse()  # порядок строк из БД не важен
+    compiled = compile_lines(lines)
+    expected = standard_template().to_data()
+    expected["tax_scheme_id"] = list(expected["tax_scheme_id"])
+    expected["tax_scheme_id"][2] = str(scheme_id)
+    assert compiled.to_data() == expected
+    assert CompiledTemplate(compiled.to_data()).to_data() == expected
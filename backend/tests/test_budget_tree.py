@@ -0,0 +1,81 @@
+"""Тесты сборки дерева бюджета."""
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from app.core.budget_tree import build_budget_tree, compute_group_rollups
+from app.core.tax_logic import SZ_6, FL
+
+
+def _line(parent=None, type_="ITEM", sort_order=0, rate=0.0, quantity=1.0, scheme=None):
+    return SimpleNamespace(
+        id=uuid.uuid4(), project_id=uuid.UUID(int=1), parent_id=parent.id if parent else None,
+        sort_order=sort_order, level=0, code="", name="x", type=type_, unit=None,
+        quantity_units=1.0, rate=rate, quantity=quantity, tax_scheme_id=scheme, contractor_id=None,
+        tax_override=False, currency="RUB", limit_amount=0.0, updated_at=datetime.now(timezone.utc),
+    )
+
+
+def test_children_sorted_by_sort_order():
+    root = _line(type_="GROUP")
+    a = _line(root, sort_order=2)
+    b = _line(root, sort_order=1)
+    tree = build_budget_tree([a, root, b], {})
+    assert [c.id for c in tree[0].children] == [b.id, a.id]
+
+
+def test_group_rollup_is_sum_of_children():
+    sz, fl = uuid.uuid4(), uuid.uuid4()
+    cat = _line(type_="GROUP")
+    sub = _line(cat, type_="GROUP")
+    i1 = _line(sub, rate=100.0, quantity=2, scheme=sz)
+    i2 = _line(cat, sort_order=1, rate=1000.0, quantity=1, scheme=fl)
+    tree = build_budget_tree([i2, i1, sub, cat], {sz: SZ_6, fl: FL})
+
+    node = tree[0]
+    assert node.subtotal == 200 + 1000
+    assert node.total == 106 * 2 + (1000 + 149 + 300)
+    assert node.children[0].total == 212
+
+
+def test_empty_group_and_orphans():
+    empty = _line(type_="GROUP")
+    orphan = _line(SimpleNamespace(id=uuid.uuid4()), rate=5.0)
+    tree = build_budget_tree([empty, orphan], {})
+    assert len(tree) == 1
+    assert tree[0].total == 0
+
+
+def test_compute_group_rollups_matches_tree():
+    sz = uuid.uuid4()
+    cat = _line(type_="GROUP")
+    sub = _line(cat, type_="GROUP")
+    lines = [cat, sub, _line(sub, rate=1000.0, quantity=3, scheme=sz), _line(cat, rate=50.0)]
+    rollups = compute_group_rollups(lines, {sz: SZ_6})
+    tree = build_budget_tree(lines, {sz: SZ_6})
+    assert rollups[cat.id][:3] == (tree[0].subtotal, tree[0].tax_amount, tree[0].total)
+    assert rollups[sub.id][2] == 1063 * 3
+
+
+def test_stored_rollups_are_used_for_groups():
+    cat = _line(type_="GROUP")
+    item = _line(cat, rate=10.0)
+    tree = build_budget_tree([cat, item], {}, rollups={cat.id: (1.0, 2.0, 3.0, 0.0, 0.0, 0.0)})
+    assert (tree[0].subtotal, tree[0].tax_amount, tree[0].total) == (1.0, 2.0, 3.0)
+
+
+def test_stored_line_amounts_without_tax_engine():
+    cat = _line(type_="GROUP")
+    item = _line(cat, rate=100.0, quantity=2)
+    item.subtotal, item.tax_amount, item.total = 200.0, 12.0, 212.0
+    tree = build_budget_tree([cat, item], None)
+    assert tree[0].children[0].total == 212.0
+    assert tree[0].tax_amount == 12.0
+
+
+def test_subtree_root_and_child_counts():
+    cat = _line(type_="GROUP")
+    sub = _line(cat, type_="GROUP")
+    tree = build_budget_tree([sub], None, root_id=cat.id, child_counts={sub.id: 4})
+    assert [n.id for n in tree] == [sub.id]
+    assert tree[0].has_children and tree[0].child_count == 4
@@ -0,0 +1,58 @@
+"""Тесты снимков и дельт версий бюджета."""
+import uuid
+from types import SimpleNamespace
+
+from app.core.budget_tree import build_budget_tree
+from app.core.budget_versions import (
+    SNAPSHOT_FIELDS, VersionLine, snapshot_line, diff_snapshots, apply_version_delta, needs_rebase, MAX_CHAIN,
+)
+
+
+def _line(parent=None, type_="ITEM", total=0.0, name="x"):
+    values = dict.fromkeys(SNAPSHOT_FIELDS, 0)
+    values.update(
+        id=uuid.uuid4(), parent_id=parent.id if parent else None, code="", name=name, type=type_, unit=None,
+        tax_scheme_id=None, contractor_id=None, tax_override=False, currency="RUB",
+        subtotal=total, tax_amount=0.0, total=total,
+    )
+    return SimpleNamespace(**values)
+
+
+def _state(lines):
+    return {l.id: snapshot_line(l) for l in lines}
+
+
+def test_delta_roundtrip():
+    cat = _line(type_="GROUP")
+    a, b = _line(cat, total=10.0), _line(cat, total=20.0)
+    v1 = _state([cat, a, b])
+
+    a.total = 15.0
+    c = _line(cat, total=5.0)
+    v2 = _state([cat, a, c])
+
+    delta = diff_snapshots(v1, v2)
+    assert set(delta) == {a.id, b.id, c.id}
+    assert delta[b.id] is None
+    assert apply_version_delta(dict(v1), delta) == v2
+
+
+def test_unchanged_budget_has_empty_delta():
+    lines = [_line(), _line()]
+    assert diff_snapshots(_state(lines), _state(lines)) == {}
+
+
+def test_rebase_policy():
+    assert not needs_rebase(1, 10, 1000)
+    assert needs_rebase(MAX_CHAIN, 1, 1000)
+    assert needs_rebase(1, 600, 1000)
+
+
+def test_version_tree_uses_snapshot_amounts():
+    cat = _line(type_="GROUP")
+    item = _line(cat, total=42.0)
+    state = _state([cat, item])
+    lines = [VersionLine(line_id, uuid.uuid4(), snap, None) for line_id, snap in state.items()]
+    tree = build_budget_tree(lines, None)
+    assert tree[0].total == 42.0
+    assert tree[0].children[0].parent_id == cat.id
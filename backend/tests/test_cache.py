@@ -0,0 +1,78 @@
+"""Тесты LRU/TTL-кэша и кэша ролей в проектах."""
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+from app.core.cache import TTLCache, MISSING
+from app.services import project_access
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry_and_none_values():
+    clock = _Clock()
+    cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", None)
+    assert cache.get("a") is None
+    assert cache.get("b") is MISSING
+    clock.now = 5
+    assert cache.get("a") is MISSING
+    assert len(cache) == 0
+
+
+def test_lru_eviction_and_pop_where():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set(("u1", "p1"), 1)
+    cache.set(("u2", "p1"), 2)
+    cache.get(("u1", "p1"))  # u1 — свежее u2
+    cache.set(("u3", "p2"), 3)
+    assert cache.get(("u2", "p1")) is MISSING
+    assert cache.pop_where(lambda k: k[1] == "p1") == 1
+    assert cache.get(("u3", "p2")) == 3
+
+
+class _Session:
+    """Сессия-заглушка: считает запросы роли."""
+    def __init__(self, role):
+        self.role = role
+        self.queries = 0
+
+    async def execute(self, statement):
+        self.queries += 1
+        return SimpleNamespace(scalar_one_or_none=lambda: self.role)
+
+
+def test_role_resolved_once_and_invalidated():
+    user = SimpleNamespace(id=uuid.uuid4(), is_superadmin=False)
+    project_id = uuid.uuid4()
+    db = _Session(None)
+
+    async def resolve():
+        return await project_access.resolve_project_role(db, user, project_id)
+
+    assert asyncio.run(resolve()) is None
+    assert asyncio.run(resolve()) is None
+    assert db.queries == 1  # отсутствие доступа тоже кэшируется
+
+    db.role = "PRODUCER"
+    project_access.invalidate_project_roles(project_id, user.id)
+    assert asyncio.run(resolve()) == "PRODUCER"
+    assert db.queries == 2
+
+    project_access.invalidate_project_roles(project_id)
+    asyncio.run(resolve())
+    assert db.queries == 3
+
+
+def test_superadmin_skips_lookup():
+    db = _Session(None)
+    admin = SimpleNamespace(id=uuid.uuid4(), is_superadmin=True)
+    role = asyncio.run(project_access.resolve_project_role(db, admin, uuid.uuid4()))
+    assert role == project_access.SUPERADMIN_ROLE
+    assert db.queries == 0
@@ -0,0 +1,106 @@
+"""Тесты шифрования полей контрагентов."""
+import asyncio
+import base64
+import os
+import threading
+from types import SimpleNamespace
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.crypto import FieldCipher, derive_key
+from app.core.security import encrypt_field, decrypt_field
+from app.models.contractor import Contractor
+from app.services import crypto
+
+
+def test_roundtrip_and_legacy_format():
+    cipher = FieldCipher("key-1")
+    assert cipher.decrypt(cipher.encrypt("Паспорт 1234")) == "Паспорт 1234"
+    assert cipher.encrypt("") == "" and cipher.decrypt(None) is None
+    # Значение, зашифрованное прежним кодом (новый AESGCM на каждый вызов)
+    nonce = os.urandom(12)
+    legacy = base64.b64encode(nonce + AESGCM(derive_key("key-1")).encrypt(nonce, b"old", None)).decode()
+    assert cipher.decrypt(legacy) == "old"
+    assert decrypt_field(encrypt_field("x")) == "x"
+
+
+def test_rotation_reads_previous_key():
+    old = FieldCipher("old-key")
+    value = old.encrypt("bank")
+    with pytest.raises(InvalidTag):
+        FieldCipher("new-key").decrypt(value)
+
+    rotating = FieldCipher("new-key", "old-key")
+    assert rotating.decrypt(value) == "bank"
+    rotated = rotating.rotate(value)
+    assert FieldCipher("new-key").decrypt(rotated) == "bank"
+    assert rotating.rotate(rotated) is None
+
+    rows = [SimpleNamespace(id=1, passport_data_enc=value, bank_details_enc=None),
+            SimpleNamespace(id=2, passport_data_enc=rotated, bank_details_enc=None)]
+    updates = crypto._rotate_rows(rotating, rows)
+    assert [u["id"] for u in updates] == [1]
+    assert updates[0]["bank_details_enc"] is None
+
+
+def test_batch_preserves_order_across_chunks():
+    values = [f"v{i}" if i % 7 else None for i in range(crypto.BATCH_CHUNK * 2 + 5)]
+
+    async def scenario():
+        encrypted = await crypto.encrypt_many(values)
+        return await crypto.decrypt_many(encrypted)
+
+    assert asyncio.run(scenario()) == values
+
+
+def test_edit_during_rotation_is_not_overwritten(pg_url, monkeypatch):
+    """Правка, пришедшая, пока порция перешифровывается, ждёт commit ротации и остаётся в базе."""
+    rotating = FieldCipher("new-key", "old-key")
+    monkeypatch.setattr(crypto, "field_cipher", lambda: rotating)
+    in_chunk, release = threading.Event(), threading.Event()
+    rotate_rows = crypto._rotate_rows
+
+    def paused(cipher, rows):
+        in_chunk.set()
+        release.wait(10)
+        return rotate_rows(cipher, rows)
+
+    monkeypatch.setattr(crypto, "_rotate_rows", paused)
+
+    async def edit(engine, contractor_id):
+        async with AsyncSession(engine) as db:
+            await db.execute(update(Contractor).where(Contractor.id == contractor_id)
+                             .values(passport_data_enc=rotating.encrypt("new")))
+            await db.commit()
+
+    async def main():
+        engine = create_async_engine(pg_url)
+        contractor = Contractor(full_name="rotation", type="IP", passport_data_enc=FieldCipher("old-key").encrypt("old"))
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                db.add(contractor)
+                await db.commit()
+            async with AsyncSession(engine) as db:
+                rotation = asyncio.create_task(crypto.rotate_contractor_keys(db))
+                await asyncio.to_thread(in_chunk.wait, 10)
+                editor = asyncio.create_task(edit(engine, contractor.id))
+                await asyncio.sleep(0.3)
+                assert not editor.done()   # ждёт блокировку порции
+                release.set()
+                await rotation
+                await editor
+            async with AsyncSession(engine) as db:
+                value = await db.scalar(select(Contractor.passport_data_enc).where(Contractor.id == contractor.id))
+            assert FieldCipher("new-key").decrypt(value) == "new"
+        finally:
+            release.set()
+            async with AsyncSession(engine) as db:
+                await db.execute(delete(Contractor).where(Contractor.id == contractor.id))
+                await db.commit()
+            await engine.dispose()
+
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+"""Тесты фоновых задач экспорта и дискового кэша."""
+import asyncio
+import os
+import uuid
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.models.production import ProductionReport
+from app.models.project import Project
+from app.routers.production import update_report
+from app.schemas.production import ProductionReportUpdate
+from app.services import export_jobs
+from app.services.auth_cache import AuthUser
+from app.services.versions import CONTRACTORS_SCOPE, reports_scope, get_versions
+
+
+class _Session:
+    def __init__(self, versions: dict):
+        self.versions = versions
+
+    async def execute(self, statement, params=None):
+        return SimpleNamespace(all=lambda: list(self.versions.items()))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def fake_export(tmp_path, monkeypatch):
+    """Тип экспорта test_txt: пишет файл и считает запуски."""
+    monkeypatch.setattr(settings, "export_cache_dir", str(tmp_path))
+    monkeypatch.setattr(export_jobs, "AsyncSessionLocal", lambda: _Session({}))
+    runs = []
+
+    async def write(db, project_id, path):
+        runs.append(project_id)
+        await asyncio.sleep(0)
+        with open(path, "w") as f:
+            f.write(str(project_id))
+        return 1
+
+    spec = export_jobs.ExportType("test_txt", ".txt", "text/plain", lambda p: (f"project:{p}",), write)
+    monkeypatch.setitem(export_jobs.EXPORT_TYPES, "test_txt", spec)
+    return runs
+
+
+def test_export_key_depends_on_versions():
+    p = uuid.uuid4()
+    assert export_jobs.export_key("budget_xlsx", p, {"a": 1, "b": 2}) == export_jobs.export_key("budget_xlsx", p, {"b": 2, "a": 1})
+    assert export_jobs.export_key("budget_xlsx", p, {"a": 1}) != export_jobs.export_key("budget_xlsx", p, {"a": 2})
+
+
+def test_reports_export_key_follows_contractor_versions():
+    project_id = uuid.uuid4()
+    db = _Session({reports_scope(project_id): 3, CONTRACTORS_SCOPE: 1})
+    spec = export_jobs.EXPORT_TYPES["reports_xlsx"]
+
+    async def key():
+        return export_jobs.export_key(spec.name, project_id, await get_versions(db, *spec.scopes(project_id)))
+
+    before = asyncio.run(key())
+    db.versions[CONTRACTORS_SCOPE] = 2  # переименован контрагент
+    assert asyncio.run(key()) != before
+
+
+
+def test_report_edit_changes_reports_export_key(run_in_db):
+    """Смена даты и съёмочного дня отчёта — новая версия reports_scope, кэш выгрузки не переиспользуется."""
+    admin = AuthUser(uuid.uuid4(), "admin@example.com", "admin", True, True, datetime.now(timezone.utc))
+    spec = export_jobs.EXPORT_TYPES["reports_xlsx"]
+
+    async def scenario(db):
+        project = Project(name="reports")
+        db.add(project)
+        await db.flush()
+        report = ProductionReport(project_id=project.id, shoot_day_number=1, date=date(2026, 3, 1))
+        db.add(report)
+        await db.commit()
+
+        async def key():
+            return export_jobs.export_key(spec.name, project.id, await get_versions(db, *spec.scopes(project.id)))
+
+        before = await key()
+        await update_report(report.id, ProductionReportUpdate(date=date(2026, 3, 2), shoot_day_number=2), admin, db)
+        assert await key() != before
+
+    run_in_db(scenario)
+
+def test_concurrent_submits_share_one_job_and_hit_cache(fake_export):
+    project_id = uuid.uuid4()
+    db = _Session({f"project:{project_id}": 4})
+
+    async def scenario():
+        first = await export_jobs.submit(db, "test_txt", project_id)
+        second = await export_jobs.submit(db, "test_txt", project_id)
+        assert first is second
+        await export_jobs.wait(first)
+        assert first.status == export_jobs.DONE and os.path.exists(first.path)
+
+        cached = await export_jobs.submit(db, "test_txt", project_id)
+        assert cached.status == export_jobs.DONE and cached.path == first.path
+        assert export_jobs.get_job(cached.id) is cached
+
+        # Новая версия данных — новый файл
+        db.versions[f"project:{project_id}"] = 5
+        fresh = await export_jobs.wait(await export_jobs.submit(db, "test_txt", project_id))
+        assert fresh.path != first.path
+
+    asyncio.run(scenario())
+    assert len(fake_export) == 2
+
+
+def test_failed_job_reports_error(fake_export, monkeypatch):
+    async def broken(db, project_id, path):
+        raise RuntimeError("нет данных")
+
+    spec = export_jobs.EXPORT_TYPES["test_txt"]
+    monkeypatch.setitem(export_jobs.EXPORT_TYPES, "test_txt", export_jobs.ExportType(
+        spec.name, spec.suffix, spec.media_type, spec.scopes, broken,
+    ))
+
+    async def scenario():
+        return await export_jobs.wait(await export_jobs.submit(_Session({}), "test_txt", uuid.uuid4()))
+
+    job = asyncio.run(scenario())
+    assert job.status == export_jobs.FAILED and job.error == "нет данных"
+    assert os.listdir(settings.export_cache_dir) == []
+
+
+def test_evict_removes_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "export_cache_dir", str(tmp_path))
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"{i}.xlsx"
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (1000 + i, 1000 + i))
+        paths.append(str(path))
+    os.utime(paths[0], (2000, 2000))  # недавно выдан — остаётся
+
+    assert export_jobs.evict(250, keep=paths[1]) == 2
+    assert sorted(os.listdir(tmp_path)) == ["0.xlsx", "1.xlsx"]
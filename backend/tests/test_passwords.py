@@ -0,0 +1,83 @@
+"""Тесты пула хэширования паролей."""
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.core import security
+from app.main import health
+from app.routers.auth import get_password_pool_stats
+from app.services.passwords import PasswordPool, PasswordPoolBusy, verify_password_async
+
+
+def test_pool_rejects_over_queue_limit():
+    pool = PasswordPool(workers=1, queue_limit=1)
+    release = threading.Event()
+
+    async def scenario():
+        first = asyncio.ensure_future(pool.run(release.wait))
+        second = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(PasswordPoolBusy):
+            await pool.run(release.wait)
+        release.set()
+        await asyncio.gather(first, second)
+
+    asyncio.run(scenario())
+    stats = pool.stats()
+    assert stats["completed"] == 2 and stats["rejected"] == 1 and stats["pending"] == 0
+    assert stats["max_pending"] == 2
+    pool.shutdown()
+
+
+def test_cancelled_request_keeps_its_slot_until_the_job_ends():
+    pool = PasswordPool(workers=1, queue_limit=0)
+    started, release = threading.Event(), threading.Event()
+
+    def job():
+        started.set()
+        release.wait()
+
+    async def scenario():
+        waiter = asyncio.ensure_future(pool.run(job))
+        await asyncio.to_thread(started.wait)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # bcrypt ещё работает — поток занят, новое задание не принимается
+        assert pool.stats()["pending"] == 1
+        with pytest.raises(PasswordPoolBusy):
+            await pool.run(job)
+        release.set()
+        while pool.stats()["pending"]:
+            await asyncio.sleep(0.01)
+        await pool.run(job)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+    assert pool.stats()["completed"] == 2
+
+
+def test_rehash_when_rounds_change(monkeypatch):
+    monkeypatch.setattr(security, "pwd_context", CryptContext(schemes=["bcrypt"], bcrypt__rounds=4))
+    old_hash = security.hash_password("secret")
+    assert asyncio.run(verify_password_async("secret", old_hash)) == (True, None)
+
+    monkeypatch.setattr(security, "pwd_context", CryptContext(schemes=["bcrypt"], bcrypt__rounds=5))
+    valid, new_hash = asyncio.run(verify_password_async("secret", old_hash))
+    assert valid and new_hash and new_hash != old_hash
+    assert asyncio.run(verify_password_async("wrong", old_hash))[0] is False
+
+
+def test_pool_stats_only_for_superadmin():
+    assert "password_pool" not in asyncio.run(health())
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(get_password_pool_stats(SimpleNamespace(is_superadmin=False)))
+    assert exc.value.status_code == 403
+    assert "pending" in asyncio.run(get_password_pool_stats(SimpleNamespace(is_superadmin=True)))
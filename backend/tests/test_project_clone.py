@@ -0,0 +1,116 @@
+"""Тесты копирования проекта: переназначение id и путей, масштаб ставок, договоры."""
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+from app.core.budget_path import child_path, path_ids
+from app.core.tax_logic import calc_tax, IP_NDS
+from app.models.budget import BudgetLine
+from app.models.contract import Contract, ContractBudgetLine
+from app.models.contractor import Contractor
+from app.models.project import Project
+from app.models.tax import TaxScheme, TaxComponent
+from app.services.budget_rollups import check_rollups, rebuild_rollups_in_db
+from app.services.project_clone import clone_id, clone_path, clone_project_data
+
+
+def test_clone_id_is_deterministic_per_salt():
+    line_id = uuid.uuid4()
+    assert clone_id(line_id, "a") == clone_id(str(line_id), "a")
+    assert clone_id(line_id, "a") != clone_id(line_id, "b")
+    assert clone_id(line_id, "a") != line_id
+
+
+def test_clone_path_remaps_every_segment():
+    a, b, c = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    path = child_path(child_path(child_path(None, a), b), c)
+    cloned = clone_path(path, "salt")
+    assert path_ids(cloned) == [clone_id(a, "salt"), clone_id(b, "salt"), clone_id(c, "salt")]
+    assert cloned.endswith("/")
+    assert clone_path("", "salt") == ""
+
+
+async def _seed(db):
+    """Исходный проект: группа → подгруппа → статьи со схемой ИП+НДС, договор с привязками."""
+    scheme = TaxScheme(name=f"ИП+НДС {uuid.uuid4()}", components=[
+        TaxComponent(sort_order=i, **comp) for i, comp in enumerate(IP_NDS)
+    ])
+    contractor = Contractor(full_name="Иванов", type="IP")
+    source, target, other = Project(name="src"), Project(name="dst"), Project(name="other")
+    db.add_all([scheme, contractor, source, target, other])
+    await db.flush()
+
+    lines = []
+
+    def add(project, parent, type_, rate=0.0, quantity=1.0):
+        line_id = uuid.uuid4()
+        line = BudgetLine(
+            id=line_id, project_id=project.id, parent_id=parent.id if parent else None,
+            path=child_path(parent.path if parent else None, line_id), level=parent.level + 1 if parent else 0,
+            sort_order=len(lines), code=str(len(lines)), name="x", type=type_, rate=rate, quantity=quantity,
+            tax_scheme_id=scheme.id if type_ == "ITEM" else None,
+        )
+        lines.append(line)
+        return line
+
+    group = add(source, None, "GROUP")
+    sub = add(source, group, "GROUP")
+    items = [add(source, sub, "ITEM", 10001.0, 3), add(source, group, "ITEM", 777.0, 2), add(source, None, "ITEM", 50.0)]
+    foreign = add(other, None, "ITEM", 1.0)
+    db.add_all(lines)
+    await db.flush()
+
+    contract = Contract(number="1", project_id=source.id, contractor_id=contractor.id,
+                        payment_type="PER_SHIFT", status="ACTIVE", signed_at=None)
+    db.add(contract)
+    await db.flush()
+    db.add_all([ContractBudgetLine(contract_id=contract.id, budget_line_id=items[0].id),
+                ContractBudgetLine(contract_id=contract.id, budget_line_id=foreign.id)])
+    await db.flush()
+    await rebuild_rollups_in_db(db, [source.id])
+    return source.id, target.id, [l for l in lines if l.project_id == source.id], contract
+
+
+async def _all(db, model, *where):
+    result = await db.execute(select(model).where(*where).execution_options(populate_existing=True))
+    return list(result.scalars().all())
+
+
+@pytest.mark.parametrize("include_contracts, rate_factor", [(False, 1.0), (True, 1.0), (False, 1.5), (True, 0.5)])
+def test_clone_remaps_ids_paths_and_options(run_in_db, include_contracts, rate_factor):
+    async def scenario(db):
+        source_id, target_id, source_lines, contract = await _seed(db)
+        salt = str(target_id)
+        counts = await clone_project_data(db, source_id, target_id, include_contracts, rate_factor)
+
+        cloned = {l.id: l for l in await _all(db, BudgetLine, BudgetLine.project_id == target_id)}
+        assert counts["lines"] == len(cloned) == len(source_lines)
+        for src in source_lines:
+            copy = cloned[clone_id(src.id, salt)]
+            assert copy.parent_id == (clone_id(src.parent_id, salt) if src.parent_id else None)
+            assert copy.path == clone_path(src.path, salt)
+            assert (copy.code, copy.level, copy.sort_order) == (src.code, src.level, src.sort_order)
+            # Ни сирот, ни путей в исходный проект
+            assert copy.parent_id is None or copy.parent_id in cloned
+            assert all(i in cloned for i in path_ids(copy.path))
+            if src.type == "ITEM":
+                expected = calc_tax(src.rate * rate_factor, src.quantity, IP_NDS)
+                assert copy.rate == src.rate * rate_factor
+                assert (copy.subtotal, copy.tax_amount, copy.total) == (
+                    expected["subtotal"], expected["tax_amount"], expected["total"])
+        assert await check_rollups(db, target_id, list(cloned.values())) == []
+
+        contracts = await _all(db, Contract, Contract.project_id == target_id)
+        links = await _all(db, ContractBudgetLine, ContractBudgetLine.contract_id.in_([c.id for c in contracts]))
+        if not include_contracts:
+            assert contracts == [] and counts["contracts"] == counts["contract_links"] == 0
+            return
+        [copy] = contracts
+        assert copy.id == clone_id(contract.id, salt)
+        assert (copy.status, copy.signed_at) == ("DRAFT", None)
+        # Привязка к статье чужого проекта не копируется
+        assert [(l.contract_id, l.budget_line_id) for l in links] == [(copy.id, clone_id(source_lines[2].id, salt))]
+        assert counts["contracts"] == 1 and counts["contract_links"] == 1
+
+    run_in_db(scenario)
@@ -0,0 +1,92 @@
+"""Тесты сырой выгрузки CSV / NDJSON."""
+import asyncio
+import csv
+import io
+import json
+import uuid
+from collections import namedtuple
+from datetime import date
+from types import SimpleNamespace
+
+from app.core.tax_logic import calc_tax, IP_NDS, NDS_20
+from app.services import raw_export, tax_schemes
+
+_DB_COLUMNS = [c for c in raw_export.BUDGET_COLUMNS if c not in raw_export.TAX_COLUMNS]
+BudgetRow = namedtuple("BudgetRow", [*_DB_COLUMNS, "group_subtotal", "group_tax_amount", "group_total"])
+
+
+def _line(type_, rate=0.0, quantity=1.0, scheme=None, rollup=(None, None, None)):
+    values = dict.fromkeys(_DB_COLUMNS)
+    values.update(id=uuid.uuid4(), name="x", type=type_, level=0, rate=rate, quantity=quantity,
+                  tax_scheme_id=scheme, date_start=date(2026, 3, 1))
+    return BudgetRow(**values, group_subtotal=rollup[0], group_tax_amount=rollup[1], group_total=rollup[2])
+
+
+def _scheme(name, components):
+    return SimpleNamespace(id=uuid.uuid4(), name=name, is_system=True,
+                           components=[SimpleNamespace(sort_order=i, **c) for i, c in enumerate(components)])
+
+
+class _Session:
+    def __init__(self, schemes, partitions):
+        self.schemes = schemes
+        self.partitions = partitions
+
+    async def execute(self, statement, params=None):
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: self.schemes))
+
+    async def stream(self, statement, params=None):
+        async def partitions():
+            for p in self.partitions:
+                yield p
+        return SimpleNamespace(partitions=partitions)
+
+
+async def _collect(gen):
+    return "".join([text async for text in gen])
+
+
+async def _chunks(db, source, columns):
+    return [chunk async for chunk in raw_export.iter_chunks(db, source, uuid.uuid4(), columns)]
+
+
+def test_tax_columns_split_by_recipient():
+    tax_schemes.invalidate()
+    ip = _scheme("ИП+НДС", IP_NDS)
+    line = _line("ITEM", 10000.0, 3, ip.id)
+    db = _Session([ip], [[line]])
+    columns = ("tax_scheme", "subtotal", "tax_amount", "total", "tax_contractor", "tax_budget")
+
+    [[row]] = asyncio.run(_chunks(db, "budget", columns))
+    expected = calc_tax(10000.0, 3, IP_NDS)
+    usn = next(c["amount_total"] for c in expected["breakdown"] if c["name"] == "УСН")
+    assert row == ("ИП+НДС", expected["subtotal"], expected["tax_amount"], expected["total"],
+                   usn, expected["tax_amount"] - usn)
+
+
+def test_groups_use_rollups_and_columns_are_selected():
+    tax_schemes.invalidate()
+    group = _line("GROUP", rollup=(100.0, 20.0, 120.0))
+    item = _line("ITEM", 500.0, 2)
+    db = _Session([], [[group], [item]])
+
+    chunks = asyncio.run(_chunks(db, "budget", ("type", "total", "tax_budget")))
+    assert chunks == [[("GROUP", 120.0, None)], [("ITEM", 1000.0, 0.0)]]
+
+
+def test_csv_and_ndjson_streams():
+    tax_schemes.invalidate()
+    nds = _scheme("НДС", NDS_20)
+    columns = ("id", "date_start", "tax_scheme", "total")
+    line = _line("ITEM", 1000.0, 1, nds.id)
+
+    text = asyncio.run(_collect(raw_export.csv_stream(
+        raw_export.iter_chunks(_Session([nds], [[line]]), "budget", uuid.uuid4(), columns), columns)))
+    assert list(csv.reader(io.StringIO(text))) == [list(columns), [str(line.id), "2026-03-01", "НДС", "1200.0"]]
+
+    tax_schemes.invalidate()
+    text = asyncio.run(_collect(raw_export.ndjson_stream(
+        raw_export.iter_chunks(_Session([nds], [[line], [line]]), "budget", uuid.uuid4(), columns), columns)))
+    objects = [json.loads(s) for s in text.splitlines()]
+    assert len(objects) == 2
+    assert objects[0] == {"id": str(line.id), "date_start": "2026-03-01", "tax_scheme": "НДС", "total": 1200.0}
@@ -0,0 +1,64 @@
+"""Тесты пакетного налогового расчёта: побитное совпадение с calc_tax."""
+import random
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.core.tax_batch import TaxTable, calc_tax_batch, line_amounts_batch
+from app.core.tax_logic import calc_tax, SYSTEM_TAX_SCHEMES
+
+
+def _random_rows(n: int, seed: int):
+    rnd = random.Random(seed)
+    rates, quantities = [], []
+    for _ in range(n):
+        # Целые, копейки и «пограничные» ставки, где floor чувствителен к округлению
+        rates.append(rnd.choice((
+            float(rnd.randint(0, 500_000)),
+            round(rnd.uniform(0, 100_000), 2),
+            float(rnd.choice((47, 94, 87, 100, 150, 1000, 8700))),
+        )))
+        quantities.append(rnd.choice((1.0, 0.5, float(rnd.randint(1, 60)), round(rnd.uniform(0, 10), 3))))
+    return rates, quantities
+
+
+def test_matches_calc_tax_for_every_system_scheme():
+    table = TaxTable(SYSTEM_TAX_SCHEMES)
+    names = [None, *SYSTEM_TAX_SCHEMES]
+    rates, quantities = _random_rows(5000, seed=1)
+    idx = [i % len(names) for i in range(len(rates))]
+
+    result = calc_tax_batch(rates, quantities, idx, table)
+    for i, (rate, quantity) in enumerate(zip(rates, quantities)):
+        components = SYSTEM_TAX_SCHEMES.get(names[idx[i]], [])
+        expected = calc_tax(rate, quantity, components)
+        assert result.subtotal[i] == expected["subtotal"]
+        assert result.tax_amount[i] == expected["tax_amount"]
+        assert result.total[i] == expected["total"]
+        for col, part in enumerate(expected["breakdown"]):
+            assert result.per_unit[i, col] == part["amount_per_unit"]
+            assert result.component_total[i, col] == part["amount_total"]
+        # Дополненные колонки коротких схем не дают налога
+        assert not result.per_unit[i, len(components):].any()
+
+
+def test_empty_table_and_empty_input():
+    table = TaxTable({})
+    result = calc_tax_batch([100.0, 0.5], [3.0, 2.0], [0, 0], table)
+    assert result.tax_amount.tolist() == [0.0, 0.0]
+    assert result.total.tolist() == [300.0, 1.0]
+
+    empty = calc_tax_batch([], [], np.zeros(0, dtype=np.intp), TaxTable(SYSTEM_TAX_SCHEMES))
+    assert empty.total.shape == (0,)
+
+
+def test_line_amounts_batch_skips_groups_and_unknown_schemes():
+    sz, missing = uuid.uuid4(), uuid.uuid4()
+    scheme_map = {sz: SYSTEM_TAX_SCHEMES["СЗ 6%"]}
+    item = SimpleNamespace(id=1, type="ITEM", rate=100.0, quantity=2.0, tax_scheme_id=sz)
+    orphan = SimpleNamespace(id=2, type="ITEM", rate=100.0, quantity=1.0, tax_scheme_id=missing)
+    group = SimpleNamespace(id=3, type="GROUP", rate=0.0, quantity=1.0, tax_scheme_id=None)
+
+    amounts = line_amounts_batch([item, orphan, group], scheme_map)
+    assert amounts == {1: (200.0, 12.0, 212.0), 2: (100.0, 0.0, 100.0)}
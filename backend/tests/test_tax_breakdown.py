@@ -0,0 +1,49 @@
+"""Тесты разбивки налогов по компонентам."""
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+from app.services import tax_breakdown
+from app.services.versions import TAX_SCHEMES_SCOPE, project_scope, reports_scope
+
+
+class _Session:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    async def execute(self, statement, params=None):
+        self.queries += 1
+        return SimpleNamespace(all=lambda: list(self.rows))
+
+
+def setup_function():
+    tax_breakdown.clear()
+
+
+def test_summarize_by_recipient():
+    result = tax_breakdown.summarize([
+        ("НДФЛ", "BUDGET", 1400.0, 2), ("Страховые", "BUDGET", 3000.0, 2), ("НПД", "CONTRACTOR", 60.0, 1),
+    ])
+    assert result["by_recipient"] == {"BUDGET": 4400.0, "CONTRACTOR": 60.0}
+    assert result["total"] == 4460.0
+    assert result["components"][0] == {"name": "НДФЛ", "recipient": "BUDGET", "amount": 1400.0, "lines": 2}
+
+
+def test_breakdown_cached_per_source_version():
+    project_id = uuid.uuid4()
+    db = _Session([("НДС", "BUDGET", 200.0, 1)])
+    versions = {project_scope(project_id): 3, reports_scope(project_id): 1, TAX_SCHEMES_SCOPE: 5}
+
+    async def scenario():
+        await tax_breakdown.load_breakdown(db, project_id, "budget", versions)
+        await tax_breakdown.load_breakdown(db, project_id, "budget", versions)
+        assert db.queries == 1
+        # Отчёты — отдельная область; изменение отчётов не сбрасывает разбивку бюджета
+        await tax_breakdown.load_breakdown(db, project_id, "reports", versions)
+        await tax_breakdown.load_breakdown(db, project_id, "budget", {**versions, reports_scope(project_id): 2})
+        assert db.queries == 2
+        await tax_breakdown.load_breakdown(db, project_id, "budget", {**versions, TAX_SCHEMES_SCOPE: 6})
+        assert db.queries == 3
+
+    asyncio.run(scenario())
@@ -0,0 +1,73 @@
+"""Тесты кэша скомпилированных налоговых схем."""
+import asyncio
+import random
+import uuid
+from types import SimpleNamespace
+
+from app.core.tax_logic import calc_tax, SYSTEM_TAX_SCHEMES
+from app.services import tax_schemes
+
+
+def _scheme(name: str, components: list[dict]) -> SimpleNamespace:
+    comps = [SimpleNamespace(sort_order=i, **c) for i, c in enumerate(components)]
+    random.Random(name).shuffle(comps)  # из БД компоненты могут прийти в любом порядке
+    return SimpleNamespace(id=uuid.uuid4(), name=name, is_system=True, components=comps)
+
+
+class _Session:
+    def __init__(self, schemes):
+        self.schemes = schemes
+        self.queries = 0
+
+    async def execute(self, statement):
+        self.queries += 1
+        schemes = list(self.schemes)
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: schemes))
+
+
+def setup_function():
+    tax_schemes.invalidate()
+
+
+def test_compiled_amounts_match_calc_tax():
+    rnd = random.Random(3)
+    for name, components in SYSTEM_TAX_SCHEMES.items():
+        compiled = tax_schemes.CompiledScheme(_scheme(name, components))
+        assert [c.name for c in compiled.components] == [c["name"] for c in components]
+        for _ in range(500):
+            rate = rnd.choice((float(rnd.randint(0, 300_000)), round(rnd.uniform(0, 5000), 2)))
+            quantity = rnd.choice((1.0, 2.5, float(rnd.randint(1, 40))))
+            expected = calc_tax(rate, quantity, components)
+            assert compiled.amounts(rate, quantity) == (expected["subtotal"], expected["tax_amount"], expected["total"])
+        assert compiled.inputs == [{k: c[k] for k in ("name", "rate", "type", "recipient")} for c in components]
+
+
+def test_cache_hits_without_queries_and_reloads_on_invalidate():
+    sz = _scheme("СЗ 6%", SYSTEM_TAX_SCHEMES["СЗ 6%"])
+    db = _Session([sz])
+
+    async def scenario():
+        assert (await tax_schemes.get_scheme(db, sz.id)).name == "СЗ 6%"
+        assert await tax_schemes.get_scheme(db, None) is None
+        scheme_map = await tax_schemes.get_scheme_map(db, {sz.id})
+        assert scheme_map[sz.id][0]["rate"] == 0.06
+        assert db.queries == 1
+
+        # Схема из другого процесса: неизвестный id перечитывает кэш сразу
+        fl = _scheme("ФЛ", SYSTEM_TAX_SCHEMES["ФЛ (НДФЛ + Страховые)"])
+        db.schemes.append(fl)
+        assert (await tax_schemes.get_scheme(db, fl.id)).name == "ФЛ"
+        assert db.queries == 2
+
+        # Несуществующий id перечитывает кэш один раз, дальше — промах без запросов
+        ghost = uuid.uuid4()
+        assert await tax_schemes.get_scheme(db, ghost) is None
+        assert await tax_schemes.get_scheme(db, ghost) is None
+        assert db.queries == 3
+
+        db.schemes.remove(sz)
+        tax_schemes.invalidate()
+        assert await tax_schemes.get_scheme(db, sz.id) is None
+        assert db.queries == 4
+
+    asyncio.run(scenario())
@@ -0,0 +1,62 @@
+"""Тесты налоговой симуляции «что если»."""
+import uuid
+from types import SimpleNamespace
+
+from app.core.budget_path import child_path
+from app.core.tax_logic import calc_tax, SZ_6, FL, NDS_20
+from app.core.tax_simulation import remapping_key, simulate
+
+
+def _row(parent=None, type_="GROUP", rate=0.0, quantity=1.0, scheme=None, contractor=None, override=False, code="", components=()):
+    row_id = uuid.uuid4()
+    amounts = calc_tax(rate, quantity, list(components)) if type_ != "GROUP" else None
+    return SimpleNamespace(
+        id=row_id, parent_id=parent.id if parent else None, path=child_path(parent.path if parent else None, row_id),
+        level=parent.level + 1 if parent else 0, code=code, name=code, type=type_, rate=rate, quantity=quantity,
+        tax_scheme_id=scheme, contractor_id=contractor, tax_override=override,
+        subtotal=amounts["subtotal"] if amounts else 0.0,
+        tax_amount=amounts["tax_amount"] if amounts else 0.0,
+        total=amounts["total"] if amounts else 0.0,
+    )
+
+
+def test_remapping_key_is_order_independent():
+    a, b, c = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    assert remapping_key({a: b, c: None}, {}, {}) == remapping_key({c: None, a: b}, {}, {})
+    assert remapping_key({a: b}, {}, {}) != remapping_key({}, {a: b}, {})
+
+
+def test_simulate_totals_and_group_deltas():
+    fl, sz, nds = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    scheme_map = {fl: FL, sz: SZ_6, nds: NDS_20}
+    camera = uuid.uuid4()
+
+    cat = _row(code="1")
+    crew = _row(cat, code="1.1")
+    other = _row(code="2")
+    op = _row(crew, "ITEM", 10000.0, 5, fl, camera, components=FL)
+    manual = _row(crew, "ITEM", 1000.0, 1, fl, camera, override=True, components=FL)
+    rent = _row(other, "ITEM", 2000.0, 2, nds, components=NDS_20)
+    rows = [cat, crew, other, op, manual, rent]
+    crew_totals = (op.subtotal + manual.subtotal, op.tax_amount + manual.tax_amount, op.total + manual.total)
+    rollups = {cat.id: crew_totals, crew.id: crew_totals}
+
+    # Оператор (по контрагенту) → СЗ 6%; ручная схема manual не меняется; аренда → без налога
+    result = simulate(rows, scheme_map, rollups, {nds: None}, {camera: sz}, {})
+    assert result["changed_lines"] == 2
+
+    new_op = calc_tax(10000.0, 5, SZ_6)
+    expected_tax_delta = (new_op["tax_amount"] - op.tax_amount) + (0 - rent.tax_amount)
+    assert result["tax_amount"]["delta"] == expected_tax_delta
+    assert result["total"]["new"] == new_op["total"] + manual.total + rent.subtotal
+    assert result["subtotal"]["delta"] == 0
+
+    groups = {g["id"]: g for g in result["groups"]}
+    assert set(groups) == {cat.id, crew.id, other.id}
+    assert groups[crew.id]["total"]["delta"] == new_op["total"] - op.total
+    assert groups[cat.id]["total"]["delta"] == groups[crew.id]["total"]["delta"]
+    assert groups[other.id]["total"] == {"old": 0.0, "new": -rent.tax_amount, "delta": -rent.tax_amount}
+
+    # Переназначение статьи сильнее контрагента
+    result = simulate(rows, scheme_map, rollups, {}, {camera: sz}, {op.id: fl})
+    assert result["changed_lines"] == 0 and result["groups"] == []
@@ -0,0 +1,19 @@
+"""Тесты ETag."""
+from app.services.versions import make_etag, etag_matches
+
+
+def test_etag_changes_with_version_and_params():
+    base = make_etag({"project:1": 3, "contractors": 1}, "budget", None)
+    assert base == make_etag({"contractors": 1, "project:1": 3}, "budget", None)
+    assert base != make_etag({"project:1": 4, "contractors": 1}, "budget", None)
+    assert base != make_etag({"project:1": 3, "contractors": 1}, "budget", 1)
+    assert base.startswith('"') and base.endswith('"')
+
+
+def test_if_none_match():
+    etag = make_etag({"tax_schemes": 7})
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
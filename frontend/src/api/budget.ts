@@ -1,9 +1,27 @@
 import client from './client'
 import type { BudgetLine } from '../types'
 
+export type BudgetBatchOperation =
+  | { op: 'create'; data: Partial<BudgetLine> }
+  | { op: 'update'; id: string; data: Partial<BudgetLine> }
+  | { op: 'delete'; id: string }
+  | { op: 'move'; id: string; data: { parent_id: string | null; sort_order: number } }
+
+export interface BudgetBatchResult {
+  lines: BudgetLine[]
+  created: string[]
+  deleted: string[]
+}
+
 export const budgetApi = {
-  getTree: (projectId: string) =>
-    client.get<BudgetLine[]>(`/projects/${projectId}/budget`).then((r) => r.data),
+  getTree: (projectId: string, params?: { depth?: number; parent_id?: string }) =>
+    client.get<BudgetLine[]>(`/projects/${projectId}/budget`, { params }).then((r) => r.data),
+
+  // Дети группы (depth уровней) — догрузка при раскрытии в BudgetTable
+  getSubtree: (projectId: string, parentId: string, depth = 1) =>
+    client
+      .get<BudgetLine[]>(`/projects/${projectId}/budget`, { params: { parent_id: parentId, depth } })
+      .then((r) => r.data),
 
   createLine: (projectId: string, data: Partial<BudgetLine>) =>
     client.post<BudgetLine>(`/projects/${projectId}/budget/lines`, data).then((r) => r.data),
@@ -11,6 +29,12 @@ export const budgetApi = {
   updateLine: (lineId: string, data: Partial<BudgetLine>) =>
     client.patch<BudgetLine>(`/budget/lines/${lineId}`, data).then((r) => r.data),
 
+  // Несколько правок одним запросом (вставка диапазона ячеек)
+  batch: (projectId: string, operations: BudgetBatchOperation[]) =>
+    client
+      .post<BudgetBatchResult>(`/projects/${projectId}/budget/lines:batch`, { operations })
+      .then((r) => r.data),
+
   deleteLine: (lineId: string) =>
     client.delete(`/budget/lines/${lineId}`),
 
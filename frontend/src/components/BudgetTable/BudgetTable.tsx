@@ -5,7 +5,7 @@ import { registerAllModules } from 'handsontable/registry'
 import 'handsontable/dist/handsontable.full.css'
 
 import type { BudgetLine, TaxScheme, Contractor } from '../../types'
-import { buildTableData } from './dataAdapter'
+import { buildTableData, mergeSubtrees } from './dataAdapter'
 import type { FlatRow } from './dataAdapter'
 import { buildHotColumns, buildHotHeaders } from './columns'
 import { budgetApi } from '../../api/budget'
@@ -16,6 +16,7 @@ registerAllModules()
 
 interface Props {
   projectId: string
+  // Верхние уровни дерева; глубже группы догружаются при раскрытии
   tree: BudgetLine[]
   onUpdate: () => void
 }
@@ -37,6 +38,11 @@ export const BudgetTable: React.FC<Props> = ({ projectId, tree, onUpdate }) => {
   const [contractors, setContractors] = useState<Contractor[]>([])
   const [selectedRow, setSelectedRow] = useState<FlatRow | null>(null)
   const [adding, setAdding] = useState(false)
+  // Догруженные при раскрытии дети групп и свёрнутые группы
+  const [subtrees, setSubtrees] = useState<Record<string, BudgetLine[]>>({})
+  const [collapsed, setCollapsed] = useState<Set<string>>(new Set())
+  const subtreesRef = useRef(subtrees)
+  subtreesRef.current = subtrees
 
   // Загружаем справочники один раз
   useEffect(() => {
@@ -58,9 +64,51 @@ export const BudgetTable: React.FC<Props> = ({ projectId, tree, onUpdate }) => {
     [contractors],
   )
 
-  // Пересчитываем плоский список при изменении дерева или справочников
+  const loadSubtree = useCallback(
+    async (parentId: string) => {
+      const children = await budgetApi.getSubtree(projectId, parentId)
+      setSubtrees((prev) => ({ ...prev, [parentId]: children }))
+    },
+    [projectId],
+  )
+
+  // Дерево перечитано после правки — перечитываем и раскрытые поддеревья (удалённые отбрасываем)
+  useEffect(() => {
+    const ids = Object.keys(subtreesRef.current)
+    if (ids.length === 0) return
+    Promise.all(
+      ids.map((id) => budgetApi.getSubtree(projectId, id).catch((): BudgetLine[] | null => null)),
+    ).then((results) => {
+      setSubtrees((prev) => {
+        const next = { ...prev }
+        results.forEach((children, i) => {
+          if (children) next[ids[i]] = children
+          else delete next[ids[i]]
+        })
+        return next
+      })
+    })
+  }, [tree, projectId])
+
+  const toggleRow = useCallback(
+    (row: FlatRow) => {
+      if (row._expanded) {
+        setCollapsed((prev) => new Set(prev).add(row._id))
+        return
+      }
+      setCollapsed((prev) => {
+        const next = new Set(prev)
+        next.delete(row._id)
+        return next
+      })
+      if (!subtrees[row._id]) loadSubtree(row._id).catch(() => {})
+    },
+    [subtrees, loadSubtree],
+  )
+
+  // Пересчитываем плоский список при изменении дерева, поддеревьев или справочников
   useEffect(() => {
-    const rows = buildTableData(tree)
+    const rows = buildTableData(mergeSubtrees(tree, subtrees), collapsed)
     rows.forEach((r) => {
       r.tax_scheme_name = taxSchemeIdToName(r.tax_scheme_id)
       if (!r.contractor_name && r.contractor_id) {
@@ -68,7 +116,7 @@ export const BudgetTable: React.FC<Props> = ({ projectId, tree, onUpdate }) => {
       }
     })
     setFlatData(rows)
-  }, [tree, taxSchemeIdToName, contractors])
+  }, [tree, subtrees, collapsed, taxSchemeIdToName, contractors])
 
   // Трекинг выбранной строки
   const handleAfterSelection = useCallback(
@@ -158,6 +206,14 @@ export const BudgetTable: React.FC<Props> = ({ projectId, tree, onUpdate }) => {
             parent_id: parentId,
             sort_order: 9999,
           } as Partial<BudgetLine>)
+          // Раскрываем группу, чтобы новая статья была видна
+          const groupId = parentId
+          setCollapsed((prev) => {
+            const next = new Set(prev)
+            next.delete(groupId)
+            return next
+          })
+          await loadSubtree(groupId)
         }
         onUpdate()
       } catch {
@@ -166,7 +222,7 @@ export const BudgetTable: React.FC<Props> = ({ projectId, tree, onUpdate }) => {
         setAdding(false)
       }
     },
-    [adding, selectedRow, flatData, projectId, onUpdate],
+    [adding, selectedRow, flatData, projectId, onUpdate, loadSubtree],
   )
 
   // Удаление строки
@@ -191,15 +247,32 @@ export const BudgetTable: React.FC<Props> = ({ projectId, tree, onUpdate }) => {
     return ''
   })
 
-  // Рендер ячейки name — без стрелок, только отступ и жирность
+  // Рендер ячейки name — отступ, жирность и стрелка раскрытия у групп с детьми
   const nameRenderer = useCallback(
-    (_instance: Handsontable, td: HTMLTableCellElement, row: number) => {
+    (
+      instance: Handsontable,
+      td: HTMLTableCellElement,
+      row: number,
+      col: number,
+      prop: string | number,
+      value: unknown,
+      cellProperties: Handsontable.CellProperties,
+    ) => {
+      // Базовый рендер — классы строки (row-category, readOnly) из cells
+      Handsontable.renderers.getRenderer('base')(instance, td, row, col, prop, value, cellProperties)
       const rowData = flatData[row]
       if (!rowData) return
 
       const indent = rowData._level * 16
       td.innerHTML = ''
       td.style.paddingLeft = `${indent + 8}px`
+      if (rowData._hasChildren) {
+        const toggle = document.createElement('span')
+        toggle.className = 'budget-toggle'
+        toggle.textContent = rowData._expanded ? '▾ ' : '▸ '
+        toggle.style.cursor = 'pointer'
+        td.appendChild(toggle)
+      }
       td.appendChild(document.createTextNode(rowData.name))
 
       if (rowData._level === 0) td.style.fontWeight = '700'
@@ -350,9 +423,15 @@ export const BudgetTable: React.FC<Props> = ({ projectId, tree, onUpdate }) => {
                 isDateActive ? 'date-active' : '',
               ].filter(Boolean).join(' '),
               readOnly: isGroup || isDateDisabled,
+              ...(prop === 'name' ? { renderer: nameRenderer } : {}),
             }
           }}
           afterChange={handleAfterChange}
+          afterOnCellMouseDown={(event, coords) => {
+            const target = event.target as HTMLElement | null
+            const rowData = flatData[coords.row]
+            if (rowData && target?.classList.contains('budget-toggle')) toggleRow(rowData)
+          }}
           afterSelectionEnd={(r1) => handleAfterSelection(r1)}
         />
       </div>
@@ -1,6 +1,7 @@
 /**
  * Преобразует дерево BudgetLine в плоский массив для Handsontable.
- * Сохраняет информацию об уровне для стилизации.
+ * Сохраняет информацию об уровне для стилизации. Дерево может быть загружено
+ * не полностью: дети групп догружаются при раскрытии (budgetApi.getSubtree).
  */
 import type { BudgetLine } from '../../types'
 
@@ -10,6 +11,7 @@ export interface FlatRow {
   _level: number
   _type: string
   _hasChildren: boolean
+  _expanded: boolean
 
   code: string
   name: string
@@ -41,16 +43,18 @@ function isoToDisplay(isoDate: string | null): string | null {
   return `${parts[2]}.${parts[1]}.${parts[0]}`
 }
 
-function flattenTree(lines: BudgetLine[]): FlatRow[] {
+function flattenTree(lines: BudgetLine[], collapsed: Set<string>): FlatRow[] {
   const result: FlatRow[] = []
 
   for (const line of lines) {
+    const expanded = line.children.length > 0 && !collapsed.has(line.id)
     result.push({
       _id: line.id,
       _parentId: line.parent_id,
       _level: line.level,
       _type: line.type,
-      _hasChildren: line.children.length > 0,
+      _hasChildren: line.has_children ?? line.children.length > 0,
+      _expanded: expanded,
 
       code: line.code,
       name: line.name,
@@ -74,16 +78,24 @@ function flattenTree(lines: BudgetLine[]): FlatRow[] {
       contractor_name: line.contractor_name || '',
     })
 
-    if (line.children.length > 0) {
-      result.push(...flattenTree(line.children))
+    if (expanded) {
+      result.push(...flattenTree(line.children, collapsed))
     }
   }
 
   return result
 }
 
-export function buildTableData(tree: BudgetLine[]): FlatRow[] {
-  return flattenTree(tree)
+export function buildTableData(tree: BudgetLine[], collapsed: Set<string> = new Set()): FlatRow[] {
+  return flattenTree(tree, collapsed)
+}
+
+// Подставляет догруженные поддеревья (id группы → её дети) в дерево
+export function mergeSubtrees(tree: BudgetLine[], subtrees: Record<string, BudgetLine[]>): BudgetLine[] {
+  return tree.map((line) => ({
+    ...line,
+    children: mergeSubtrees(subtrees[line.id] ?? line.children, subtrees),
+  }))
 }
 
 export function formatNumber(val: number): string {
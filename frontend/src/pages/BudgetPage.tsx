@@ -20,7 +20,8 @@ export const BudgetPage: React.FC = () => {
     try {
       const [proj, budget] = await Promise.all([
         projectsApi.get(projectId),
-        budgetApi.getTree(projectId),
+        // Разделы и подразделы; статьи догружаются при раскрытии подраздела
+        budgetApi.getTree(projectId, { depth: 2 }),
       ])
       setProject(proj)
       setTree(budget)
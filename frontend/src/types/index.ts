@@ -136,6 +136,9 @@ export interface BudgetLine {
   advance: number
 
   children: BudgetLine[]
+  // Есть ли дети на сервере (при ленивой загрузке children может быть пустым)
+  has_children: boolean
+  child_count: number
   updated_at: string
 }
 